@@ -12,6 +12,12 @@ Likita Gangireddy lg425
 from consts import *
 from game2d import *
 from level import *
+from endless import *
+from campaign import *
+from levelcache import *
+from watch import *
+from replay import *
+from profiler import *
 import introcs
 
 from kivy.logger import Logger
@@ -66,6 +72,30 @@ class Froggit(GameApp):
     #
     # Attribute _text: A message to display to the player
     # Invariant: _text is a GLabel, or None if there is no message to display
+    #
+    # Attribute _accumulator: The frame time that has not been simulated yet
+    # Invariant: _accumulator is a float >= 0 (and less than one tick after update)
+    #
+    # Attribute _alpha: How far the display is between the last two ticks
+    # Invariant: _alpha is a float in [0,1), or None to draw the last tick as is
+    #
+    # Attribute _replay: The recording of this game
+    # Invariant: _replay is a Replay, or None if the game is not being recorded
+    # (REPLAY_FILE is None, the game does not run in fixed ticks, or it is a
+    # campaign of several levels or the endless mode, which a replay cannot play
+    # back)
+    #
+    # Attribute _profiler: The timings of the parts of each frame
+    # Invariant: _profiler is a Profiler if PROFILE_FILE is not None, and a
+    # NullProfiler otherwise
+    #
+    # Attribute _campaign: The levels to play, loaded in the background
+    # Invariant: _campaign is a Campaign for CAMPAIGN_LEVELS, or None in the
+    # endless mode
+    #
+    # Attribute _watcher: The files of the level being played, to reload it
+    # Invariant: _watcher is a Watcher for the level file and OBJECT_DATA if
+    # HOT_RELOAD is True and a level of the campaign is loaded, and None otherwise
 
 
     # LIST MORE ATTRIBUTES (AND THEIR INVARIANTS) HERE IF NECESSARY
@@ -89,6 +119,25 @@ class Froggit(GameApp):
         """
         self._state = STATE_INACTIVE
         self._level = None
+        self._accumulator = 0.0
+        self._alpha = None
+        self._replay = None
+        if REPLAY_FILE is not None and TICK_RATE > 0:
+            if len(CAMPAIGN_LEVELS) > 1:
+                Logger.warning('Froggit: a campaign of several levels is not recorded')
+            elif DEFAULT_LEVEL == ENDLESS_LEVEL:
+                Logger.warning('Froggit: the endless mode is not recorded')
+            else:
+                self._replay = Replay(DEFAULT_LEVEL, FROG_SPEED, TICK_RATE)
+        if PROFILE_FILE is None:
+            self._profiler = NullProfiler()
+        else:
+            self._profiler = Profiler()
+        self._campaign = None
+        self._watcher = None
+        if DEFAULT_LEVEL != ENDLESS_LEVEL:
+            cache = None if LEVEL_CACHE is None else LevelCache(LEVEL_CACHE)
+            self._campaign = Campaign(CAMPAIGN_LEVELS, OBJECT_DATA, cache)
 
         self._title = GLabel(text="Froggit",font_size=ALLOY_LARGE,
         x=self.width/2, y = self.height/2, font_name=ALLOY_FONT,
@@ -142,14 +191,61 @@ class Froggit(GameApp):
         This state only lasts one animation frame before switching to STATE_ACTIVE.
 
         STATE_COMPLETE: The wave is over (all lives are lost or all frogs are safe),
-        and is either won or lost.
+        and is either won or lost.  If all frogs are safe and the campaign has
+        another level, the state goes back to STATE_LOADING instead, for the next
+        level.
 
         You are allowed to add more states if you wish. Should you do so, you should
         describe them here.
 
+        The states are not advanced by the frame time dt. Instead, dt is added to
+        an accumulator and the game is advanced in fixed ticks of 1/TICK_RATE
+        seconds (see _tick) until less than one tick is left over. That way a
+        slow frame cannot move a car past the frog in one step, and the same
+        inputs always give the same game. At most MAX_TICKS run per frame. If
+        INTERPOLATE is True and the game is active, the leftover time is used to
+        draw the obstacles between their positions at the last two ticks. If
+        TICK_RATE is 0, the game takes one tick of length dt per frame.
+
+        Every update starts a new frame of the profiler, and each tick is timed
+        as the section 'tick' (the level times its own parts inside it).
+
         Parameter dt: The time in seconds since last update
         Precondition: dt is a number (int or float)
         """
+        self._profiler.endFrame()
+        if TICK_RATE == 0:
+            with self._profiler.section('tick'):
+                self._tick(dt)
+            return
+        step = 1.0/TICK_RATE
+        self._accumulator = self._accumulator + dt
+        ticks = 0
+        while self._accumulator >= step and ticks < MAX_TICKS:
+            with self._profiler.section('tick'):
+                self._tick(step)
+            self._accumulator = self._accumulator - step
+            ticks = ticks + 1
+        if self._accumulator >= step:
+            self._accumulator = 0.0
+        if INTERPOLATE and self._state == STATE_ACTIVE:
+            self._alpha = self._accumulator/step
+        else:
+            self._alpha = None
+
+    def _tick(self, dt):
+        """
+        Advances the game state by one tick.
+
+        This method determines the current state and, if the game is active,
+        passes the input to the Level object _level (see update). If the game
+        is being recorded, the keys down in this tick are recorded first.
+
+        Parameter dt: The length of the tick in seconds
+        Precondition: dt is a number (int or float) > 0
+        """
+        if self._replay is not None:
+            self._replay.record(self.input)
         if self.input.is_key_down('s') and self._state == STATE_INACTIVE:
             self._state = STATE_LOADING
             self._title = None
@@ -160,6 +256,10 @@ class Froggit(GameApp):
         if self._state==STATE_ACTIVE and self._state !=STATE_CONTINUE:
             if self._level.update(self.input, dt) == 'dead':
                 self._state = STATE_PAUSED
+            if self._campaign is not None:
+                self._campaign.warm()
+        if self._watcher is not None and self._state in (STATE_ACTIVE, STATE_PAUSED):
+            self._reload(dt)
         if self._state == STATE_ACTIVE and self._level.getFrog()!=None:
             self._state = STATE_ACTIVE
         if self._state == STATE_PAUSED:
@@ -192,7 +292,7 @@ class Froggit(GameApp):
             self._title.draw(self.view)
 
         if self._level is not None:
-            self._level.draw(self.view)
+            self._level.draw(self.view, self._alpha)
 
         if self._text is not None:
             self._text.draw(self.view)
@@ -204,14 +304,101 @@ class Froggit(GameApp):
 
         This method is called when the state of the game is loading. It loads a
         specific json file, and retrieves the width and height of the game file.
-        Then, a level object with these dimensions is created.
+        Then, a level object with these dimensions is created.  The window is at
+        most VIEW_LANES lanes tall; a taller level scrolls to follow the frog.
+
+        The level is the next level of the campaign, which was read and compiled
+        in the background while the previous level (or the title) was shown (see
+        campaign.py), from the compiled level cache in LEVEL_CACHE if it is up to
+        date (see levelcache.py). The frog keeps the lives it had left in the
+        previous level. If HOT_RELOAD is True, the files of the level are watched
+        (see _reload).
+
+        If the level file is ENDLESS_LEVEL, an endless level is created instead,
+        and no file is loaded.
         """
-        objects_json=self.load_json('objects.json')
-        dictionary=self.load_json(DEFAULT_LEVEL)
+        if DEFAULT_LEVEL == ENDLESS_LEVEL:
+            self.width = ENDLESS_WIDTH*GRID_SIZE
+            self.height = (VIEW_LANES*GRID_SIZE)+GRID_SIZE
+            self._level = EndlessLevel(self.load_json(OBJECT_DATA), ENDLESS_SEED)
+            self._level.setViewHeight(self.height)
+            self._level.setProfiler(self._profiler)
+            return
+        objects_json, dictionary, traffic = self._campaign.advance()
         size = dictionary['size']
+        lanes = min(size[1], VIEW_LANES)
         self.width = size[0]* GRID_SIZE
-        self.height = (size[1] * GRID_SIZE)+GRID_SIZE
-        self._level = Level(objects_json, dictionary, self.width, self.height)
+        self.height = (lanes * GRID_SIZE)+GRID_SIZE
+        # A level taller than the window scrolls, and moves its many obstacles
+        # with NumPy (if it is installed); the campaign compiled them that way
+        previous = self._level
+        self._level = self._build(objects_json, dictionary, traffic)
+        if previous is not None:
+            lives = len(previous.getFroglives())
+            self._level.setFroglives(self._level.getFroglives()[:lives])
+        self._level.setViewHeight(self.height)
+        self._level.setProfiler(self._profiler)
+        if HOT_RELOAD:
+            self._watcher = Watcher([self._campaign.getName(), OBJECT_DATA])
+
+    def _build(self, objects_json, dictionary, traffic):
+        """
+        Returns a new level of the campaign, the size of the whole level.
+
+        Parameter objects_json: A json dictionary of objects
+        Precondition: objects_json is a valid objects json
+
+        Parameter dictionary: A json dictionary with level information
+        Precondition: dictionary is a valid level json
+
+        Parameter traffic: the objects of the level (see make_traffic in campaign)
+        Precondition: traffic is a new Traffic for dictionary
+        """
+        size = dictionary['size']
+        return Level(objects_json, dictionary, size[0]*GRID_SIZE,
+                     (size[1]*GRID_SIZE)+GRID_SIZE, traffic=traffic)
+
+    def _reload(self, dt):
+        """
+        Reloads the level if its file or OBJECT_DATA was saved since it was loaded.
+
+        This method is called every tick while a level is played (or paused) if
+        HOT_RELOAD is True. Only the lanes that changed are built again, and the
+        frog keeps its position, its lives and the safe frogs (see reload in
+        Level). If the width of the level changed, the level is made again, the
+        way _STATE_LOADING made it, with the lives that were left, and the files
+        are watched from then on. The window is resized if the number of lanes
+        changed.
+
+        The files are read like the campaign read them (from LEVEL_CACHE, if it
+        is set), so that the new version is compared with one of the same kind.
+        A file that cannot be read (for example, because it is still being
+        saved) is skipped, and the level is reloaded the next time it is saved.
+
+        Parameter dt: The length of the tick in seconds
+        Precondition: dt is a number (int or float) > 0
+        """
+        if not self._watcher.poll(dt):
+            return
+        try:
+            objects_json, dictionary = self._campaign.read()
+        except (IOError, ValueError) as error:
+            Logger.warning('Froggit: cannot reload the level: '+str(error))
+            return
+        size = dictionary['size']
+        height = (min(size[1], VIEW_LANES)*GRID_SIZE)+GRID_SIZE
+        if self._level.reload(objects_json, dictionary) < 0:
+            lives = len(self._level.getFroglives())
+            self.width = size[0]*GRID_SIZE
+            self._level = self._build(objects_json, dictionary,
+                                      make_traffic(dictionary))
+            self._level.setFroglives(self._level.getFroglives()[:lives])
+            self._level.setProfiler(self._profiler)
+            self._watcher.reset()
+        elif height == self.height:
+            return
+        self.height = height
+        self._level.setViewHeight(self.height)
 
     def _STATE_PAUSED(self):
         """
@@ -251,12 +438,17 @@ class Froggit(GameApp):
 
         This method will detect if a game is complete, by checking to see if all
         of the lives are used up or if player has won the game. If either of
-        these conditions are met, the game state is switched to STATE_COMPLETE.
+        these conditions are met, the game state is switched to STATE_COMPLETE,
+        unless the game was won and the campaign has another level, which is
+        then loaded.
         """
         if self._level.livescounter()=='done':
             self._state = STATE_COMPLETE
         if self._level.getWinStatus()=='win':
-            self._state = STATE_COMPLETE
+            if self._campaign is not None and self._campaign.hasNext():
+                self._state = STATE_LOADING
+            else:
+                self._state = STATE_COMPLETE
 
     def _STATE_COMPLETE(self):
         """
@@ -264,9 +456,14 @@ class Froggit(GameApp):
 
         This method is called when the game is in STATE_COMPLETE. It will
         display a particular GLabel based on whether the player has won or
-        lost the game.
+        lost the game, or the distance the frog went in an endless level. If the
+        game was recorded, the recording is saved.
         """
-        if self._level.getWinStatus()=='win':
+        self._saveReplay()
+        if isinstance(self._level, EndlessLevel):
+            self._text = GLabel(text="Distance: "+str(self._level.getDistance()),
+            font_size=ALLOY_SMALL, font_name=ALLOY_FONT)
+        elif self._level.getWinStatus()=='win':
             self._text = GLabel(text="You Win!",font_size=ALLOY_SMALL,
             font_name=ALLOY_FONT)
         else:
@@ -278,3 +475,24 @@ class Froggit(GameApp):
         self._text.width=self.width
         self._text.linecolor='white'
         self._text.fillcolor = 'dark green'
+
+    def _saveReplay(self):
+        """
+        Saves the recording of this game to REPLAY_FILE, once.
+
+        This method does nothing if the game is not being recorded or the
+        recording was already saved.
+        """
+        if self._replay is not None:
+            self._replay.save(REPLAY_FILE)
+            self._replay = None
+
+    def on_stop(self):
+        """
+        Saves the recording and the timings of this game when the window is closed.
+
+        This method is called by Kivy when the application stops.
+        """
+        self._saveReplay()
+        if PROFILE_FILE is not None:
+            self._profiler.dump(PROFILE_FILE)
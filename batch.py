@@ -0,0 +1,357 @@
+"""
+Batch module for Froggit
+
+This module runs many headless games (episodes) of Froggit at once, on all of the
+cores of the computer, for balancing levels and training bots.
+
+An episode is given as a job (level, policy, seed).  The level is the name of one of
+the levels of the batch.  The policy decides the keys for each tick.  It is either a
+Replay (whose keys are played back as they were recorded) or a policy function.  A
+policy function is called as policy(session, rng) every tick, and returns a key mask
+(see Keys in replay.py).  It must be defined at the top level of a module, so that it
+can be sent to another process; POLICIES has the ones in this module.  The runner
+presses 's' to start the game and 'c' to continue after a death or an exit, so a
+policy only moves the frog.  The seed seeds the random generator rng of the episode.
+
+The jobs are shared out between the processes of a process pool.  The level and
+object data are sent to each process once, when it starts, and not with every job.
+Each episode returns an outcome (see run_episode), and the outcomes are summed up
+by aggregate.
+
+To run a batch from the command line, type
+
+    python batch.py level.json [level.json ...] [--objects objects.json]
+                    [--episodes 100] [--policy random] [--workers 4]
+
+A level pack (see levelpack.py) may be given in place of level files; every level in
+the pack is run, under its name in the pack.  The levels of a pack are decoded from it
+when an episode needs them (each worker opens the pack itself), and the objects stored
+in the pack are used unless --objects is given.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from consts import *
+from replay import *
+from files  import load_json
+from levelpack import load_levels
+
+# The mask of each key (see Keys)
+BATCH_MASKS = dict((REPLAY_KEYS[bit], 1 << bit) for bit in range(len(REPLAY_KEYS)))
+# The number of ticks an episode may last, unless it is given
+BATCH_LIMIT = 5*60*TICK_RATE
+
+# The data of the batch in a worker process (see _initworker)
+_worker = None
+
+
+def random_policy(session, rng):
+    """
+    Returns a random move: up half of the time, and else left, right, down or none.
+
+    A move is held for a tick only, so the frog jumps (and then waits) as soon as it
+    can.
+
+    Parameter session: the session being played
+    Precondition: session is a Session
+
+    Parameter rng: the random generator of the episode
+    Precondition: rng is a random.Random object
+    """
+    return rng.choice((BATCH_MASKS['up'], BATCH_MASKS['up'], BATCH_MASKS['left'],
+                       BATCH_MASKS['right'], BATCH_MASKS['down'], 0))
+
+
+def up_policy(session, rng):
+    """
+    Returns up, after waiting for a random number of ticks.
+
+    Parameter session: the session being played
+    Precondition: session is a Session
+
+    Parameter rng: the random generator of the episode
+    Precondition: rng is a random.Random object
+    """
+    if rng.random() < 0.1:
+        return BATCH_MASKS['up']
+    return 0
+
+
+# The policy functions of this module, by name
+POLICIES = {'random': random_policy, 'up': up_policy}
+
+
+def run_episode(objects, json, policy, seed, speed=TOOL_SPEED, limit=BATCH_LIMIT):
+    """
+    Returns the outcome of one headless episode.
+
+    The outcome is a dictionary with the keys
+
+        'result':  'win', 'loss', or 'timeout' if the game did not end within limit
+                   ticks (or before the end of a Replay)
+        'ticks':   the number of ticks played
+        'lives':   the number of lives used
+        'exits':   the time (in seconds) at which the frog reached each exit
+        'deaths':  a list [x, y, lane type] for each death of the frog
+        'seed':    the seed of the episode
+
+    Parameter objects: A json dictionary of objects
+    Precondition: objects is a valid objects json
+
+    Parameter json: A json dictionary with level information
+    Precondition: json is a valid level json
+
+    Parameter policy: the keys to play
+    Precondition: policy is a Replay or a policy function (see above)
+
+    Parameter seed: the random seed of the episode
+    Precondition: seed is an int
+
+    Parameter speed: The number of seconds a frog jump takes (ignored for a Replay,
+    which knows its own)
+    Precondition: speed is a number > 0
+
+    Parameter limit: the largest number of ticks to play
+    Precondition: limit is an int > 0
+    """
+    rng = random.Random(seed)
+    keys = Keys()
+    if isinstance(policy, Replay):
+        session = Session(objects, json, policy.getSpeed())
+        dt = 1.0/policy.getRate()
+        masks = policy.masks()
+    else:
+        session = Session(objects, json, speed)
+        dt = 1.0/TICK_RATE
+        masks = None
+    while session.getTicks() < limit and session.getState() != STATE_COMPLETE:
+        if masks is not None:
+            keys.mask = next(masks, None)
+            if keys.mask is None:
+                break
+        elif session.getState() == STATE_INACTIVE:
+            keys.mask = BATCH_MASKS['s']
+        elif session.getState() == STATE_PAUSED:
+            keys.mask = BATCH_MASKS['c']
+        else:
+            keys.mask = policy(session, rng)
+        session.tick(keys, dt)
+    level = session.getLevel()
+    if session.getState() != STATE_COMPLETE:
+        result = 'timeout'
+    elif level.getWinStatus() == 'win':
+        result = 'win'
+    else:
+        result = 'loss'
+    exits = []
+    deaths = []
+    for tick, event, x, y in session.getEvents():
+        if event == 'exit':
+            exits.append(tick*dt)
+        else:
+            deaths.append([x, y, event])
+    lives = 0 if level is None else FROG_LIVES-len(level.getFroglives())
+    return {'result': result, 'ticks': session.getTicks(), 'lives': lives,
+            'exits': exits, 'deaths': deaths, 'seed': seed}
+
+
+def aggregate(outcomes):
+    """
+    Returns a dictionary that sums up a list of episode outcomes.
+
+    The summary has the number of episodes, wins, losses and timeouts, the mean
+    number of lives used and the mean time to the first exit (None if no frog ever
+    reached one), the number of deaths for each lane type, and the number of deaths
+    in each cell 'column,row' of the level.
+
+    Parameter outcomes: the outcomes of the episodes
+    Precondition: outcomes is a list of outcomes (see run_episode)
+    """
+    counts = {'win': 0, 'loss': 0, 'timeout': 0}
+    lives = 0
+    firsts = []
+    causes = {}
+    cells = {}
+    for outcome in outcomes:
+        counts[outcome['result']] = counts[outcome['result']]+1
+        lives = lives+outcome['lives']
+        if outcome['exits']:
+            firsts.append(outcome['exits'][0])
+        for x, y, cause in outcome['deaths']:
+            causes[cause] = causes.get(cause, 0)+1
+            cell = '%d,%d' % (x//GRID_SIZE, y//GRID_SIZE)
+            cells[cell] = cells.get(cell, 0)+1
+    count = len(outcomes)
+    return {'episodes': count, 'wins': counts['win'], 'losses': counts['loss'],
+            'timeouts': counts['timeout'],
+            'lives': lives/count if count else None,
+            'first_exit': sum(firsts)/len(firsts) if firsts else None,
+            'causes': causes, 'cells': cells}
+
+
+def _initworker(objects, levels, speed, limit):
+    """
+    Keeps the data of the batch in this worker process.
+
+    This is the initializer of every process of the pool, so the data is sent once
+    per process.
+
+    Parameter objects: A json dictionary of objects
+    Precondition: objects is a valid objects json
+
+    Parameter levels: the levels of the batch
+    Precondition: levels is a dictionary (or a LevelSet, see levelpack.py) from
+    names to valid level jsons
+
+    Parameter speed: The number of seconds a frog jump takes
+    Precondition: speed is a number > 0
+
+    Parameter limit: the largest number of ticks in an episode
+    Precondition: limit is an int > 0
+    """
+    global _worker
+    _worker = (objects, levels, speed, limit)
+
+
+def _runjob(job):
+    """
+    Returns the outcome of a job (level, policy, seed) in this worker process.
+
+    The outcome also has the name of the level, under 'level'.
+
+    Parameter job: the episode to run
+    Precondition: job is a tuple (level, policy, seed) where level is the name of a
+    level of the batch, and policy and seed are as in run_episode
+    """
+    objects, levels, speed, limit = _worker
+    level, policy, seed = job
+    outcome = run_episode(objects, levels[level], policy, seed, speed, limit)
+    outcome['level'] = level
+    return outcome
+
+
+class Batch(object):
+    """
+    A class representing a set of levels to run headless episodes on
+
+    The episodes of a batch run in a process pool, one process per core unless the
+    number of workers is given.  With one worker, they run in this process instead,
+    which is easier to debug.  The outcomes are returned in the order of the jobs,
+    and do not depend on the number of workers.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _objects: A json dictionary of objects
+    # Invariant: _objects is a valid objects json
+    #
+    # Attribute _levels: The levels of the batch
+    # Invariant: _levels is a dictionary (or a LevelSet, see levelpack.py) from
+    # names to valid level jsons
+    #
+    # Attribute _speed: The number of seconds a frog jump takes
+    # Invariant: _speed is a number > 0
+    #
+    # Attribute _limit: The largest number of ticks in an episode
+    # Invariant: _limit is an int > 0
+
+    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    def getLevels(self):
+        """
+        Returns the names of the levels of this batch, sorted
+        """
+        return sorted(self._levels)
+
+    def __init__(self, objects, levels, speed=TOOL_SPEED, limit=BATCH_LIMIT):
+        """
+        Initializes a batch for the given levels.
+
+        Parameter objects: A json dictionary of objects
+        Precondition: objects is a valid objects json
+
+        Parameter levels: the levels of the batch
+        Precondition: levels is a dictionary (or a LevelSet, see levelpack.py) from
+    names to valid level jsons
+
+        Parameter speed: The number of seconds a frog jump takes
+        Precondition: speed is a number > 0
+
+        Parameter limit: the largest number of ticks in an episode
+        Precondition: limit is an int > 0
+        """
+        self._objects = objects
+        self._levels = levels
+        self._speed = speed
+        self._limit = limit
+
+    def run(self, jobs, workers=None):
+        """
+        Returns the list of outcomes of the jobs (see run_episode), in order.
+
+        Parameter jobs: the episodes to run
+        Precondition: jobs is a list of tuples (level, policy, seed), where level is
+        the name of a level of this batch and policy and seed are as in run_episode
+
+        Parameter workers: the number of processes, or None for one per core
+        Precondition: workers is None or an int > 0
+        """
+        data = (self._objects, self._levels, self._speed, self._limit)
+        if workers == 1:
+            _initworker(*data)
+            return [_runjob(job) for job in jobs]
+        if workers is None:
+            workers = os.cpu_count() or 1
+        chunk = max(1, len(jobs)//(4*workers))
+        with ProcessPoolExecutor(workers, initializer=_initworker,
+                                 initargs=data) as executor:
+            return list(executor.map(_runjob, jobs, chunksize=chunk))
+
+
+def main(args):
+    """
+    Runs a batch of episodes on the given levels, and prints the summary as JSON.
+
+    Parameter args: the command line arguments (without the program name)
+    Precondition: args is a list of strings
+    """
+    parser = argparse.ArgumentParser(description='Run headless Froggit episodes')
+    parser.add_argument('levels', nargs='+', help='level json files or packs')
+    parser.add_argument('--objects', default=None,
+                        help='objects json (default: from the pack, or OBJECT_DATA)')
+    parser.add_argument('--episodes', type=int, default=100)
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='random')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--speed', type=float, default=TOOL_SPEED,
+                        help='seconds per frog jump')
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args(args)
+    names, levels = load_levels(options.levels)
+    objects = None
+    if options.objects is None:
+        objects = levels.getObjects()
+    if objects is None:
+        objects = load_json(OBJECT_DATA if options.objects is None else options.objects)
+    batch = Batch(objects, levels, options.speed)
+    policy = POLICIES[options.policy]
+    jobs = []
+    for name in names:
+        for episode in range(options.episodes):
+            jobs.append((name, policy, options.seed+episode))
+    start = time.perf_counter()
+    outcomes = batch.run(jobs, options.workers)
+    seconds = time.perf_counter()-start
+    levels.close()
+    report = {}
+    for name in names:
+        report[name] = aggregate([x for x in outcomes if x['level'] == name])
+    report['speed'] = options.speed
+    report['seconds'] = seconds
+    report['ticks_per_second'] = sum(x['ticks'] for x in outcomes)/seconds
+    print(json.dumps(report, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
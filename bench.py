@@ -0,0 +1,740 @@
+"""
+Benchmark module for Froggit
+
+This module times a headless Level on synthetic levels of increasing size, so that we
+can see how the cost of a frame grows with the level, and compare revisions.
+
+The levels are generated in the same format as the level files (see easy1.json), from
+a seed, so every run benchmarks exactly the same levels.  They scale the number of
+lanes, the number of obstacles per lane and the fraction of water lanes.  The objects
+data (hitboxes) is generated as well, so the benchmark does not depend on the files
+installed with the game.
+
+For each level this module times the initializer, update and draw of Level, and the
+collision helpers of Level on their own.  It reports the mean, median (p50) and 99th
+percentile (p99) of each in milliseconds.  Frames are also replayed under tracemalloc
+to report the number of bytes allocated (at peak) and the memory blocks kept per
+frame.  The results are written as JSON, so two revisions can be compared with diff.
+
+With --check-hitboxes, the compiled hitboxes (see contains in Lane) are also checked
+against contains of the objects themselves, at random points around the objects, on
+every level.  The mismatches are counted, and the benchmark fails if there are any.
+With --check-geometry, both are checked against the geometry of game2d itself (see
+game2d_contains), with hitboxes that are not centered on objects turned by 0 and 180
+degrees, and at points exactly on the edges of the hitboxes.
+
+With --check-positions, the positions computed by getPositionsAt (in Traffic) are
+checked against the positions after advancing frame by frame, on random lanes with
+objects that start inside the bounds, exactly on them, and outside them.  Here too, the
+benchmark fails if any position is different.
+
+With --check-vecenv, a VecEnv (see vecenv.py) is checked against headless Levels given
+the same actions, on a synthetic level, on the same level without exits, and on a level
+without obstacles.  It fails if a frog, a life, a result or an obstacle is different.
+
+With --check-batch, batch.py is run on a synthetic level with its arguments in two
+orders, options first and level first.  Both runs must use TOOL_SPEED and give the same
+outcomes, so that the arguments of batch.py are never read as those of the game.
+
+To run the benchmark, type
+
+    python bench.py [--lanes 10 100 1000] [--objects 2 8] [--water 0 0.5]
+                    [--frames 300] [--vectorized] [--window 13] [--output FILE]
+                    [--check-hitboxes] [--check-positions] [--check-vecenv]
+                    [--check-batch] [--check-geometry]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from consts import *
+from level  import *
+from profiler import summarize
+from replay import Keys
+from vecenv import VecEnv, ACTIONS
+from introcs import Matrix
+try:
+    import numpy
+except ImportError:
+    numpy = None    # Only check_vecenv needs it
+
+# The width of every synthetic level, in grid squares
+BENCH_WIDTH = 16
+# The obstacle types, with their width in grid squares
+BENCH_CARS = (('car1', 1), ('car3', 1), ('car5', 1), ('trailer1', 2))
+# The log types, with their width in grid squares
+BENCH_LOGS = (('log2', 2), ('log3', 3))
+# The seconds a frog jump takes (TOOL_SPEED, as consts.py reads FROG_SPEED from argv)
+BENCH_SPEED = TOOL_SPEED
+# The key masks for the frog (see Keys): mostly up or waiting, sometimes sideways
+BENCH_MOVES = (4, 4, 4, 0, 0, 0, 1, 2, 8)
+# The objects and the points around each of them checked per frame by checkHitboxes
+BENCH_CHECKS = (16, 4)
+# The random lanes and the frames advanced in each by check_positions
+BENCH_TRIALS = (200, 400)
+# The environments and the ticks of each level in check_vecenv
+BENCH_ENVS = (4, 1500)
+# Hitboxes that are not centered (one with its corners the other way around), so that
+# turning them by 180 degrees moves them, for check_geometry
+BENCH_SKEWED = {'car1': [-28, -18, 24, 22], 'log3': [-90, -20, 86, 16],
+                'trailer1': [58, 14, -62, -26]}
+# The x positions (in grid squares) of the objects in check_geometry: on the grid, on
+# a fraction that a float32 holds exactly, and on one that it does not
+BENCH_PLACES = (2, 6.375, 10.3)
+
+
+def make_objects():
+    """
+    Returns a json dictionary of objects for the synthetic levels.
+
+    Every object has a hitbox a little smaller than its size, like in the game.
+    """
+    images = {}
+    for kind, size in BENCH_CARS+BENCH_LOGS:
+        half = size*GRID_SIZE//2-4
+        images[kind] = {'size': [size, 1], 'hitbox': [-half, -24, half, 24]}
+    for kind in ('exit', 'open'):
+        images[kind] = {'size': [1, 1], 'hitbox': [-30, -30, 30, 30]}
+    frog = {'file': 'frog2.png', 'size': [1, 1], 'format': [1, 5],
+            'hitboxes': [[-20, -20, 20, 20]]*5}
+    skulls = {'file': 'skulls.png', 'size': [1, 1], 'format': [1, 8]}
+    return {'images': images, 'sprites': {'frog': frog, 'skulls': skulls}}
+
+
+def make_level(lanes, objects, water, seed=0):
+    """
+    Returns a json dictionary for a synthetic level.
+
+    The first lane is grass (with the start) and the last is a hedge with an exit in
+    every fourth column.  Every fourth lane in between is grass, and the others are
+    water with the given probability, and road otherwise.
+
+    Parameter lanes: the number of lanes
+    Precondition: lanes is an int >= 2
+
+    Parameter objects: the number of obstacles per road or water lane
+    Precondition: objects is an int in range(1, BENCH_WIDTH//3+1)
+
+    Parameter water: the fraction of water lanes
+    Precondition: water is a float in [0,1]
+
+    Parameter seed: the random seed
+    Precondition: seed is an int
+    """
+    rng = random.Random(seed)
+    result = [{'type': 'grass'}]
+    for row in range(1, lanes-1):
+        if row % 4 == 0:
+            result.append({'type': 'grass'})
+            continue
+        kind = 'water' if rng.random() < water else 'road'
+        types = BENCH_LOGS if kind == 'water' else BENCH_CARS
+        speed = rng.choice((-1, 1))*rng.randint(40, 160)
+        slots = rng.sample(range(BENCH_WIDTH//3), objects)
+        items = []
+        for slot in sorted(slots):
+            items.append({'type': rng.choice(types)[0], 'position': slot*3})
+        result.append({'type': kind, 'speed': speed, 'objects': items})
+    exits = []
+    for column in range(BENCH_WIDTH):
+        exits.append({'type': 'exit' if column % 4 == 2 else 'open', 'position': column})
+    result.append({'type': 'hedge', 'objects': exits})
+    return {'version': 1.0, 'size': [BENCH_WIDTH, lanes], 'start': [BENCH_WIDTH//2, 0],
+            'offscreen': 2, 'lanes': result}
+
+
+def check_positions(vectorized=False, seed=0):
+    """
+    Returns a dictionary comparing getPositionsAt of a Traffic with advance.
+
+    Each trial makes a lane of random width, margin and speed (sometimes 0), with
+    objects that start at random, exactly on a bound, or outside the bounds.  One
+    Traffic is advanced frame by frame with a random dt, and the positions after
+    each frame are compared with getPositionsAt of a second Traffic, asked for the
+    frames in a random order.  'tests' is the number of positions compared and
+    'mismatches' the number that are not exactly the same.
+
+    Parameter vectorized: whether to move the objects with NumPy
+    Precondition: vectorized is a boolean
+
+    Parameter seed: the random seed
+    Precondition: seed is an int
+    """
+    rng = random.Random(seed)
+    tests = 0
+    mismatches = 0
+    for trial in range(BENCH_TRIALS[0]):
+        width = rng.randint(3, BENCH_WIDTH)
+        margin = rng.randint(0, 3)
+        speed = rng.choice((0, rng.randint(-200, 200), rng.uniform(-300, 300)))
+        dt = rng.choice((1/60, 1/30, rng.uniform(0.001, 0.2)))
+        # Positions are in grid squares, from the middle of a square
+        low = -margin-0.5
+        high = width+margin-0.5
+        starts = [low, high, rng.uniform(low, high), rng.uniform(low-30, low),
+                  rng.uniform(high, high+30), rng.randint(-margin, width+margin-1)]
+        objects = [{'type': 'car1', 'position': x} for x in starts]
+        json = {'offscreen': margin, 'lanes': [{'type': 'road', 'speed': speed,
+                                                'objects': objects}]}
+        moved = Traffic(json, width*GRID_SIZE, vectorized)
+        computed = Traffic(json, width*GRID_SIZE, vectorized)
+        frames = [moved.getPositions(0, moved.size())]
+        for frame in range(rng.randint(1, BENCH_TRIALS[1])):
+            moved.advance(dt)
+            frames.append(moved.getPositions(0, moved.size()))
+        # The first half in order (each frame stepped once), then the rest at random
+        half = len(frames)//2
+        later = list(range(half, len(frames)))
+        rng.shuffle(later)
+        order = list(range(half))+later
+        for n in order:
+            positions = computed.getPositionsAt(n*dt, dt)
+            for a, b in zip(positions, frames[n]):
+                tests = tests+1
+                if a != b:
+                    mismatches = mismatches+1
+    return {'tests': tests, 'mismatches': mismatches}
+
+
+def check_vecenv(objects, seed=0):
+    """
+    Returns a dictionary comparing a VecEnv with headless Levels.
+
+    Three levels are checked: a synthetic level (see make_level), the same level
+    with only opens in its hedge (so it has no exits), and a level with no objects
+    at all.  Each is played by the environments of a VecEnv and by one headless
+    Level for each environment, with the same random actions.  Like a VecEnv, a
+    Level gets its frog back at once after a death or an exit, and is made again
+    when its game is over.  'tests' is the number of ticks compared and
+    'mismatches' the number where the result, the frog, the lives or an obstacle
+    is different.
+
+    The death of a Level is hidden; it is cleared here directly, because a
+    VecEnv has no death animation.  This function needs NumPy.
+
+    Parameter objects: A json dictionary of objects
+    Precondition: objects is a valid objects json
+
+    Parameter seed: the random seed
+    Precondition: seed is an int
+    """
+    level = make_level(9, 3, 0.4, seed)
+    closed = json.loads(json.dumps(level))
+    closed['lanes'][-1]['objects'] = [{'type': 'open', 'position': column}
+                                      for column in range(BENCH_WIDTH)]
+    empty = {'version': 1.0, 'size': [BENCH_WIDTH, 5], 'start': [BENCH_WIDTH//2, 0],
+             'offscreen': 2, 'lanes': [{'type': 'grass'}, {'type': 'road', 'speed': 60},
+             {'type': 'water', 'speed': -60}, {'type': 'grass'}, {'type': 'hedge'}]}
+    masks = [0]+[1 << REPLAY_KEYS.index(name) for name in ACTIONS[1:]]
+    rng = random.Random(seed)
+    dt = 1.0/60
+    tests = 0
+    mismatches = 0
+    for data in (level, closed, empty):
+        size = data['size']
+        width = size[0]*GRID_SIZE
+        height = (size[1]*GRID_SIZE)+GRID_SIZE
+        env = VecEnv(objects, data, BENCH_ENVS[0], BENCH_SPEED, dt)
+        levels = [Level(objects, data, width, height, True, speed=BENCH_SPEED)
+                  for k in range(BENCH_ENVS[0])]
+        keys = Keys()
+        for tick in range(BENCH_ENVS[1]):
+            actions = [rng.choice((0, 0, 1, 2, 3, 3, 4)) for k in range(BENCH_ENVS[0])]
+            env.step(numpy.array(actions))
+            fx, fy = env.getFrogs()
+            for k in range(BENCH_ENVS[0]):
+                keys.mask = masks[actions[k]]
+                levels[k].update(keys, dt)
+                result = 1 if levels[k].getWinStatus() == 'win' else 0
+                if levels[k].getFrog() is None:
+                    if levels[k].getReachexit() == 'yes':
+                        levels[k].setReachexit(None)
+                    else:
+                        levels[k]._death = None
+                        levels[k].setFroglives(levels[k].getFroglives()[:-1])
+                    if levels[k].livescounter() == 'done':
+                        result = -1
+                    levels[k].setFrog(levels[k].getFrogstartX(),
+                                      levels[k].getFrogstartY())
+                if result != 0:
+                    levels[k] = Level(objects, data, width, height, True,
+                                      speed=BENCH_SPEED)
+                frog = levels[k].getFrog()
+                traffic = levels[k]._traffic
+                xs = [traffic.getX(i) for i in range(traffic.size())]
+                tests = tests+1
+                if (env.getResults()[k] != result or fx[k] != frog.x or
+                    fy[k] != frog.y or env.getLives()[k] != len(levels[k].getFroglives())
+                    or env.getObstacles()[k].tolist() != xs):
+                    mismatches = mismatches+1
+    return {'tests': tests, 'mismatches': mismatches}
+
+
+class Bench(object):
+    """
+    A class representing one benchmark run on one synthetic level
+
+    The frog is driven by a seeded random sequence of key masks, and it is put back at
+    the start (with all lives restored) whenever it dies, reaches an exit or runs out
+    of lives.  So every frame runs the full Level.update, including collisions.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _objects: A json dictionary of objects
+    # Invariant: _objects is a valid objects json
+    #
+    # Attribute _json: A json dictionary with level information
+    # Invariant: _json is a valid level json
+    #
+    # Attribute _vectorized: whether the level moves obstacles with NumPy
+    # Invariant: _vectorized is a boolean
+    #
+    # Attribute _frames: the number of frames to time
+    # Invariant: _frames is an int > 0
+    #
+    # Attribute _window: the number of lanes in the window, or None for all
+    # Invariant: _window is None or an int > 0
+
+    def __init__(self, objects, json, frames, vectorized=False, window=None):
+        """
+        Initializes a benchmark on a level.
+
+        Parameter objects: A json dictionary of objects
+        Precondition: objects is a valid objects json
+
+        Parameter json: A json dictionary with level information
+        Precondition: json is a valid level json
+
+        Parameter frames: the number of frames to time
+        Precondition: frames is an int > 0
+
+        Parameter vectorized: whether to move the obstacles with NumPy
+        Precondition: vectorized is a boolean
+
+        Parameter window: the number of lanes in the window (so a taller level
+        scrolls), or None to show the whole level
+        Precondition: window is None or an int > 0
+        """
+        self._objects = objects
+        self._json = json
+        self._frames = frames
+        self._vectorized = vectorized
+        self._window = window
+
+    def run(self):
+        """
+        Returns a dictionary with the timings of this benchmark.
+        """
+        builds = []
+        for i in range(5):
+            start = time.perf_counter()
+            level = self._build()
+            builds.append(time.perf_counter()-start)
+        result = {'init': summarize(builds)}
+        result.update(self._frameTimes(self._build()))
+        result['memory'] = self._frameMemory(self._build())
+        return result
+
+    def checkHitboxes(self):
+        """
+        Returns a dictionary comparing the compiled hitboxes of the level with
+        contains.
+
+        The level is played as in run. After each frame, a few objects are picked
+        at random (see BENCH_CHECKS), and random points around each of them are
+        tested with contains of its lane, which uses the compiled hitbox, and with
+        contains of its GImage, which turns the point by the angle of the object.
+        The frog is tested against every object near it as well. 'tests' is the
+        number of points tested and 'mismatches' the number of different answers,
+        and 'compiled' and 'contains' are the seconds each kind of test took.
+
+        The lanes of a level are hidden; they are used here directly, because
+        this is the only way to test them on their own.
+        """
+        level = self._build()
+        keys = Keys()
+        rng = random.Random(1)
+        lives = level.getFroglives()[:]
+        traffic = level._traffic
+        tests = 0
+        mismatches = 0
+        compiled = 0.0
+        contains = 0.0
+        clock = time.perf_counter
+        for frame in range(self._frames):
+            self._step(level, keys, rng, lives)
+            checks = []
+            count = min(BENCH_CHECKS[0], traffic.size())
+            for i in rng.sample(range(traffic.size()), count):
+                left, bottom, right, top = level._lanes[traffic.getRow(i)].getBounds(i)
+                y = (traffic.getRow(i)*GRID_SIZE)+(GRID_SIZE//2)
+                for j in range(BENCH_CHECKS[1]):
+                    checks.append((i, (traffic.getX(i)+rng.uniform(left-8, right+8),
+                                       y+rng.uniform(bottom-8, top+8))))
+            frog = level.getFrog()
+            if frog is not None:
+                for i in level._getNearby((frog.x, frog.y)):
+                    checks.append((i, (frog.x, frog.y)))
+            for i, point in checks:
+                lane = level._lanes[traffic.getRow(i)]
+                start = clock()
+                fast = lane.contains(i, point)
+                compiled = compiled+clock()-start
+                object = lane.getObject(i)
+                start = clock()
+                slow = object.contains(point)
+                contains = contains+clock()-start
+                tests = tests+1
+                if fast != slow:
+                    mismatches = mismatches+1
+        return {'tests': tests, 'mismatches': mismatches, 'compiled': compiled,
+                'contains': contains}
+
+    def _build(self):
+        """
+        Returns a new headless Level for the benchmark.
+        """
+        size = self._json['size']
+        level = Level(self._objects, self._json, size[0]*GRID_SIZE,
+        (size[1]*GRID_SIZE)+GRID_SIZE, True, self._vectorized, BENCH_SPEED)
+        if self._window is not None and self._window < size[1]:
+            level.setViewHeight((self._window*GRID_SIZE)+GRID_SIZE)
+        return level
+
+    def _step(self, level, keys, rng, lives):
+        """
+        Updates the level for one frame, and restores the frog if needed.
+
+        Parameter level: the level to update
+        Precondition: level is a headless Level
+
+        Parameter keys: the keyboard for the level
+        Precondition: keys is a Keys object
+
+        Parameter rng: the source of the key masks
+        Precondition: rng is a random.Random object
+
+        Parameter lives: the lives of the level when it was created
+        Precondition: lives is a list of GImages
+        """
+        keys.mask = rng.choice(BENCH_MOVES)
+        result = level.update(keys, 1.0/60)
+        if (result == 'dead' or level.getReachexit() == 'yes' or
+            level.livescounter() == 'done'):
+            level.setReachexit(None)
+            level.setFroglives(level.getFroglives() or lives[:])
+            level.setFrog(level.getFrogstartX(), level.getFrogstartY())
+
+    def _frameTimes(self, level):
+        """
+        Returns a dictionary with the timings of update, draw and the collision
+        helpers of the level.
+
+        The collision helpers are hidden methods of Level; they are called here
+        directly, after each update, because this is the only way to time them on
+        their own. They are called with the frog where update left it, so they do
+        not change the game (except in the rare frame when a frog on the edge of a
+        log is pushed off it).
+
+        Parameter level: the level to time
+        Precondition: level is a headless Level
+        """
+        names = ('update', 'draw', 'roadDeath', 'logride', 'collideNorth',
+                 'collideSouth', 'collideEastorWest')
+        times = {}
+        for name in names:
+            times[name] = []
+        keys = Keys()
+        rng = random.Random(1)
+        lives = level.getFroglives()[:]
+        clock = time.perf_counter
+        for frame in range(self._frames):
+            start = clock()
+            self._step(level, keys, rng, lives)
+            times['update'].append(clock()-start)
+            start = clock()
+            level.draw(None)
+            times['draw'].append(clock()-start)
+            frog = level.getFrog()
+            if frog is None or frog.getAnimator() is not None:
+                continue
+            for name, helper in (('roadDeath', level._roadDeath),
+                                 ('collideNorth', level._collideNorth),
+                                 ('collideSouth', level._collideSouth),
+                                 ('collideEastorWest', level._collideEastorWest)):
+                start = clock()
+                helper()
+                times[name].append(clock()-start)
+            start = clock()
+            level._logride(0)
+            times['logride'].append(clock()-start)
+        result = {}
+        for name in names:
+            if times[name]:
+                result[name] = summarize(times[name])
+        return result
+
+    def _frameMemory(self, level):
+        """
+        Returns a dictionary with the memory allocated by update per frame.
+
+        'peak_bytes' is the mean of the largest amount of memory that each frame
+        allocated at one time, and 'kept_blocks' is the mean number of memory blocks
+        that each frame left allocated.
+
+        Parameter level: the level to measure
+        Precondition: level is a headless Level
+        """
+        keys = Keys()
+        rng = random.Random(1)
+        lives = level.getFroglives()[:]
+        frames = min(self._frames, 100)
+        peaks = 0
+        blocks = sys.getallocatedblocks()
+        tracemalloc.start()
+        for frame in range(frames):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            self._step(level, keys, rng, lives)
+            peaks = peaks+tracemalloc.get_traced_memory()[1]-before
+        tracemalloc.stop()
+        blocks = sys.getallocatedblocks()-blocks
+        return {'peak_bytes': peaks/frames, 'kept_blocks': blocks/frames}
+
+
+def check_batch(objects, seed=0):
+    """
+    Returns a dictionary comparing two runs of batch.py from the command line.
+
+    The runs are on the same synthetic level (see make_level), with the options
+    before the level in the first run, and after it in the second.  In the first
+    run, the second and third arguments are an option value and an option, which
+    consts.py would read as the speed and replay file of the game.  'tests' is the
+    number of runs, and 'mismatches' the number of runs whose speed is not
+    TOOL_SPEED, plus one if the outcomes of the runs are different.
+
+    Parameter objects: A json dictionary of objects
+    Precondition: objects is a valid objects json
+
+    Parameter seed: the random seed
+    Precondition: seed is an int
+    """
+    program = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'batch.py')
+    options = ['--episodes', '3', '--workers', '1', '--seed', str(seed)]
+    reports = []
+    with tempfile.TemporaryDirectory() as folder:
+        level = os.path.join(folder, 'level.json')
+        table = os.path.join(folder, 'objects.json')
+        with open(level, 'w') as file:
+            json.dump(make_level(9, 3, 0.4, seed), file)
+        with open(table, 'w') as file:
+            json.dump(objects, file)
+        for args in (options+['--objects', table, level],
+                     [level]+options+['--objects', table]):
+            output = subprocess.check_output([sys.executable, program]+args,
+                                             cwd=folder)
+            report = json.loads(output.decode('utf-8'))
+            del report['seconds']
+            del report['ticks_per_second']
+            reports.append(report)
+    mismatches = len([x for x in reports if x['speed'] != TOOL_SPEED])
+    if reports[0] != reports[1]:
+        mismatches = mismatches+1
+    return {'tests': len(reports), 'mismatches': mismatches}
+
+
+def game2d_contains(x, y, angle, hitbox, point):
+    """
+    Returns True if an object of game2d contains point, computed the way game2d does.
+
+    A GImage of game2d turns a point into its own coordinates with the inverse of its
+    transform, which is a Matrix of introcs (in float32), made by rotating by the
+    angle and then moving to the center.  The point is in the object if it is in the
+    hitbox in those coordinates, edges included.  This only uses introcs (which the
+    game needs anyway), so it runs without kivy.
+
+    Parameter x, y: the center of the object
+    Precondition: x and y are numbers
+
+    Parameter angle: the angle of the object in degrees
+    Precondition: angle is a number
+
+    Parameter hitbox: the hitbox of the object
+    Precondition: hitbox is a list [x0, y0, x1, y1] of two opposite corners
+
+    Parameter point: the point to check
+    Precondition: point is a tuple of two numbers
+    """
+    matrix = Matrix()
+    matrix.rotate(angle)
+    matrix.translate(x, y)
+    px, py, pz = matrix.inverse()._transform(point[0], point[1])
+    return (min(hitbox[0], hitbox[2]) <= px <= max(hitbox[0], hitbox[2]) and
+            min(hitbox[1], hitbox[3]) <= py <= max(hitbox[1], hitbox[3]))
+
+
+def check_geometry():
+    """
+    Returns a dictionary comparing contains of the lanes with the geometry of game2d.
+
+    A level has a road and a water lane going each way (so their objects are turned
+    by 0 or 180 degrees), with the hitboxes of BENCH_SKEWED at each of BENCH_PLACES.
+    Each object is tested at the corners and the middle of the edges of its hitbox,
+    turned by its angle, and half a pixel to either side of them, with contains of
+    its lane and of its GImage (a Box here), and with game2d_contains.  'tests' is
+    the number of points tested and 'mismatches' the number of answers of contains
+    that differ from game2d_contains.
+    """
+    objects = make_objects()
+    for kind, hitbox in BENCH_SKEWED.items():
+        objects['images'][kind]['hitbox'] = hitbox
+    lanes = [{'type': 'grass'}]
+    for kind, name in (('road', 'car1'), ('road', 'trailer1'), ('water', 'log3')):
+        for speed in (50, -50):
+            items = [{'type': name, 'position': place} for place in BENCH_PLACES]
+            lanes.append({'type': kind, 'speed': speed, 'objects': items})
+    lanes.append({'type': 'hedge', 'objects': [{'type': 'exit', 'position': 2}]})
+    data = {'version': 1.0, 'size': [BENCH_WIDTH, len(lanes)], 'start': [2, 0],
+            'offscreen': 2, 'lanes': lanes}
+    level = Level(objects, data, BENCH_WIDTH*GRID_SIZE, (len(lanes)+1)*GRID_SIZE, True)
+    traffic = level._traffic
+    tests = 0
+    mismatches = 0
+    for i in range(traffic.size()):
+        lane = level._lanes[traffic.getRow(i)]
+        hitbox = objects['images'][traffic.getKind(i)]['hitbox']
+        angle = 0 if traffic.getSpeed(i) >= 0 else 180
+        turn = 1 if angle == 0 else -1
+        x = traffic.getX(i)
+        y = (traffic.getRow(i)*GRID_SIZE)+(GRID_SIZE//2)
+        xs = (hitbox[0], (hitbox[0]+hitbox[2])/2, hitbox[2])
+        ys = (hitbox[1], (hitbox[1]+hitbox[3])/2, hitbox[3])
+        for dx in xs:
+            for dy in ys:
+                for sx in (-0.5, 0, 0.5):
+                    for sy in (-0.5, 0, 0.5):
+                        point = (x+turn*dx+sx, y+turn*dy+sy)
+                        expected = game2d_contains(x, y, angle, hitbox, point)
+                        tests = tests+2
+                        if lane.contains(i, point) != expected:
+                            mismatches = mismatches+1
+                        if lane.getObject(i).contains(point) != expected:
+                            mismatches = mismatches+1
+    return {'tests': tests, 'mismatches': mismatches}
+
+
+def revision():
+    """
+    Returns the git revision of this module, or None if it is not in git.
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(args):
+    """
+    Runs the benchmark for every combination of sizes and writes the results.
+
+    Parameter args: the command line arguments (without the program name)
+    Precondition: args is a list of strings
+    """
+    parser = argparse.ArgumentParser(description='Benchmark Level on synthetic levels')
+    parser.add_argument('--lanes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--objects', type=int, nargs='+', default=[2, 4])
+    parser.add_argument('--water', type=float, nargs='+', default=[0.0, 0.5])
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--vectorized', action='store_true')
+    parser.add_argument('--window', type=int, default=None,
+                        help='lanes in the window (taller levels scroll)')
+    parser.add_argument('-o', '--output', default=None, help='file for the JSON results')
+    parser.add_argument('--check-hitboxes', action='store_true',
+                        help='check the compiled hitboxes against contains')
+    parser.add_argument('--check-positions', action='store_true',
+                        help='check getPositionsAt against advancing frame by frame')
+    parser.add_argument('--check-vecenv', action='store_true',
+                        help='check VecEnv against headless levels')
+    parser.add_argument('--check-batch', action='store_true',
+                        help='check that batch.py reads its own arguments')
+    parser.add_argument('--check-geometry', action='store_true',
+                        help='check contains against the geometry of game2d')
+    options = parser.parse_args(args)
+    objects = make_objects()
+    results = []
+    mismatches = 0
+    positions = None
+    if options.check_positions:
+        positions = check_positions(options.vectorized, options.seed)
+        mismatches = mismatches+positions['mismatches']
+        print('positions: %d tests, %d mismatches' % (positions['tests'],
+              positions['mismatches']), file=sys.stderr)
+    vecenv = None
+    if options.check_vecenv:
+        vecenv = check_vecenv(objects, options.seed)
+        mismatches = mismatches+vecenv['mismatches']
+        print('vecenv: %d tests, %d mismatches' % (vecenv['tests'],
+              vecenv['mismatches']), file=sys.stderr)
+    batch = None
+    if options.check_batch:
+        batch = check_batch(objects, options.seed)
+        mismatches = mismatches+batch['mismatches']
+        print('batch: %d tests, %d mismatches' % (batch['tests'],
+              batch['mismatches']), file=sys.stderr)
+    geometry = None
+    if options.check_geometry:
+        geometry = check_geometry()
+        mismatches = mismatches+geometry['mismatches']
+        print('geometry: %d tests, %d mismatches' % (geometry['tests'],
+              geometry['mismatches']), file=sys.stderr)
+    for lanes in options.lanes:
+        for count in options.objects:
+            for water in options.water:
+                level = make_level(lanes, count, water, options.seed)
+                bench = Bench(objects, level, options.frames, options.vectorized,
+                              options.window)
+                result = {'lanes': lanes, 'objects': count, 'water': water}
+                result.update(bench.run())
+                results.append(result)
+                print('lanes=%-5d objects=%-2d water=%.2f  update p50=%.3fms p99=%.3fms'
+                      % (lanes, count, water, result['update']['p50'],
+                         result['update']['p99']), file=sys.stderr)
+                if options.check_hitboxes:
+                    check = bench.checkHitboxes()
+                    result['hitboxes'] = check
+                    mismatches = mismatches+check['mismatches']
+                    print('  hitboxes: %d tests, %d mismatches' % (check['tests'],
+                          check['mismatches']), file=sys.stderr)
+    report = {'revision': revision(), 'python': platform.python_version(),
+              'vectorized': options.vectorized, 'window': options.window,
+              'frames': options.frames,
+              'seed': options.seed, 'results': results}
+    if positions is not None:
+        report['positions'] = positions
+    if vecenv is not None:
+        report['vecenv'] = vecenv
+    if batch is not None:
+        report['batch'] = batch
+    if geometry is not None:
+        report['geometry'] = geometry
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if options.output is None:
+        print(text)
+    else:
+        with open(options.output, 'w') as file:
+            file.write(text+'\n')
+    if mismatches > 0:
+        sys.exit('The checked positions, hitboxes, geometry, environments or batches '
+                 'differ %d times' % mismatches)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,234 @@
+"""
+Campaign module for Froggit
+
+This module contains the class for playing a sequence of levels, one after the other.
+When a level is won, the game goes on to the next level of the campaign (with the lives
+that are left), and the game is only won when the last level is won.
+
+Loading a level takes time: its json file has to be read and parsed, its objects have
+to be compiled into a Traffic, and the images and sounds it uses have to be loaded.  Done
+all at once, between two frames, this makes the game stop for a moment.  So a campaign
+prepares each level before it is needed.  The json file is parsed (or read from the
+compiled level cache, see levelcache.py) and the Traffic is compiled on a worker
+thread, starting when the previous level starts (or, for the first level, when the
+campaign is created, while the title is shown).  The images and sounds
+are made on the main thread, as kivy requires, but only one per frame (see warm), while
+the previous level is being played.  When the level starts, only its lanes and frog
+are left to build.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from consts import *
+from lanes  import *
+from files  import load_json
+from levelcache import *
+
+
+def read(name, objects, cache=None):
+    """
+    Returns the tuple (objects, json) of a level file and its objects.
+
+    Parameter name: the level file
+    Precondition: name is a string naming a valid level json file
+
+    Parameter objects: the objects file
+    Precondition: objects is a string naming a valid objects json file
+
+    Parameter cache: the compiled levels, or None to parse the json files
+    Precondition: cache is a LevelCache or None
+    """
+    if cache is None:
+        return (load_json(objects), load_json(name))
+    return cache.load(name, objects)
+
+
+def make_traffic(json, compiled=None):
+    """
+    Returns a new Traffic for a level, compiled the way the game plays it.
+
+    The Traffic is vectorized if the level is taller than the window (see
+    _STATE_LOADING in app).
+
+    Parameter json: A json dictionary with level information
+    Precondition: json is a valid level json
+
+    Parameter compiled: the objects of the level, or None to compile them
+    Precondition: compiled is None or the objects of json read from a level cache
+    (see compile in LevelCache)
+    """
+    size = json['size']
+    return Traffic(json, size[0]*GRID_SIZE, size[1] > VIEW_LANES, compiled)
+
+
+def prepare(name, objects, cache=None):
+    """
+    Returns the tuple (objects, json, traffic, images, sounds) for a level file.
+
+    This function reads and compiles the level and its objects, and lists the image
+    and sound files it uses.  It does not make any image, so it may run on any
+    thread.  The Traffic is compiled by make_traffic, from the arrays in the cache
+    if there is one.
+
+    Parameter name: the level file
+    Precondition: name is a string naming a valid level json file
+
+    Parameter objects: the objects file
+    Precondition: objects is a string naming a valid objects json file
+
+    Parameter cache: the compiled levels, or None to parse the json files
+    Precondition: cache is a LevelCache or None
+    """
+    if cache is None:
+        objects, json = read(name, objects)
+        traffic = make_traffic(json)
+    else:
+        objects, json, compiled = cache.compile(name, objects)
+        traffic = make_traffic(json, compiled)
+    images = []
+    for lane in json['lanes']:
+        images.append(lane['type']+'.png')
+    for i in range(traffic.size()):
+        images.append(traffic.getKind(i)+'.png')
+    for sprite in objects['sprites'].values():
+        images.append(sprite['file'])
+    images.extend([FROG_SAFE, FROG_HEAD])
+    sounds = [CROAK_SOUND, SPLAT_SOUND, TRILL_SOUND]
+    return (objects, json, traffic, sorted(set(images)), sounds)
+
+
+class Campaign(object):
+    """
+    A class representing a sequence of levels to play in order
+
+    Call advance to get the next level, and warm once per frame while a level is
+    played.  A campaign with one level is just that level, loaded in the background.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _names: the level files of the campaign
+    # Invariant: _names is a non-empty list of strings
+    #
+    # Attribute _index: the index of the level being played
+    # Invariant: _index is an int in range(-1, len(_names)), -1 before advance
+    #
+    # Attribute _objects: the objects file
+    # Invariant: _objects is a string naming a valid objects json file
+    #
+    # Attribute _cache: the compiled levels
+    # Invariant: _cache is a LevelCache, or None if the json files are parsed
+    #
+    # Attribute _next: the preparation of the next level
+    # Invariant: _next is a Future for the result of prepare for level _index+1,
+    # or None if there is no next level
+    #
+    # Attribute _assets: the files of the next level that are not warm yet
+    # Invariant: _assets is a list of tuples (kind, file), where kind is 'image' or
+    # 'sound', or None if the next level is not prepared yet
+    #
+    # Attribute _executor: the worker thread preparing the levels
+    # Invariant: _executor is a ThreadPoolExecutor with one worker
+
+    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    def getIndex(self):
+        """
+        Returns the index of the level being played (-1 before the first level)
+        """
+        return self._index
+
+    def getName(self):
+        """
+        Returns the file of the level being played
+        """
+        return self._names[self._index]
+
+    def getCount(self):
+        """
+        Returns the number of levels in the campaign
+        """
+        return len(self._names)
+
+    def hasNext(self):
+        """
+        Returns True if there is a level after the one being played
+        """
+        return self._index+1 < len(self._names)
+
+    def __init__(self, names, objects=OBJECT_DATA, cache=None):
+        """
+        Initializes a campaign and starts preparing its first level.
+
+        Parameter names: the level files, in the order to play them
+        Precondition: names is a non-empty list of strings naming level json files
+
+        Parameter objects: the objects file
+        Precondition: objects is a string naming a valid objects json file
+
+        Parameter cache: the compiled levels, or None to parse the json files
+        Precondition: cache is a LevelCache or None
+        """
+        self._names = list(names)
+        self._objects = objects
+        self._cache = cache
+        self._index = -1
+        self._assets = None
+        self._executor = ThreadPoolExecutor(1)
+        self._next = self._executor.submit(prepare, self._names[0], objects, cache)
+
+    def advance(self):
+        """
+        Returns the tuple (objects, json, traffic) of the next level, and starts
+        preparing the level after it.
+
+        If the next level is not prepared yet, this method waits for it.  An error
+        reading the level (such as a missing file) is raised here.
+
+        Precondition: hasNext() is True
+        """
+        objects, json, traffic, images, sounds = self._next.result()
+        if self._assets is None:
+            Assets.warm(images, sounds)
+        else:
+            self.warm(len(self._assets))
+        self._index = self._index+1
+        self._assets = None
+        self._next = None
+        if self.hasNext():
+            self._next = self._executor.submit(prepare, self._names[self._index+1],
+                                               self._objects, self._cache)
+        return (objects, json, traffic)
+
+    def read(self):
+        """
+        Returns the tuple (objects, json) of the level being played, read again.
+
+        The files are read the same way as when the level was prepared, so the
+        two versions can be compared (see reload in Level).
+
+        Precondition: getIndex() >= 0
+        """
+        return read(self._names[self._index], self._objects, self._cache)
+
+    def warm(self, count=1):
+        """
+        Loads up to count images and sounds of the next level into the asset cache.
+
+        This does nothing until the next level is prepared.  It is meant to be
+        called once per frame, so that the assets of the next level are made a
+        few at a time, and never stop the game for long.
+
+        Parameter count: the largest number of files to load
+        Precondition: count is an int >= 0
+        """
+        if self._next is None or not self._next.done():
+            return
+        if self._next.exception() is not None:
+            return      # advance raises it
+        if self._assets is None:
+            objects, json, traffic, images, sounds = self._next.result()
+            self._assets = ([('image', x) for x in images]+
+                            [('sound', x) for x in sounds])
+        for i in range(min(count, len(self._assets))):
+            kind, source = self._assets.pop()
+            if kind == 'image':
+                Assets.warm([source], [])
+            else:
+                Assets.warm([], [source])
@@ -20,6 +20,12 @@ GAME_WIDTH  = 1024
 GAME_HEIGHT = 896
 # The size in pixels of a single grid square
 GRID_SIZE    = 64
+# The most lanes shown at once; taller levels scroll to follow the frog (the window
+# also has a row for the lives, so this fills GAME_HEIGHT)
+VIEW_LANES   = 13
+# Whether to bake the parts of the screen that rarely change into textures (see
+# layers.py); if False, every layer draws its objects every frame
+BAKE_LAYERS  = True
 
 
 ### FROG CONSTANTS ###
@@ -28,6 +34,9 @@ GRID_SIZE    = 64
 FROG_IMAGE  = 'frog1.png'
 # The number of seconds that frog movement takes
 FROG_SPEED  = 0.25
+# The frog speed of the tools (like batch.py), which is FROG_SPEED as it is before it is
+# read from sys.argv below, since the arguments of a tool are not those of the game
+TOOL_SPEED  = FROG_SPEED
 # The image file for a frog that made it to safety
 FROG_SAFE   = 'safe.png'
 # The image file for a frog life
@@ -65,6 +74,13 @@ STATE_CONTINUE = 4
 # The state when the game is complete (won or lost)
 STATE_COMPLETE = 5
 
+# The number of fixed simulation steps (ticks) per second, or 0 to step once per frame
+TICK_RATE = 60
+# The most ticks to run in one frame; time beyond that is dropped after a long hitch
+MAX_TICKS = 8
+# Whether to draw obstacles between their last two ticks when frames and ticks differ
+INTERPOLATE = True
+
 
 ### FONT CONSTANTS ###
 
@@ -90,12 +106,49 @@ SPLAT_SOUND = 'splat.wav'
 TRILL_SOUND = 'trill.wav'
 
 
+### ASSET CONSTANTS ###
+
+# The memory (in bytes) that the asset cache may use before it evicts textures and sounds
+ASSET_MEMORY = 64*1024*1024
+# The memory (in bytes) charged to the asset cache for each sound (sizes are not exposed)
+SOUND_MEMORY = 256*1024
+
+
 ### JSON FILES ###
 
 # The default level file
 DEFAULT_LEVEL  = 'easy2.json'
+# The level files played one after the other (see campaign.py), from DEFAULT_LEVEL
+CAMPAIGN_LEVELS = [DEFAULT_LEVEL]
 # The object data (hitboxes) file
 OBJECT_DATA    = 'objects.json'
+# The level file name that starts the endless mode instead of a level (see endless.py)
+ENDLESS_LEVEL  = 'endless.json'
+# The seed of the lanes of the endless mode
+ENDLESS_SEED   = 0
+# The folder (next to the game) of the compiled levels, or None to always parse the json
+LEVEL_CACHE    = 'levelcache'
+# Whether to reload the level while it is played when its file or the object data is
+# saved (see watch.py)
+HOT_RELOAD     = False
+# The seconds of game time between two looks at the files for HOT_RELOAD
+RELOAD_INTERVAL = 0.5
+
+
+### REPLAY CONSTANTS ###
+
+# The file to record the game to, or None to not record
+REPLAY_FILE  = None
+# The keys that are recorded each tick, in bit order
+REPLAY_KEYS  = ('left', 'right', 'up', 'down', 's', 'c')
+
+
+### PROFILE CONSTANTS ###
+
+# The file to write the frame timings to (see profiler.py), or None to not profile
+PROFILE_FILE   = None
+# The number of frames the profiler keeps the timings of
+PROFILE_FRAMES = 600
 
 
 ### USE COMMAND LINE ARGUMENTS TO CHANGE DEFAULT LEVEL FILE AND FROG SPEED
@@ -107,17 +160,25 @@ everything after the word python. So if you start the game typing
 
 Python puts ['froggit', 'default.json', '1'] into sys.argv. Below, we take advantage of
 this fact to change the constant DEFAULT_LEVEL. This is the level file to be used when
-you start the game.
+you start the game.  It may also be several level files separated by commas (with no
+spaces), like easy1,easy2,hard1, which are played one after the other as a campaign.
 
 The second argument is the FROG_SPEED, which is the amount of time between move steps.
 A large value means a much slower moving frog.
+
+The third argument is the REPLAY_FILE.  If it is given, every key press of the game is
+recorded to that file, which can be played back with replay.py.  A replay is of a single
+level file, so a campaign of several levels and the endless mode are not recorded.
 """
 try:
-    file = sys.argv[1]
-    if file[-5:].lower() == '.json':
-        DEFAULT_LEVEL = file
-    else:
-        DEFAULT_LEVEL = file+'.json'
+    names = []
+    for file in sys.argv[1].split(','):
+        if file[-5:].lower() == '.json':
+            names.append(file)
+        else:
+            names.append(file+'.json')
+    DEFAULT_LEVEL = names[0]
+    CAMPAIGN_LEVELS = names
 except:
     pass # Use original value
 
@@ -127,5 +188,10 @@ try:
 except:
     pass # Use original value
 
+try:
+    REPLAY_FILE = sys.argv[3]
+except:
+    pass # Use original value
+
 
 ### ADD MORE CONSTANTS (PROPERLY COMMENTED) AS NECESSARY ###
@@ -0,0 +1,226 @@
+"""
+Endless module for Froggit
+
+This module contains the level for the endless mode of Froggit, in which there is no
+hedge to reach.  The lanes go on forever, and the game is to get as far as possible
+before the lives run out.
+
+The lanes are made up as the frog goes, in chunks of ENDLESS_CHUNK lanes.  A chunk is
+generated from the seed of the game and its index alone (see make_chunk), so the same
+seed always gives the same lanes, however fast or slow the frog is.  The first lane
+of every chunk is grass, and it is a checkpoint: once the frog has reached it, the
+frog starts there after a death.  The later chunks have faster cars, more cars, and
+more water.
+
+A chunk is generated in the same format as the lanes of a level file (see easy1.json),
+so it is built by the same code as any other lane (see extend in Level).  The chunks
+are generated in a background thread, ahead of the time they are needed, so the game
+never waits for one.  The level always has the chunk of the frog and ENDLESS_AHEAD
+chunks above it.  The chunks more than ENDLESS_BEHIND chunks below the checkpoint are
+removed from the level (see trim in Level), so the level never grows, no matter how far
+the frog goes.
+
+To play the endless mode, give ENDLESS_LEVEL as the level file when starting the game.
+"""
+import random
+from concurrent.futures import ThreadPoolExecutor
+from consts import *
+from level  import *
+
+# The number of lanes in a chunk
+ENDLESS_CHUNK = 8
+# The number of chunks kept above the chunk of the frog
+ENDLESS_AHEAD = 2
+# The number of chunks kept below the chunk of the checkpoint
+ENDLESS_BEHIND = 1
+# The width of the endless level, in grid squares
+ENDLESS_WIDTH = 12
+# The chunk after which the chunks get no harder
+ENDLESS_HARDEST = 12
+
+
+def make_chunk(objects, seed, index, width=ENDLESS_WIDTH):
+    """
+    Returns the list of lane dictionaries of a chunk of an endless level.
+
+    The lanes are in the format of the 'lanes' of a level file.  The first lane is
+    grass, and the others are road or water.  The chunk only depends on the seed and
+    the index, and it is harder when the index is larger (up to ENDLESS_HARDEST).
+    The cars and logs are the images of the objects json whose name has 'car',
+    'trailer' or 'log' in it.
+
+    Parameter objects: A json dictionary of objects
+    Precondition: objects is a valid objects json, with at least one car and one log
+
+    Parameter seed: the seed of the endless level
+    Precondition: seed is an int
+
+    Parameter index: the index of the chunk (0 is the first)
+    Precondition: index is an int >= 0
+
+    Parameter width: the width of the level, in grid squares
+    Precondition: width is an int > 0
+    """
+    rng = random.Random(seed*1000003+index)
+    images = objects['images']
+    cars = sorted([x for x in images if 'car' in x or 'trailer' in x])
+    logs = sorted([x for x in images if 'log' in x])
+    level = min(index, ENDLESS_HARDEST)
+    lanes = [{'type': 'grass'}]
+    for row in range(1, ENDLESS_CHUNK):
+        if rng.random() < 0.1+0.03*level:
+            kind = 'water'
+            types = logs
+            gaps = (1, 2+level//4)
+        else:
+            kind = 'road'
+            types = cars
+            gaps = (max(2, 6-level//2), 8)
+        speed = rng.randint(40+8*level, 100+12*level)
+        items = []
+        position = rng.randint(0, 2)
+        while position < width:
+            item = rng.choice(types)
+            items.append({'type': item, 'position': position})
+            position = position+images[item]['size'][0]+rng.randint(*gaps)
+        lanes.append({'type': kind, 'speed': rng.choice((-1, 1))*speed,
+                      'objects': items})
+    return lanes
+
+
+class EndlessLevel(Level):
+    """
+    A class representing a level that goes on forever
+
+    An endless level is a Level that adds chunks of lanes above the frog and removes
+    the chunks far below it as the frog moves on.  It is never won; the game ends
+    when the lives run out, and the score is the distance, the highest lane the frog
+    reached.
+
+    The chunks are only added and removed when the frog sits on a lane at the end of
+    an update, at lanes that only depend on where the frog is.  So an endless level
+    plays the same game for the same keys, like any other level.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _seed: the seed of the chunks
+    # Invariant: _seed is an int
+    #
+    # Attribute _base: the number of lanes removed below lane 0
+    # Invariant: _base is an int >= 0, a multiple of ENDLESS_CHUNK
+    #
+    # Attribute _next: the index of the next chunk to add
+    # Invariant: _next is an int > 0. The lanes of the level are those of the
+    # chunks in range(_base//ENDLESS_CHUNK, _next)
+    #
+    # Attribute _distance: the highest lane the frog reached, counting removed lanes
+    # Invariant: _distance is an int >= 0
+    #
+    # Attribute _pending: the chunks being generated
+    # Invariant: _pending is a dictionary from the index of a chunk to a Future for
+    # its lanes, for the chunks in range(_next, _next+ENDLESS_AHEAD)
+    #
+    # Attribute _executor: the background thread generating the chunks
+    # Invariant: _executor is a ThreadPoolExecutor with one worker
+
+    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    def getDistance(self):
+        """
+        Returns the highest lane the frog reached, counting removed lanes
+        """
+        return self._distance
+
+    def getBase(self):
+        """
+        Returns the number of lanes removed below the first lane of this level
+        """
+        return self._base
+
+    def __init__(self, objects, seed=0, width=ENDLESS_WIDTH, headless=False,
+                 vectorized=False, speed=FROG_SPEED):
+        """
+        Initializes an endless level with its first chunks.
+
+        The chunk of the frog and the ENDLESS_AHEAD chunks above it are generated
+        right away, and the chunks after them start generating in the background.
+
+        Parameter objects: A json dictionary of objects
+        Precondition: objects is a valid objects json, with at least one car and
+        one log
+
+        Parameter seed: the seed of the chunks
+        Precondition: seed is an int
+
+        Parameter width: the width of the level, in grid squares
+        Precondition: width is an int > 0
+
+        Parameter headless: whether to simulate without drawing or sound
+        Precondition: headless is a boolean
+
+        Parameter vectorized: whether to move the obstacles with NumPy
+        Precondition: vectorized is a boolean
+
+        Parameter speed: The number of seconds a frog jump takes
+        Precondition: speed is a number > 0
+        """
+        lanes = []
+        for index in range(ENDLESS_AHEAD+1):
+            lanes.extend(make_chunk(objects, seed, index, width))
+        json = {'version': 1.0, 'size': [width, len(lanes)],
+                'start': [width//2, 0], 'offscreen': 2, 'lanes': lanes}
+        super().__init__(objects, json, width*GRID_SIZE,
+                         (len(lanes)*GRID_SIZE)+GRID_SIZE, headless, vectorized, speed)
+        self._seed = seed
+        self._base = 0
+        self._next = ENDLESS_AHEAD+1
+        self._distance = 0
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(1)
+        self._prefetch()
+
+    def update(self, input, dt):
+        """
+        Updates the level (see update in Level), then adds and removes chunks.
+
+        Once the frog sits on the first lane of a chunk, that lane is the new
+        start of the frog.  The chunks up to ENDLESS_AHEAD above the chunk of
+        the frog are added, and the chunks more than ENDLESS_BEHIND below the
+        chunk of the start are removed.  A chunk that is not generated yet is
+        waited for, but it was started long before.
+
+        Parameter input: The keyboard input.
+        Precondition: input is a string that refers to the particular key
+        that the player presses.
+
+        Parameter dt: The time since the last animation frame.
+        Precondition: dt is an number >= 0
+        """
+        result = super().update(input, dt)
+        frog = self.getFrog()
+        if frog is None or frog.getAnimator() is not None:
+            return result
+        row = int(frog.y//GRID_SIZE)
+        self._distance = max(self._distance, self._base+row)
+        if row % ENDLESS_CHUNK == 0 and row > self.getFrogstartY():
+            self.setFrogstart(self.getFrogstartX(), row)
+        chunk = (self._base+row)//ENDLESS_CHUNK
+        with self.getProfiler().section('chunks'):
+            while self._next <= chunk+ENDLESS_AHEAD:
+                self.extend(self._pending.pop(self._next).result())
+                self._next = self._next+1
+                self._prefetch()
+            start = (self._base+self.getFrogstartY())//ENDLESS_CHUNK
+            count = (start-ENDLESS_BEHIND)*ENDLESS_CHUNK-self._base
+            if count > 0:
+                self.trim(count)
+                self._base = self._base+count
+        return result
+
+    def _prefetch(self):
+        """
+        Starts generating the ENDLESS_AHEAD chunks after the last chunk of the level.
+        """
+        for index in range(self._next, self._next+ENDLESS_AHEAD):
+            if index not in self._pending:
+                self._pending[index] = self._executor.submit(make_chunk,
+                    self._objects_json, self._seed, index, self._width//GRID_SIZE)
@@ -0,0 +1,41 @@
+"""
+Files module for Froggit
+
+This module finds and reads the json files of the game (the levels and the object
+data) outside of the Froggit app.  The app reads them with load_json in GameApp, but
+the tools (like replay.py, batch.py and solver.py) and the parts of the game that look
+at the files themselves (like the level cache and the watcher) have no app.  They use
+the functions here, which look for a file where the app would.
+
+This module only needs the standard library, so any module can import it.
+"""
+import json
+import os
+
+
+def find_json(name):
+    """
+    Returns the path of the given json file.
+
+    The file is looked for as given, then next to this module, and then in the Data
+    folder next to this module (where the game keeps its json files).
+
+    Parameter name: The json file name
+    Precondition: name is a string naming a json file
+    """
+    folder = os.path.dirname(os.path.abspath(__file__))
+    for path in (name, os.path.join(folder, name), os.path.join(folder, 'Data', name)):
+        if os.path.isfile(path):
+            return path
+    raise IOError('Cannot find the json file '+repr(name))
+
+
+def load_json(name):
+    """
+    Returns the json dictionary in the given file (see find_json).
+
+    Parameter name: The json file name
+    Precondition: name is a string naming a json file
+    """
+    with open(find_json(name)) as file:
+        return json.load(file)
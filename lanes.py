@@ -26,14 +26,760 @@ extra classes and are now sure where they would go, ask on Piazza and we will an
 Likita Gangireddy lg425
 12/21/2020
 """
-from game2d import *
+try:
+    from game2d import *
+except ImportError:
+    pass    # models.py provides plain geometry in place of game2d
+import bisect
 from consts import *
 from models import *
+try:
+    import numpy
+except ImportError:
+    numpy = None    # Traffic falls back to plain lists
 
 # PRIMARY RULE: Lanes are not allowed to access anything in any level.py or app.py.
 # They can only access models.py and const.py. If you need extra information from the
 # level object (or the app), then it should be a parameter in your method.
 
+
+def hitbox_bounds(hitbox, angle):
+    """
+    Returns the hitbox of an object turned by angle, as a tuple (left, bottom, right,
+    top) measured from the center of the object.
+
+    This is the box that contains in Box (or game2d) tests a point against, after it
+    turns the point into the coordinates of the object.  Since the angle is a multiple
+    of 90 degrees, the turned box is still lined up with the axes, so a point is in it
+    if it passes four comparisons, and nothing needs to be turned at all.
+
+    Parameter hitbox: the hitbox of the object
+    Precondition: hitbox is a list [x0, y0, x1, y1] of two opposite corners
+
+    Parameter angle: the angle of the object in degrees
+    Precondition: angle is a multiple of 90
+    """
+    x0 = min(hitbox[0], hitbox[2])
+    y0 = min(hitbox[1], hitbox[3])
+    x1 = max(hitbox[0], hitbox[2])
+    y1 = max(hitbox[1], hitbox[3])
+    turn = (angle//90) % 4
+    if turn == 0:
+        return (x0, y0, x1, y1)
+    if turn == 1:
+        return (-y1, x0, -y0, x1)
+    if turn == 2:
+        return (-x1, -y1, -x0, -y0)
+    return (y0, -x1, y1, -x0)
+
+
+class Traffic(object):
+    """
+    A class holding every object of a level in a compact runtime form
+
+    The level file describes objects lane by lane, and each object inherits its speed
+    from its lane.  Reading that structure every frame is wasteful, so a level is
+    compiled into a Traffic once, when it is loaded.  Object i of the level is then
+    described by entry i of a few flat lists: its type, its lane index, its speed and
+    its x position.  The objects of each lane are contiguous, in the order of the level
+    file.  Objects in lanes without a speed (such as the exits of a hedge) have speed 0.
+
+    Every object wraps around the same bounds: it leaves the level once it is offscreen
+    grid squares past either edge, and reappears at the opposite bound.
+
+    Updating a Traffic only touches these lists, so the cost of a frame depends on the
+    number of objects and not on the level file.
+
+    The positions at any time can also be computed from the starting positions, without
+    moving the objects (see getPositionsAt and isOccupiedAt), and a Traffic can jump to
+    any time with seek.  In continuous time, every object moves at a constant speed and
+    wraps around the same bounds, so its position is a periodic function of time, and is
+    computed directly.  In frames, the positions are stepped with the same code as
+    advance, so that they are exactly the positions of the game, rounding and all.  The
+    last frame computed is kept, so asking for the frames in order steps each one once.
+
+    Collision queries go through a spatial index.  The objects of each lane are kept
+    sorted by x, so finding the objects near a point means looking at one lane and
+    bisecting.  All objects in a lane share a speed, so they can only change order
+    when one of them wraps; the lane is sorted again the next time it is queried.
+    They also move by the same distance, so the positions kept when the lane was
+    sorted are still in order, and are only off by how far the lane moved since.  A
+    query shifts its bounds by that distance instead of reading every position again.
+
+    A Traffic can also be vectorized.  Then the speeds and positions are NumPy arrays
+    and every object is moved and wrapped by a handful of array operations per frame,
+    instead of a Python loop.  Both versions give exactly the same positions.  If
+    NumPy is not installed, a vectorized Traffic quietly uses the Python loop.
+
+    A level that never ends grows at the top and shrinks at the bottom as the frog
+    moves on (see endless.py).  So lanes can be added above the last lane with extend,
+    and the first lanes can be removed with trim, which numbers the rest again.  A run
+    of lanes can also be replaced by new lanes with replace, when a level file is
+    edited while it is played (see reload in Level).
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _kinds: the type of each object
+    # Invariant: _kinds is a list of strings, like 'car1' or 'exit'
+    #
+    # Attribute _rows: the lane index of each object
+    # Invariant: _rows is a list of ints, the same length as _kinds
+    #
+    # Attribute _speeds: the speed of each object in pixels per second
+    # Invariant: _speeds is a list of numbers (a NumPy array if _vectorized), the
+    # same length as _kinds
+    #
+    # Attribute _xs: the x position of the center of each object
+    # Invariant: _xs is a list of numbers (a NumPy array if _vectorized), the same
+    # length as _kinds
+    #
+    # Attribute _startxs: the x position of each object when the level was loaded
+    # (or when its lane was added, see extend)
+    # Invariant: _startxs is a list of numbers, the same length as _kinds
+    #
+    # Attribute _prevxs: the x position of each object before the last advance
+    # Invariant: _prevxs is a list of numbers (a NumPy array if _vectorized), the
+    # same length as _kinds
+    #
+    # Attribute _fastest: the largest speed of an object, in either direction
+    # Invariant: _fastest is a number >= 0
+    #
+    # Attribute _frame: the last positions computed by frames (see _positionsAt)
+    # Invariant: _frame is a tuple (dt, frames, xs), where xs are the positions (a
+    # list, or a NumPy array if _vectorized) after advancing frames times by dt from
+    # the starting positions, or None if none were computed since the lanes changed
+    #
+    # Attribute _moves: the number of times the objects were moved
+    # Invariant: _moves is an int >= 0, counting every advance, hold and seek
+    #
+    # Attribute _travel: the largest distance an object moved in the last advance
+    # Invariant: _travel is a number >= 0 (0 after hold or seek)
+    #
+    # Attribute _vectorized: whether the objects are moved with NumPy
+    # Invariant: _vectorized is a boolean, and False if NumPy is not installed
+    #
+    # Attribute _spans: the objects belonging to each lane
+    # Invariant: _spans is a list with one tuple (start, stop) for each lane in the
+    # level. The objects of lane i are the indices in range(start, stop)
+    #
+    # Attribute _order: the spatial index
+    # Invariant: _order is a list with one list for each lane in the level. The
+    # list for lane i holds the indices of its objects, sorted by x unless i is
+    # in _unsorted
+    #
+    # Attribute _keys: the x positions of the spatial index, to search it
+    # Invariant: _keys is a list with one list for each lane in the level. If lane
+    # i is not in _unsorted, _keys[i] is the list of the x positions of the objects
+    # in _order[i] when the lane was last sorted, in the same order
+    #
+    # Attribute _unsorted: the lanes whose order may be stale
+    # Invariant: _unsorted is a set of lane indices in which an object wrapped
+    # since the lane was last sorted
+    #
+    # Attribute _margin: the distance an object may travel beyond an edge
+    # Invariant: _margin is an int >= 0 (offscreen grid squares in pixels)
+    #
+    # Attribute _width: the width of the level
+    # Invariant: _width is an int > 0
+
+    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    def size(self):
+        """
+        Returns the number of objects in the level
+        """
+        return len(self._kinds)
+
+    def getKind(self, i):
+        """
+        Returns the type of object i, like 'car1' or 'exit'
+
+        Parameter i: the object index
+        Precondition: i is an int in range(size())
+        """
+        return self._kinds[i]
+
+    def getRow(self, i):
+        """
+        Returns the lane index of object i
+
+        Parameter i: the object index
+        Precondition: i is an int in range(size())
+        """
+        return self._rows[i]
+
+    def getSpeed(self, i):
+        """
+        Returns the speed of object i in pixels per second
+
+        Parameter i: the object index
+        Precondition: i is an int in range(size())
+        """
+        return self._speeds[i]
+
+    def getX(self, i):
+        """
+        Returns the x position of the center of object i
+
+        Parameter i: the object index
+        Precondition: i is an int in range(size())
+        """
+        return float(self._xs[i])
+
+    def getPreviousX(self, i):
+        """
+        Returns the x position of the center of object i before the last advance
+
+        If the object wrapped in the last advance, the position is moved by the
+        length it wraps over, so it is the position the object moved from in a
+        straight line (outside of the bounds).
+
+        Parameter i: the object index
+        Precondition: i is an int in range(size())
+        """
+        x = float(self._xs[i])
+        previous = float(self._prevxs[i])
+        length = self._width+2*self._margin
+        if x-previous > length/2:
+            previous = previous+length
+        elif previous-x > length/2:
+            previous = previous-length
+        return previous
+
+    def getMoves(self):
+        """
+        Returns the number of times the objects were moved (by advance, hold or
+        seek)
+
+        Positions read from this Traffic, and the positions before the last
+        advance, are still current as long as this number has not changed.
+        """
+        return self._moves
+
+    def getTravel(self):
+        """
+        Returns the largest distance an object moved in the last advance
+        """
+        return self._travel
+
+    def getPositions(self, start, stop, alpha=None):
+        """
+        Returns a new list with the x position of objects start to stop - 1
+
+        If alpha is given, each position is that fraction of the way from the
+        position before the last advance to the current one. An object that
+        wrapped in the last advance is at its current position.
+
+        Parameter start: the index of the first object
+        Precondition: start is an int in range(size()+1)
+
+        Parameter stop: the index after the last object
+        Precondition: stop is an int in range(start, size()+1)
+
+        Parameter alpha: the fraction of the last advance, or None
+        Precondition: alpha is None or a float in [0,1]
+        """
+        if self._vectorized:
+            positions = self._xs[start:stop].tolist()
+        else:
+            positions = self._xs[start:stop]
+        if alpha is None:
+            return positions
+        if self._vectorized:
+            previous = self._prevxs[start:stop].tolist()
+        else:
+            previous = self._prevxs[start:stop]
+        jump = (self._width+2*self._margin)/2
+        for i in range(len(positions)):
+            distance = positions[i]-previous[i]
+            if -jump < distance < jump:
+                positions[i] = previous[i]+alpha*distance
+        return positions
+
+    def getNearby(self, row, left, right):
+        """
+        Returns a sorted list of the indices of the objects in a lane whose center
+        is between left and right (inclusive).
+
+        Parameter row: the lane index
+        Precondition: row is an int (lanes outside the level have no objects)
+
+        Parameter left: the smallest x position to include
+        Precondition: left is a number
+
+        Parameter right: the largest x position to include
+        Precondition: right is a number >= left
+        """
+        if row < 0 or row >= len(self._order):
+            return []
+        if row in self._unsorted:
+            self._sort(row)
+        order = self._order[row]
+        if not order:
+            return []
+        keys = self._keys[row]
+        xs = self._xs
+        # The distance the lane moved since it was sorted.  Each object rounds its
+        # moves on its own, so the search is a pixel wider, and the objects found
+        # are checked against their positions.
+        moved = float(xs[order[0]])-keys[0]
+        start = bisect.bisect_left(keys, left-moved-1)
+        stop = bisect.bisect_right(keys, right-moved+1)
+        return sorted(i for i in order[start:stop] if left <= xs[i] <= right)
+
+    def isVectorized(self):
+        """
+        Returns True if the objects are moved with NumPy
+        """
+        return self._vectorized
+
+    def getSpan(self, row):
+        """
+        Returns the tuple (start, stop) of object indices in the given lane
+
+        Parameter row: the lane index
+        Precondition: row is a valid lane index of the level
+        """
+        return self._spans[row]
+
+    def getPositionsAt(self, t, dt=None):
+        """
+        Returns a new list with the x position of every object after t seconds of
+        motion from the start of the level.
+
+        If dt is None, the objects move continuously, and this takes the same
+        time for any t.  Otherwise, t is rounded to a whole number of frames of
+        length dt, and the positions are exactly those after advancing that many
+        times by dt, including the frame that an object waits when it wraps past
+        the right bound (see advance).  The frames since the last time asked for
+        (or since the start, for an earlier time or another dt) are stepped.
+
+        Parameter t: the time in seconds
+        Precondition: t is a number >= 0
+
+        Parameter dt: the length of a frame, or None
+        Precondition: dt is None or a number > 0
+        """
+        positions = self._positionsAt(t, dt)
+        if self._vectorized and dt is not None:
+            return positions.tolist()
+        return list(positions)
+
+    def isOccupiedAt(self, column, row, t, images, dt=None):
+        """
+        Returns True if an object covers the center of a cell at time t.
+
+        An object covers a point if the point is between the left and right edge of
+        its hitbox (which is turned around for objects moving left, like their
+        image).  The time and frames are as in getPositionsAt.
+
+        Parameter column: the column of the cell
+        Precondition: column is an int
+
+        Parameter row: the lane index of the cell
+        Precondition: row is an int (lanes outside the level have no objects)
+
+        Parameter t: the time in seconds
+        Precondition: t is a number >= 0
+
+        Parameter images: A json dictionary of images
+        Precondition: images is the 'images' dictionary of a valid objects json,
+        with a hitbox for every object in the lane
+
+        Parameter dt: the length of a frame, or None
+        Precondition: dt is None or a number > 0
+        """
+        if row < 0 or row >= len(self._spans):
+            return False
+        x = (column*GRID_SIZE)+(GRID_SIZE//2)
+        start, stop = self._spans[row]
+        positions = self._positionsAt(t, dt)
+        for i in range(start, stop):
+            hitbox = images[self._kinds[i]]['hitbox']
+            left = min(hitbox[0], hitbox[2])
+            right = max(hitbox[0], hitbox[2])
+            if self._speeds[i] < 0:
+                left, right = -right, -left
+            center = positions[i]
+            if center+left <= x <= center+right:
+                return True
+        return False
+
+    def __init__(self, json, width, vectorized=False, compiled=None):
+        """
+        Initializes the Traffic by compiling a level file.
+
+        A level read from the level cache was compiled already (see levelcache.py),
+        and its objects can be given as they were read, instead of being compiled
+        again from json.
+
+        Parameter json: A json dictionary with level information
+        Precondition: json is a valid json dictionary that provides information
+        about a particular level file.
+
+        Parameter width: The width of the level.
+        Precondition: width is an int that corresponds to the width of the level
+
+        Parameter vectorized: whether to move the objects with NumPy
+        Precondition: vectorized is a boolean
+
+        Parameter compiled: the objects of the level, or None to compile them
+        Precondition: compiled is None or a tuple (kinds, rows, speeds, xs, spans) of
+        lists for the objects of json, with the entries of _kinds, _rows, _speeds,
+        _startxs and _spans (see decode_level in levelcache.py)
+        """
+        self._vectorized = vectorized and numpy is not None
+        self._kinds = []
+        self._rows = []
+        self._speeds = []
+        self._xs = []
+        self._startxs = []
+        self._prevxs = []
+        self._spans = []
+        self._margin = json['offscreen']*GRID_SIZE
+        self._width = width
+        self._fastest = 0
+        self._travel = 0
+        self._moves = 0
+        self._frame = None
+        self._order = []
+        self._keys = []
+        self._unsorted = set()
+        if self._vectorized:
+            self._speeds = numpy.array(self._speeds, dtype=float)
+            self._xs = numpy.array(self._xs, dtype=float)
+            self._rowarray = numpy.array(self._rows, dtype=int)
+            self._prevxs = self._xs.copy()
+        if compiled is None:
+            self.extend(json['lanes'])
+        else:
+            self._splice(0, 0, *compiled)
+
+    def extend(self, lanes):
+        """
+        Adds lanes (and their objects) above the last lane of this Traffic.
+
+        The objects of the new lanes start at the positions given in the lanes,
+        and these are also their starting positions for getPositionsAt and seek
+        (so those only give the positions since the lanes were added).
+
+        Parameter lanes: the lanes to add, bottom first
+        Precondition: lanes is a list of lane dictionaries, as in the 'lanes' of
+        a valid level json
+        """
+        self.replace(len(self._spans), len(self._spans), lanes)
+
+    def replace(self, first, stop, lanes):
+        """
+        Replaces lanes first to stop-1 (and their objects) with the given lanes.
+
+        The objects of the new lanes start at the positions given in the lanes (as
+        in extend), and every other object stays where it is.  If the number of
+        lanes changes, the lanes above them are numbered again, and if the number
+        of objects changes, so are the objects above them.  Otherwise only the
+        entries of the lanes replaced are touched.
+
+        Parameter first: the first lane to replace
+        Precondition: first is an int in range(number of lanes+1)
+
+        Parameter stop: the lane after the last lane to replace
+        Precondition: stop is an int in range(first, number of lanes+1)
+
+        Parameter lanes: the new lanes, bottom first
+        Precondition: lanes is a list of lane dictionaries, as in the 'lanes' of
+        a valid level json
+        """
+        start = self._spans[first][0] if first < len(self._spans) else len(self._kinds)
+        kinds = []
+        rows = []
+        speeds = []
+        xs = []
+        spans = []
+        row = first
+        for item in lanes:
+            begin = start+len(kinds)
+            speed = item['speed'] if 'speed' in item else 0
+            if 'objects' in item:
+                for dictionary in item['objects']:
+                    kinds.append(dictionary['type'])
+                    rows.append(row)
+                    speeds.append(speed)
+                    x = (dictionary['position']*GRID_SIZE)+(GRID_SIZE//2)
+                    xs.append(x)
+            spans.append((begin, start+len(kinds)))
+            row = row+1
+        self._splice(first, stop, kinds, rows, speeds, xs, spans)
+
+    def _splice(self, first, stop, kinds, rows, speeds, xs, spans):
+        """
+        Replaces lanes first to stop-1 (and their objects) with compiled lanes.
+
+        This is replace, once the new lanes are compiled.
+
+        Parameter first: the first lane to replace
+        Precondition: first is an int in range(number of lanes+1)
+
+        Parameter stop: the lane after the last lane to replace
+        Precondition: stop is an int in range(first, number of lanes+1)
+
+        Parameter kinds, rows, speeds, xs: the type, lane index, speed and x
+        position of each new object
+        Precondition: these are lists of the same length, as in _kinds, _rows,
+        _speeds and _startxs, with lane indices from first
+
+        Parameter spans: the objects of each new lane
+        Precondition: spans is a list of tuples (start, stop), as in _spans
+        """
+        self._frame = None
+        start = self._spans[first][0] if first < len(self._spans) else len(self._kinds)
+        end = self._spans[stop][0] if stop < len(self._spans) else len(self._kinds)
+        row = first+len(spans)
+        shift = len(spans)-(stop-first)
+        delta = len(kinds)-(end-start)
+        self._kinds[start:end] = kinds
+        self._rows[start:end] = rows
+        self._startxs[start:end] = xs
+        if shift != 0:
+            for i in range(start+len(kinds), len(self._rows)):
+                self._rows[i] = self._rows[i]+shift
+            self._unsorted = set([r if r < first else r+shift for r in self._unsorted
+                                  if not first <= r < stop])
+        if delta != 0:
+            self._spans[stop:] = [(a+delta, b+delta) for a, b in self._spans[stop:]]
+            self._order[stop:] = [[i+delta for i in order]
+                                  for order in self._order[stop:]]
+        self._spans[first:stop] = spans
+        self._order[first:stop] = [list(range(a, b)) for a, b in spans]
+        self._keys[first:stop] = [[] for a, b in spans]
+        self._unsorted.update(range(first, row))
+        if self._vectorized:
+            added = numpy.array(xs, dtype=float)
+            self._speeds = numpy.concatenate((self._speeds[:start],
+                numpy.array(speeds, dtype=float), self._speeds[end:]))
+            self._xs = numpy.concatenate((self._xs[:start], added, self._xs[end:]))
+            self._prevxs = numpy.concatenate((self._prevxs[:start], added,
+                                              self._prevxs[end:]))
+            self._rowarray = numpy.array(self._rows, dtype=int)
+        else:
+            self._speeds[start:end] = speeds
+            self._xs[start:end] = xs
+            self._prevxs[start:end] = xs
+        if start < end:
+            # A removed object may have been the fastest
+            self._fastest = max([0]+[abs(speed) for speed in self._speeds])
+        else:
+            self._fastest = max([self._fastest]+[abs(speed) for speed in speeds])
+
+    def trim(self, count):
+        """
+        Removes the first count lanes (and their objects) from this Traffic.
+
+        The lanes and objects that are left are numbered again from 0, so lane
+        count becomes lane 0. Returns the number of objects removed, which is
+        how much the index of every object that is left went down.
+
+        Parameter count: the number of lanes to remove
+        Precondition: count is an int in range(number of lanes+1)
+        """
+        self._frame = None
+        if count < len(self._spans):
+            removed = self._spans[count][0]
+        else:
+            removed = len(self._kinds)
+        self._kinds = self._kinds[removed:]
+        self._rows = [row-count for row in self._rows[removed:]]
+        self._speeds = self._speeds[removed:]
+        self._xs = self._xs[removed:]
+        self._startxs = self._startxs[removed:]
+        self._prevxs = self._prevxs[removed:]
+        if removed > 0:
+            # A removed object may have been the fastest
+            self._fastest = max([0]+[abs(speed) for speed in self._speeds])
+        self._spans = [(start-removed, stop-removed) for start, stop
+                       in self._spans[count:]]
+        self._order = [[i-removed for i in order] for order in self._order[count:]]
+        self._keys = self._keys[count:]
+        self._unsorted = set(row-count for row in self._unsorted if row >= count)
+        if self._vectorized:
+            self._rowarray = numpy.array(self._rows, dtype=int)
+        return removed
+
+    def advance(self, dt):
+        """
+        Moves every object by its speed, wrapping objects that left the level.
+
+        An object that has gone past the left bound reappears the same distance
+        inside the right bound, and it moves in the same frame.  An object that
+        has gone past the right bound reappears the same distance inside the left
+        bound, and it waits until the next frame to move.  The lane of an object
+        that wraps is marked for sorting.
+
+        Parameter dt: The time since the last animation frame.
+        Precondition: dt is an number >= 0
+        """
+        self._moves = self._moves+1
+        self._travel = self._fastest*dt
+        if self._vectorized:
+            self._prevxs = self._xs.copy()
+        else:
+            self._prevxs = list(self._xs)
+        self._xs = self._step(self._xs, dt, self._unsorted)
+
+    def hold(self):
+        """
+        Keeps every object where it is for this frame.
+
+        The objects do not move, but this counts as an advance (see getMoves),
+        so the positions before the last advance are the current positions.
+        """
+        self._moves = self._moves+1
+        if self._vectorized:
+            self._prevxs = self._xs.copy()
+        else:
+            self._prevxs = list(self._xs)
+        self._travel = 0
+
+    def seek(self, t, dt=None):
+        """
+        Moves every object to where it is after t seconds of motion.
+
+        The time and frames are as in getPositionsAt.  Like hold, this counts as
+        an advance, so the positions before the last advance are the new positions.
+
+        Parameter t: the time in seconds
+        Precondition: t is a number >= 0
+
+        Parameter dt: the length of a frame, or None
+        Precondition: dt is None or a number > 0
+        """
+        positions = self.getPositionsAt(t, dt)
+        if self._vectorized:
+            self._xs = numpy.array(positions, dtype=float)
+        else:
+            self._xs = positions
+        self.hold()
+        self._unsorted.update(range(len(self._order)))
+
+    def _positionsAt(self, t, dt):
+        """
+        Returns the x position of every object after t seconds of motion.
+
+        The result is a list (a NumPy array if vectorized) that belongs to this
+        Traffic, so it must not be changed.  If dt is None, see _positionAt.
+        Otherwise, the starting positions are advanced frame by frame with _step,
+        the same code as advance, so the positions are exactly the ones that
+        advance gives.  The positions of the last frame asked for are kept (see
+        _frame), so asking for a later frame only steps the frames in between.
+
+        Parameter t: the time in seconds
+        Precondition: t is a number >= 0
+
+        Parameter dt: the length of a frame, or None
+        Precondition: dt is None or a number > 0
+        """
+        if dt is None:
+            return [self._positionAt(i, t) for i in range(len(self._kinds))]
+        frames = int(round(t/dt))
+        if self._frame is None or self._frame[0] != dt or self._frame[1] > frames:
+            if self._vectorized:
+                xs = numpy.array(self._startxs, dtype=float)
+            else:
+                xs = list(self._startxs)
+            self._frame = (dt, 0, xs)
+        dt, done, xs = self._frame
+        for frame in range(done, frames):
+            xs = self._step(xs, dt)
+        self._frame = (dt, frames, xs)
+        return xs
+
+    def _positionAt(self, i, t):
+        """
+        Returns the x position of object i after t seconds of continuous motion.
+
+        An object wraps by the length of the lane plus both margins, so its
+        position is its starting position moved by speed*t, brought back between
+        the bounds.  An object that does not move, but starts outside the bounds,
+        is brought back between them as well, as advance would.
+
+        Parameter i: the object index
+        Precondition: i is an int in range(size())
+
+        Parameter t: the time in seconds
+        Precondition: t is a number >= 0
+        """
+        x = self._startxs[i]
+        speed = float(self._speeds[i])
+        low = -self._margin
+        high = self._width+self._margin
+        length = high-low
+        if speed == 0:
+            if low <= x <= high:
+                return x
+            return low+((x-low) % length)
+        if speed > 0:
+            return low+((x+speed*t-low) % length)
+        return high-((high-(x+speed*t)) % length)
+
+    def _step(self, xs, dt, wrapped=None):
+        """
+        Returns the positions xs moved by one frame of length dt, as in advance.
+
+        A list is changed in place and returned.  A NumPy array (if this Traffic
+        is vectorized) is partly changed, and a new array is returned.
+
+        Parameter xs: the x position of every object
+        Precondition: xs is a list of numbers (a NumPy array if vectorized), the
+        same length as _kinds
+
+        Parameter dt: The time since the last animation frame.
+        Precondition: dt is an number >= 0
+
+        Parameter wrapped: the set to add the lanes of the objects that wrap to
+        Precondition: wrapped is a set, or None to not keep them
+        """
+        margin = self._margin
+        width = self._width
+        speeds = self._speeds
+        if self._vectorized:
+            low = xs < -margin
+            xs[low] = width+(margin+(xs[low]+margin))
+            high = xs > width+margin
+            result = numpy.where(high, -margin+(xs-(width+margin)), xs+speeds*dt)
+            if wrapped is not None:
+                moved = low | high
+                if moved.any():
+                    wrapped.update(self._rowarray[moved].tolist())
+            return result
+        for i in range(len(xs)):
+            x = xs[i]
+            if x < -margin:
+                x = width+(margin+(x+margin))
+                if wrapped is not None:
+                    wrapped.add(self._rows[i])
+            if x > width+margin:
+                xs[i] = -margin+(x-(width+margin))
+                if wrapped is not None:
+                    wrapped.add(self._rows[i])
+            else:
+                xs[i] = x+speeds[i]*dt
+        return xs
+
+    def _sort(self, row):
+        """
+        Sorts the objects of a lane by x in the spatial index.
+
+        Parameter row: the lane index
+        Precondition: row is a valid lane index of the level
+        """
+        xs = self._xs
+        order = self._order[row]
+        order.sort(key=lambda i: xs[i])
+        if self._vectorized:
+            self._keys[row] = xs[order].tolist()
+        else:
+            self._keys[row] = [xs[i] for i in order]
+        self._unsorted.discard(row)
+
+
 class Lane(object):         # You are permitted to change the parent class if you wish
     """
     Parent class for an arbitrary lane.
@@ -49,191 +795,524 @@ class Lane(object):         # You are permitted to change the parent class if yo
     subclass of GTile if you want.  This will make collisions easier.  However, it can
     make drawing really confusing because the Lane not only includes the tile but also
     all of the objects in the lane (cars, logs, etc.)
+
+    A lane only builds its own objects, once.  Their positions are held by a Traffic
+    that is shared by all of the lanes in a level, so that every obstacle is moved in
+    one step.  The objects of a lane are the objects of its span in the Traffic, and
+    they are numbered with their index in the Traffic.
     """
     # LIST ALL HIDDEN ATTRIBUTES HERE
 
-    # Attribute _exitSound: Sound to play when frog reaches an exit
-    # Invariant: _exitSound is a Sound Object that refers to the TRILL_SOUND
-    # audio file
+    # Attribute _tile: the background of this lane
+    # Invariant: _tile is a GTile whose source is the lane type plus '.png'
     #
-    # Attribute _objects_json: json dictionary of objects
-    # Invariant: _objects_json is a a valid json dictionary that refers to the
-    # specific objects that are in a particular level.
+    # Attribute _type: the type of this lane
+    # Invariant: _type is a string, like 'road' or 'hedge'
     #
-    # Attribute _bluefrog: list of safe frogs
-    # Invariant: _bluefrog is a list of GImages that keeps track of the safe
-    # frog objects
+    # Attribute _row: the index of this lane in the level
+    # Invariant: _row is an int >= 0
+    #
+    # Attribute _traffic: the compiled form of the objects in the level
+    # Invariant: _traffic is a Traffic object shared by every lane of the level
+    #
+    # Attribute _start: the index in _traffic of the first object in this lane
+    # Invariant: _start is an int >= 0. Object i of _traffic (for i in the span of
+    # this lane) is _obj[i-_start]
+    #
+    # Attribute _obj: A list of the objects in this lane
+    # Invariant: _obj is a list of GImages, with one entry for each object in
+    # the span of this lane in _traffic
     #
-    # Attribute _tiles: list of lanes in a level
-    # Invariant: _tiles is a list of GTiles that corresponds to the number
-    # of lanes in a level.
+    # Attribute _synced: the moves of _traffic when the GImages were last put at
+    # its positions
+    # Invariant: _synced is an int (see getMoves in Traffic), or -1 if the GImages
+    # are between positions. Objects are only moved to the positions of _traffic
+    # when they are needed, for drawing or for collisions, so a lane that is not
+    # drawn costs nothing when the Traffic moves
     #
-    # Attribute _json: A json dictionary with level information
-    # Invariant: _json is a valid json dictionary that provides information
-    # about a particular level file.
+    # Attribute _reach: how far a hitbox extends from the center of its object
+    # Invariant: _reach is a tuple (dx, dy) of the largest horizontal and vertical
+    # distance from the center of any object in _obj to the edge of its hitbox
     #
-    # Attribute _obj: A list of the objects in a level
-    # Invariant: _obj is a list of GImages, with one entry for each object in a
-    # Level
+    # Attribute _bounds: the hitbox of each object, compiled for contains
+    # Invariant: _bounds is a list with one tuple (left, bottom, right, top) for each
+    # object in _obj (see hitbox_bounds). The objects of the same type and angle
+    # share one tuple
     #
+    # Attribute _headless: whether this lane is simulated without drawing
+    # Invariant: _headless is a boolean. If it is True, every GImage in this lane
+    # is a Box and every sound is a Mute
+    #
+    # Attribute _moving: whether the objects of this lane move
+    # Invariant: _moving is a boolean, False if every object has speed 0
+
     # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    def getTile(self):
+        """
+        Returns the GTile for the background of this lane
+        """
+        return self._tile
+
+    def getType(self):
+        """
+        Returns the type of this lane, like 'road' or 'hedge'
+        """
+        return self._type
+
     def getObjects(self):
         """
-        Returns the list of object GImages
+        Returns the list of object GImages, at their current positions
         """
+        self._sync()
         return self._obj
 
-    def getbluefrog(self):
+    def getObject(self, i):
         """
-        Returns the list of blue frog GImages
+        Returns the GImage for object i, at its current position
+
+        Parameter i: the index of the object in the Traffic
+        Precondition: i is an int in the span of this lane
         """
-        return self._bluefrog
+        object = self._obj[i-self._start]
+        object.x = self._traffic.getX(i)
+        return object
+
+    def getRow(self):
+        """
+        Returns the index of this lane in the level
+        """
+        return self._row
+
+    def setRow(self, row):
+        """
+        Moves this lane to another row of the level.
+
+        This is called after the first lanes of the Traffic were removed (see
+        trim in Traffic), so the tile and the objects are moved down to the new
+        row, and the objects of this lane are found again in the Traffic.
+
+        Parameter row: The new index of this lane in the level
+        Precondition: row is an int >= 0, the index of this lane in the Traffic
+        """
+        self._row = row
+        self._start = self._traffic.getSpan(row)[0]
+        self._tile.bottom = GRID_SIZE*row
+        y = (row*GRID_SIZE)+(GRID_SIZE//2)
+        for object in self._obj:
+            object.y = y
+
+    def getBounds(self, i):
+        """
+        Returns the hitbox of object i, turned by its angle, as a tuple (left,
+        bottom, right, top) measured from its center (see hitbox_bounds)
 
-    def __init__(self, objects_json, json, tiles):
+        Parameter i: the index of the object in the Traffic
+        Precondition: i is an int in the span of this lane
+        """
+        return self._bounds[i-self._start]
+
+    def getReach(self):
+        """
+        Returns how far the hitboxes of this lane extend from their centers
+
+        The value is a tuple (dx, dy) of the largest horizontal and vertical
+        distance from the center of an object to the edge of its hitbox.
+        """
+        return self._reach
+
+    def __init__(self, images, json, row, traffic, width, height, headless=False):
         """
         Initializes a Lane.
 
-        This Initializer takes in a json dictionary of the objects in a specific
-        level, the json dictionary for general information about the level, and
-        the list GTiles in the level, in order to initialize a lane object.
+        This Initializer takes in the json dictionary of the images in a
+        level, the json dictionary for this lane, and the Traffic for the level,
+        in order to initialize a lane object.
 
-        A GImage is created for each image and appended to a list of objects.
+        A GTile is created for the background, and a GImage is created for each
+        object of this lane in the Traffic and appended to a list of objects.
         The objects in this class are considered composite objects because the
         objects consist of both GTiles and GImages, where the GImages are drawn
         on top of the GTiles.
 
-        Parameter objects_json: A json dictionary of objects
-        Precondition: objects_json is a valid json dictionary that refers to the
-        specific objects that are in a particular level.
+        Parameter images: A json dictionary of images
+        Precondition: images is the 'images' dictionary of a valid objects json,
+        with a hitbox for every object in this lane
 
-        Parameter json: A json dictionary with level information
-        Precondition: json is a valid json dictionary that provides information
-        about a particular level file.
+        Parameter json: A json dictionary with lane information
+        Precondition: json is one of the 'lanes' of a valid level json
+
+        Parameter row: The index of this lane in the level
+        Precondition: row is an int >= 0
+
+        Parameter traffic: The compiled objects of the level
+        Precondition: traffic is a Traffic object for the level
 
-        Parameter tiles: list of lanes in a level.
-        Precondition: tiles is a list of GTiles that corresponds to the number
-        of lanes in a level.
-        """
-        self._exitSound = Sound(TRILL_SOUND)
-        self._objects_json = objects_json
-        images = self._objects_json['images']
-        self._bluefrog=[]
-        self._tiles = tiles
-        self._json = json
-        lanes = self._json['lanes']
+        Parameter width: The width of the lane
+        Precondition: width is an int > 0
+
+        Parameter height: The height of the background tile
+        Precondition: height is an int > 0
+
+        Parameter headless: whether to build plain geometry instead of images
+        Precondition: headless is a boolean
+        """
+        self._headless = headless
+        self._type = json['type']
+        self._row = row
+        self._tile = self._image(GTile, left = 0, bottom = GRID_SIZE*row,
+        width=width, height=height, source=self._type + '.png')
+        self._traffic = traffic
+        self._synced = traffic.getMoves()
+        self._start, stop = traffic.getSpan(row)
         self._obj = []
-        for item in lanes:
-            if 'objects' in item:
-                list_of_objects = item['objects']
-                for dictionary in list_of_objects:
-                    type_object = dictionary['type']
-                    position_object = dictionary['position']
-                    source = type_object + '.png'
-                    x = (position_object*GRID_SIZE)+(GRID_SIZE//2)
-                    y = (lanes.index(item)*GRID_SIZE)+(GRID_SIZE//2)
-                    if 'speed' in item:
-                        if item['speed']>=0:
-                            angle = 0
-                        elif item['speed']<0:
-                            angle = 180
-                    else:
-                        angle = 0
-                    hitbox = images[source[:-4]]['hitbox']
-                    object = GImage(x=x,y=y,source=source, angle=angle,
-                    hitbox = hitbox)
-                    self._obj.append(object)
+        self._bounds = []
+        self._reach = (0, 0)
+        self._moving = False
+        compiled = {}
+        y = (row*GRID_SIZE)+(GRID_SIZE//2)
+        for i in range(self._start, stop):
+            kind = traffic.getKind(i)
+            self._moving = self._moving or traffic.getSpeed(i) != 0
+            if traffic.getSpeed(i)>=0:
+                angle = 0
+            else:
+                angle = 180
+            hitbox = images[kind]['hitbox']
+            self._reach = (max(self._reach[0], abs(hitbox[0]), abs(hitbox[2])),
+                           max(self._reach[1], abs(hitbox[1]), abs(hitbox[3])))
+            if (kind, angle) not in compiled:
+                compiled[(kind, angle)] = hitbox_bounds(hitbox, angle)
+            self._bounds.append(compiled[(kind, angle)])
+            object = self._image(GImage, x=traffic.getX(i),y=y,
+            source=kind + '.png', angle=angle, hitbox = hitbox)
+            self._obj.append(object)
+
+    def contains(self, i, point):
+        """
+        Returns True if the hitbox of object i contains the given point.
+
+        This gives the same answer as contains of the GImage of the object (see
+        getObject), but it only compares the point to the compiled hitbox (see
+        hitbox_bounds), at the position of the object in the Traffic. So the
+        GImage is not moved, and the point is not turned.
+
+        Parameter i: the index of the object in the Traffic
+        Precondition: i is an int in the span of this lane
+
+        Parameter point: the point to check
+        Precondition: point is a tuple or list of two numbers
+        """
+        left, bottom, right, top = self._bounds[i-self._start]
+        dx = point[0]-self._traffic.getX(i)
+        dy = point[1]-((self._row*GRID_SIZE)+(GRID_SIZE//2))
+        return left <= dx <= right and bottom <= dy <= top
 
     def update(self, dt, frog):
         """
-        Updates the obstacles and returns 'reached exit' if frog has reached
-        the exit.
+        Updates the lane after the Traffic has moved.
 
-        This method moves each obstacle in the list of objects based on their
-        respective speeds. This method also takes into account the length of the
-        buffer that the object moves off screen, in order to prevent collison
-        of objects. If the frog has reached an exit, this method will return
-        'reached exit'.
+        The GImages are not moved until they are needed (see getObjects and
+        draw), so there is nothing to do here. Subclasses may return a string to
+        report an event to the level.
 
         Parameter dt: The time since the last animation frame.
         Precondition: dt is an number >= 0
 
         Parameter frog: the frog
-        Precondition: frog is an object of the Frog class.
+        Precondition: frog is an object of the Frog class, or None.
         """
-        buffer = self._json['offscreen']
-        width = self._tiles[0].width
-        lanes = self._json['lanes']
-        list_of_speeds=[]
-        for item in lanes:
-            if 'speed' in item and 'objects' in item:
-                for obstacle in item['objects']:
-                    list_of_speeds.append(item['speed'])
-            elif 'objects' in item:
-                for obstacle in item['objects']:
-                    list_of_speeds.append(0)
-        for obstacle in range(len(self._obj)):
-            if self._obj[obstacle].x < buffer*GRID_SIZE*-1:
-                d = (self._obj[obstacle].x)-(buffer*GRID_SIZE*-1)
-                self._obj[obstacle].x=(width)+((buffer*GRID_SIZE)+d)
-            if self._obj[obstacle].x > width+(buffer*GRID_SIZE):
-                d = (self._obj[obstacle].x)-(width+(buffer*GRID_SIZE))
-                self._obj[obstacle].x=(buffer*GRID_SIZE*-1)+d
-            else:
-                item_speed=(list_of_speeds[obstacle]*dt)
-                self._obj[obstacle].x=self._obj[obstacle].x + item_speed
-        if self._reachedexit(frog)=='reached exit':
-            return 'reached exit'
+        pass
 
-    def draw(self, view):
+    def draw(self, view, alpha=None):
         """
-        Draws the tiles and obstacles to the view
+        Draws the tile and obstacles to the view
 
         Parameter view: The view to draw to
         Precondition: view is a GView object
-        """
-        for tile in self._tiles:
-            tile.draw(view)
 
+        Parameter alpha: How far to draw the obstacles between their previous
+        and current position (None draws them at their current position)
+        Precondition: alpha is None or a float in [0,1]
+        """
+        self._tile.draw(view)
+        self._sync(alpha)
         for obstacle in self._obj:
             obstacle.draw(view)
 
+    def drawBackground(self, view):
+        """
+        Draws the parts of this lane that never move to the view
+
+        These are the tile, and the objects if they do not move (like the
+        exits of a hedge). A level draws them into its background layer.
+
+        Parameter view: The view to draw to
+        Precondition: view is a GView object (or a LayerView)
+        """
+        self._tile.draw(view)
+        if not self._moving:
+            self._sync()
+            for obstacle in self._obj:
+                obstacle.draw(view)
+
+    def drawObjects(self, view, alpha=None):
+        """
+        Draws the objects of this lane that move to the view
+
+        Together with drawBackground, this draws the same as draw.
+
+        Parameter view: The view to draw to
+        Precondition: view is a GView object
+
+        Parameter alpha: How far to draw the obstacles between their previous
+        and current position (None draws them at their current position)
+        Precondition: alpha is None or a float in [0,1]
+        """
+        if self._moving:
+            self._sync(alpha)
+            for obstacle in self._obj:
+                obstacle.draw(view)
+
+    def _sync(self, alpha=None):
+        """
+        Moves each GImage to the position of its object in the Traffic.
+
+        This method does nothing if the GImages have not fallen behind. If
+        alpha is given, the GImages are moved between their previous and
+        current position (see getPositions in Traffic) and are still behind.
+
+        Parameter alpha: the fraction of the last advance, or None
+        Precondition: alpha is None or a float in [0,1]
+        """
+        moves = self._traffic.getMoves()
+        if self._synced != moves or alpha is not None:
+            positions = self._traffic.getPositions(self._start,
+            self._start+len(self._obj), alpha)
+            for obstacle in range(len(self._obj)):
+                self._obj[obstacle].x = positions[obstacle]
+            self._synced = moves if alpha is None else -1
+
+    def _image(self, cls, **keywords):
+        """
+        Returns a new drawable object, or a Box if this lane is headless.
+
+        Parameter cls: The game2d class to create when not headless
+        Precondition: cls is GImage, GTile, GSprite or GLabel
+
+        Parameter keywords: The keyword arguments for the constructor
+        Precondition: keywords are valid arguments for cls
+        """
+        if self._headless:
+            return Box(**keywords)
+        return cls(**keywords)
+
+    def _sound(self, source):
+        """
+        Returns the shared Sound, or a Mute if this lane is headless.
+
+        Parameter source: The sound file
+        Precondition: source is a string naming a sound file
+        """
+        if self._headless:
+            return Mute(source)
+        return Assets.sound(source)
+
+
+class Grass(Lane):
+    """
+    A class representing a grass lane
+
+    Grass is safe.  The frog can rest on it no matter what is in the lane.
+    """
+    pass
+
+
+class Road(Lane):
+    """
+    A class representing a road lane
+
+    The frog dies if any object of a road (a car, a trailer) contains it.
+    """
+    pass
+
+
+class Water(Lane):
+    """
+    A class representing a water lane
+
+    The frog drowns in water unless it stands on a log, and a log carries the
+    frog along at the speed of the lane.
+    """
+    pass
+
+
+class Hedge(Lane):
+    """
+    A class representing the exit hedge
+
+    The frog can only enter a hedge through its opens and exits.  A frog that
+    reaches an exit is safe, and it leaves a safe frog in the exit so that no
+    other frog can use it.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _exitSound: Sound to play when frog reaches an exit
+    # Invariant: _exitSound is a Sound Object that refers to the TRILL_SOUND
+    # audio file
+    #
+    # Attribute _bluefrog: list of safe frogs
+    # Invariant: _bluefrog is a list of GImages that keeps track of the safe
+    # frog objects
+    #
+    # Attribute _exits: the exits in this lane
+    # Invariant: _exits is a list of the GImages in _obj whose source is
+    # 'exit.png'
+    #
+    # Attribute _exitobjects: where the exits are in this lane
+    # Invariant: _exitobjects is a list of ints, the same length as _exits;
+    # _exits[i] is _obj[_exitobjects[i]]
+    #
+    # Attribute _occupied: the exits that have a safe frog
+    # Invariant: _occupied is an int used as a bitset; bit i is set if a frog
+    # reached _exits[i]
+    #
+    # Attribute _full: the value of _occupied when every exit has a safe frog
+    # Invariant: _full is the int 2**len(_exits)-1
+
+    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    def getbluefrog(self):
+        """
+        Returns the list of blue frog GImages
+        """
+        return self._bluefrog
+
+    def getOccupied(self):
+        """
+        Returns the exits that have a safe frog, as a bitset
+
+        Bit i of the value is set if a frog reached exit i of this hedge.
+        """
+        return self._occupied
+
+    def getExits(self):
+        """
+        Returns the list of exit GImages, in the order of the bits of getOccupied
+        """
+        return self._exits
+
+    def setOccupied(self, occupied):
+        """
+        Puts a safe frog in each of the given exits, and none in the others.
+
+        This keeps the safe frogs of a hedge that was built again (see reload in
+        Level), so no sound is played.
+
+        Parameter occupied: the exits that have a safe frog, as a bitset
+        Precondition: occupied is an int in range(2**len(getExits()))
+        """
+        self._occupied = occupied
+        self._bluefrog = []
+        for i in range(len(self._exits)):
+            x = self._exits[i]
+            if occupied & (1 << i):
+                self._bluefrog.append(self._image(GImage, x=x.x,y=x.y,
+                source=FROG_SAFE))
+
+    def setRow(self, row):
+        """
+        Moves this hedge, with its safe frogs, to another row of the level.
+
+        Parameter row: The new index of this lane in the level
+        Precondition: row is an int >= 0, the index of this lane in the Traffic
+        """
+        super().setRow(row)
+        for frog in self._bluefrog:
+            frog.y = (row*GRID_SIZE)+(GRID_SIZE//2)
+
+    def __init__(self, images, json, row, traffic, width, height, headless=False):
+        """
+        Initializes a Hedge.
+
+        This initializer builds the lane (see Lane) and then finds its exits,
+        which are all free.
+
+        Parameter images: A json dictionary of images
+        Precondition: images is the 'images' dictionary of a valid objects json,
+        with a hitbox for every object in this lane
+
+        Parameter json: A json dictionary with lane information
+        Precondition: json is one of the 'lanes' of a valid level json
+
+        Parameter row: The index of this lane in the level
+        Precondition: row is an int >= 0
+
+        Parameter traffic: The compiled objects of the level
+        Precondition: traffic is a Traffic object for the level
+
+        Parameter width: The width of the lane
+        Precondition: width is an int > 0
+
+        Parameter height: The height of the background tile
+        Precondition: height is an int > 0
+
+        Parameter headless: whether to build plain geometry instead of images
+        Precondition: headless is a boolean
+        """
+        super().__init__(images, json, row, traffic, width, height, headless)
+        self._exitSound = self._sound(TRILL_SOUND)
+        self._bluefrog = []
+        self._exits = []
+        self._exitobjects = []
+        for i in range(len(self._obj)):
+            if self._obj[i].source == 'exit.png':
+                self._exits.append(self._obj[i])
+                self._exitobjects.append(i)
+        self._occupied = 0
+        self._full = (1 << len(self._exits))-1
+
+    def update(self, dt, frog):
+        """
+        Returns 'reached exit' if frog has reached an exit of this hedge.
+
+        Parameter dt: The time since the last animation frame.
+        Precondition: dt is an number >= 0
+
+        Parameter frog: the frog
+        Precondition: frog is an object of the Frog class, or None.
+        """
+        super().update(dt, frog)
+        if self._reachedexit(frog)=='reached exit':
+            return 'reached exit'
+
     def checkWin(self):
         """
         Returns 'game won' if all of the exits are occupied with safe frogs.
 
-        This method creates a list of exits, and also creates a list of exits
-        that are occupied by blue frogs. When all of the exits are occupied,
-        this occurs when the length of exits is the same as the length of taken
-        exits, this method will return 'game won'
-        """
-        exits = []
-        for x in self._obj:
-            if x.source == 'exit.png':
-                exits.append(x)
-        taken=[]
-        for x in exits:
-            for y in self._bluefrog:
-                if x.contains((y.x, y.y)):
-                    taken.append('taken')
-        if len(taken)==len(exits):
+        The occupied exits are kept as a bitset (see _reachedexit), so this
+        method only compares it to the bitset with every exit set.
+        """
+        if self._occupied == self._full:
             return 'game won'
 
     def _reachedexit(self, frog):
         """
         Returns "reached exit" if the frog has reached an exit.
 
-        This method identifies if an exit contains the frog, and if this
-        condition is met, it will play the exit sound, add a safe frog to the
-        list of blue frogs, and return "reached exit"
+        This method identifies if an exit contains the frog (see contains in
+        Lane), and if this condition is met, it will play the exit sound, add a
+        safe frog to the list of blue frogs, mark the exit as occupied, and
+        return "reached exit"
 
         Parameter frog: the frog
-        Precondition: frog is an object of the Frog class.
+        Precondition: frog is an object of the Frog class, or None.
         """
-        for x in self._obj:
+        for i in range(len(self._exits)):
+            x = self._exits[i]
+            index = self._start+self._exitobjects[i]
             if frog is not None:
-                if x.source =='exit.png' and x.contains((frog.x, frog.y)):
+                if self.contains(index, (frog.x, frog.y)):
                     self._exitSound.play()
-                    self._bluefrog.append(GImage(x=x.x,y=x.y,source=FROG_SAFE))
+                    self._bluefrog.append(self._image(GImage, x=x.x,y=x.y,
+                    source=FROG_SAFE))
+                    self._occupied = self._occupied | (1 << i)
                     return "reached exit"
-
-                    
@@ -0,0 +1,332 @@
+"""
+Layers module for Froggit
+
+This module contains the class for drawing a group of objects that rarely change as
+one picture.  Most of what is on the screen does not move: the lane tiles, the hedges
+with their exits, and the "Lives:" label.  Drawing each of them again every frame is
+wasted work, so the level bakes them into a layer once, and then draws the layer as a
+single rectangle.  Another layer holds the heads showing the lives and the safe frogs
+in the exits, which only change when the frog dies or reaches an exit.
+
+A layer is baked into a kivy Fbo (a texture that can be drawn to).  The objects of
+the layer are drawn to the Fbo through a view that adds their drawing instructions to
+it, just as GView adds them to the window.  A layer is only baked again when its key
+changes.  The key is anything that can be compared, and is chosen by the owner of the
+layer so that it changes whenever the objects should look different (for example, the
+number of lives, or the size of the window).
+
+If kivy is not installed, or the layer is not baked (as in a headless level, if
+BAKE_LAYERS is False, or if kivy cannot make the Fbo), the layer simply draws its
+objects every frame, so it looks the same either way.  If the graphics context is lost
+(as when an Android app is paused), kivy makes the Fbo again but empty, so the layer
+forgets its key and is baked again the next time it is built.
+
+A level that is taller than the window is seen through a Camera, which follows the
+frog.  Everything in the level is drawn shifted down by the height of the camera,
+and only the lanes near the window are drawn at all.  The background of such a level
+is split into layers of VIEW_LANES lanes each, so that no texture is taller than the
+window, and only the layers near the window are kept.
+"""
+try:
+    from kivy.graphics import Fbo, ClearColor, ClearBuffers, Rectangle
+    from kivy.graphics import PushMatrix, PopMatrix, Translate
+except ImportError:
+    Fbo = None      # Layers draw their objects every frame instead
+from consts import *
+
+
+class LayerView(object):
+    """
+    A class representing a view that draws into the Fbo of a layer
+
+    The draw method of every GObject calls view.draw with its drawing instructions,
+    so giving an object this view adds its instructions to the Fbo instead of the
+    window.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _fbo: the Fbo to draw into
+    # Invariant: _fbo is a kivy Fbo
+
+    def __init__(self, fbo):
+        """
+        Initializes a view of the given Fbo.
+
+        Parameter fbo: the Fbo to draw into
+        Precondition: fbo is a kivy Fbo
+        """
+        self._fbo = fbo
+
+    def draw(self, cmd):
+        """
+        Adds drawing instructions to the Fbo.
+
+        Parameter cmd: the instructions
+        Precondition: cmd is a kivy Instruction or InstructionGroup
+        """
+        self._fbo.add(cmd)
+
+
+class Layer(object):
+    """
+    A class representing objects that are drawn together as one picture
+
+    Call build with a new key and the draw functions of the objects whenever the
+    objects change, and draw every frame.  The objects are only drawn into the
+    layer by build, so changing an object does not change the layer until it is
+    built again.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _width: the width of the layer
+    # Invariant: _width is an int > 0
+    #
+    # Attribute _height: the height of the layer
+    # Invariant: _height is an int > 0
+    #
+    # Attribute _bottom: the y of the bottom of the layer, where it is drawn
+    # Invariant: _bottom is an int
+    #
+    # Attribute _baked: whether the objects are drawn into an Fbo
+    # Invariant: _baked is a boolean, and False if BAKE_LAYERS is False, kivy is
+    # not installed, or kivy could not make the Fbo
+    #
+    # Attribute _key: the key the layer was last built for
+    # Invariant: _key is any value that can be compared, or None if the layer
+    # was never built
+    #
+    # Attribute _draws: the functions that draw the objects of the layer
+    # Invariant: _draws is a list of functions that take a view, like the draw
+    # method of a GObject
+    #
+    # Attribute _fbo: the texture the objects are drawn into
+    # Invariant: _fbo is a kivy Fbo, or None if the layer is not baked
+    #
+    # Attribute _rect: the rectangle that draws the texture to the view
+    # Invariant: _rect is a kivy Rectangle, or None if the layer is not baked
+    #
+    # Attribute _builds: the number of times the layer was built
+    # Invariant: _builds is an int >= 0
+
+    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    def getKey(self):
+        """
+        Returns the key the layer was last built for (None if never built)
+        """
+        return self._key
+
+    def getBuilds(self):
+        """
+        Returns the number of times the layer was built
+        """
+        return self._builds
+
+    def isBaked(self):
+        """
+        Returns True if the objects are drawn into a texture
+        """
+        return self._baked
+
+    def __init__(self, width, height, baked=True, bottom=0):
+        """
+        Initializes an empty layer.
+
+        Parameter width: the width of the layer
+        Precondition: width is an int > 0
+
+        Parameter height: the height of the layer
+        Precondition: height is an int > 0
+
+        Parameter baked: whether to draw the objects into a texture (only if
+        BAKE_LAYERS is True)
+        Precondition: baked is a boolean
+
+        Parameter bottom: the y of the bottom of the layer (objects below it, or
+        above its top, are cut off when it is baked)
+        Precondition: bottom is an int
+        """
+        self._width = width
+        self._height = height
+        self._bottom = bottom
+        self._baked = baked and BAKE_LAYERS and Fbo is not None
+        self._key = None
+        self._draws = []
+        self._fbo = None
+        self._rect = None
+        self._builds = 0
+
+    def build(self, key, draws):
+        """
+        Draws the objects into this layer, if key is not the key it was built for.
+
+        The objects are given by their draw functions, so that a lane can give the
+        function that draws only its background (see drawBackground in Lane).
+
+        Parameter key: the key of the objects
+        Precondition: key is any value that can be compared, except None
+
+        Parameter draws: the functions that draw the objects, bottom first
+        Precondition: draws is a list of functions that take a view, like the
+        draw method of a GObject
+        """
+        if key == self._key:
+            return
+        self._key = key
+        self._draws = draws
+        self._builds = self._builds+1
+        if not self._baked:
+            return
+        if self._fbo is None:
+            try:
+                self._fbo = Fbo(size=(self._width, self._height))
+            except Exception:
+                self._baked = False     # Draw the objects every frame instead
+                return
+            self._fbo.add_reload_observer(self._reloaded)
+            self._rect = Rectangle(pos=(0, self._bottom),
+                                   size=(self._width, self._height))
+        self._fbo.clear()
+        self._fbo.add(ClearColor(0, 0, 0, 0))
+        self._fbo.add(ClearBuffers())
+        self._fbo.add(PushMatrix())
+        self._fbo.add(Translate(0, -self._bottom))
+        view = LayerView(self._fbo)
+        for draw in draws:
+            draw(view)
+        self._fbo.add(PopMatrix())
+        self._fbo.draw()
+        self._rect.texture = self._fbo.texture
+
+    def _reloaded(self, fbo):
+        """
+        Forgets the key of this layer after kivy made its Fbo again.
+
+        The new Fbo is empty, so the layer must be baked again.  It is still drawn
+        (empty) until the owner of the layer builds it again, which it does as soon
+        as the key is not the key it wants.
+
+        Parameter fbo: the Fbo that was made again
+        Precondition: fbo is a kivy Fbo
+        """
+        self._key = None
+
+    def release(self):
+        """
+        Forgets the objects and the texture of this layer, to free their memory.
+
+        The layer is empty until it is built again (with any key).
+        """
+        self._key = None
+        self._draws = []
+        self._fbo = None
+        self._rect = None
+
+    def draw(self, view):
+        """
+        Draws this layer to the view.
+
+        Parameter view: The view to draw to
+        Precondition: view is a GView object
+        """
+        if self._baked:
+            view.draw(self._rect)
+        else:
+            for draw in self._draws:
+                draw(view)
+
+
+class Camera(object):
+    """
+    A class representing the part of a level that is shown in the window
+
+    The window shows the lanes from the height of the camera up, and a row at the
+    top for the lives.  The camera follows the frog, keeping it in the middle of
+    the window, but it never shows anything below the first lane or above the last.
+    A level that fits in the window has a camera at height 0 that never moves.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _y: the height of the camera, the y of the level at the bottom of
+    # the window
+    # Invariant: _y is an int in range(0, _top+1)
+    #
+    # Attribute _top: the highest the camera may go
+    # Invariant: _top is an int >= 0
+    #
+    # Attribute _view: the height of the lanes shown (without the row of lives)
+    # Invariant: _view is an int > 0
+    #
+    # Attribute _lanes: the number of lanes in the level
+    # Invariant: _lanes is an int > 0
+
+    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    def getY(self):
+        """
+        Returns the height of the camera, the y of the level at the bottom of the
+        window
+        """
+        return self._y
+
+    def isMoving(self):
+        """
+        Returns True if the level is taller than the window, so the camera moves
+        """
+        return self._top > 0
+
+    def __init__(self, lanes, height):
+        """
+        Initializes a camera at the bottom of a level.
+
+        Parameter lanes: the number of lanes in the level
+        Precondition: lanes is an int > 0
+
+        Parameter height: the height of the window, with the row of lives
+        Precondition: height is an int > GRID_SIZE
+        """
+        self._lanes = lanes
+        self._view = height-GRID_SIZE
+        self._top = max(0, lanes*GRID_SIZE-self._view)
+        self._y = 0
+
+    def follow(self, y):
+        """
+        Moves the camera so that y is in the middle of the window, if it can.
+
+        Parameter y: the y to follow (the frog)
+        Precondition: y is a number
+        """
+        self._y = int(min(max(y-self._view/2, 0), self._top))
+
+    def getRows(self):
+        """
+        Returns the tuple (first, stop) of the lanes in the window.
+
+        The lanes are range(first, stop).  The lanes just below and above the
+        window are included, since their objects may reach into it.
+        """
+        first = max(0, self._y//GRID_SIZE-1)
+        stop = min(self._lanes, (self._y+self._view)//GRID_SIZE+2)
+        return (first, stop)
+
+    def begin(self, view):
+        """
+        Shifts everything drawn to the view down by the height of the camera.
+
+        Every call must be followed by a call to end.
+
+        Parameter view: The view to draw to
+        Precondition: view is a GView object
+        """
+        if self._top > 0 and Fbo is not None and view is not None:
+            view.draw(PushMatrix())
+            view.draw(Translate(0, -self._y))
+
+    def end(self, view):
+        """
+        Stops shifting what is drawn to the view (see begin).
+
+        Parameter view: The view to draw to
+        Precondition: view is a GView object
+        """
+        if self._top > 0 and Fbo is not None and view is not None:
+            view.draw(PopMatrix())
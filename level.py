@@ -15,10 +15,15 @@ it should either go in the lanes.py module or the models.py module.
 Likita Gangireddy lg425
 12/21/2020
 """
-from game2d import *
+try:
+    from game2d import *
+except ImportError:
+    pass    # models.py provides plain geometry in place of game2d
 from consts import *
 from lanes  import *
 from models import *
+from profiler import *
+from layers import *
 
 # PRIMARY RULE: Level can only access attributes in models.py or lanes.py using getters
 # and setters. Level is NOT allowed to access anything in app.py (Subcontrollers are not
@@ -49,6 +54,14 @@ class Level(object):
     resize to match.  That resizing is done in the Froggit app, and so it needs to access
     these values in the level.  The height value should include one extra grid square
     to suppose the number of lives meter.
+
+    A level can also be vectorized, in which case all obstacles are moved with
+    NumPy (see Traffic in lanes.py).  This pays off on levels with hundreds of cars.
+
+    A level can also be headless.  A headless level builds every tile, image, sprite
+    and label as a Box and every sound as a Mute, so it needs no window, no textures
+    and no audio.  It still runs the same update code, so a headless level plays
+    exactly like the real one.  This is how we step games on servers with no display.
     """
     # LIST ALL HIDDEN ATTRIBUTES HERE
 
@@ -59,9 +72,8 @@ class Level(object):
     # Attribute _death: frog death animation
     # Invariant: _death is a Death object, or None
     #
-    # Attribute _comp: composite object
-    # Invariant: _comp is a Lane object that corresponds to a particular lane,
-    # or it is set to None
+    # Attribute _traffic: the compiled objects of the level
+    # Invariant: _traffic is a Traffic object, shared by all of the lanes
     #
     # Attribute _win: indicates if the game has been won
     # Invariant: _win is set to 'win' if the game has been won, else it is set
@@ -95,7 +107,38 @@ class Level(object):
     # not including the top row, which is reserved to display the lives
     #
     # Attribute _lanes: the lanes in the level
-    # Invariant: _lanes is a list of GTiles
+    # Invariant: _lanes is a list of Lane objects (Grass, Road, Water or Hedge),
+    # where _lanes[i] is the lane in row i
+    #
+    # Attribute _hedges: the exit hedges in the level
+    # Invariant: _hedges is a list of the Hedge objects in _lanes
+    #
+    # Attribute _reach: how far a hitbox extends from the center of its object
+    # Invariant: _reach is a tuple (dx, dy) of the largest horizontal and vertical
+    # distance from the center of any object in the level to its hitbox edge
+    #
+    # Attribute _camera: the part of the level shown in the window
+    # Invariant: _camera is a Camera for the lanes of this level and _viewheight
+    #
+    # Attribute _viewheight: the height of the window
+    # Invariant: _viewheight is an int in range(2*GRID_SIZE, _fullheight+1)
+    #
+    # Attribute _backdrops: the lane tiles, the objects that never move and the
+    # safe frogs, drawn as pictures of VIEW_LANES lanes each
+    # Invariant: _backdrops is a list of Layers; _backdrops[i] holds the lanes from
+    # i*VIEW_LANES, and is built for the size of the view and the exits that have
+    # a safe frog, or released if it is not near the window (see draw)
+    #
+    # Attribute _hud: the lives heads and the lives label, drawn as one picture
+    # Invariant: _hud is a Layer at the top of the window, built for the number of
+    # lives and the size of the view
+    #
+    # Attribute _boxes: the hitbox of each object, for sweeping it
+    # Invariant: _boxes is a list with one tuple (left, bottom, right, top) for each
+    # object of _traffic: its hitbox turned by its angle (see getBounds in Lane)
+    #
+    # Attribute _before: where the frog was at the start of the last update
+    # Invariant: _before is a tuple of two numbers, or None if there was no frog
     #
     # Attribute _frogstartx: frog starting x position
     # Invariant: _frogstartx is an int that corresponds to the starting x
@@ -112,9 +155,36 @@ class Level(object):
     # Attribute _liveslabel: label that says 'Lives:'
     # Invariant: _liveslabel is a GLabel with the text 'Lives:'
     #
+    # Attribute _grid: the cells of the level, for moving the frog
+    # Invariant: _grid is a list with one list per lane, and one string per column
+    # (x//GRID_SIZE) in each. A cell is the type of its lane, except in a hedge,
+    # where it is 'open' or 'exit' if an open or exit is centered in it, 'safe'
+    # once a frog has reached that exit, and 'hedge' otherwise
+    #
+    # Attribute _gates: the opens and exits near each cell of a hedge
+    # Invariant: _gates is a dictionary from (row, column) to the list of opens and
+    # exits (in the order of _open_or_exit) whose hitbox may overlap that cell
+    #
     # Attribute _open_or_exit: list of opens and exits
-    # Invariant: _open_or_exit is a list of objects with the source 'open.png'
-    # or 'exit.png'
+    # Invariant: _open_or_exit is a list of the indices of the objects of _traffic
+    # in a hedge whose type is 'open' or 'exit'
+    #
+    # Attribute _water: the water lanes
+    # Invariant: _water is a list of the Water objects in _lanes
+    #
+    # Attribute _logs: the logs in the level
+    # Invariant: _logs is a set of the indices of the objects in _traffic whose
+    # type contains 'log'
+    #
+    # Attribute _frogspeed: the number of seconds a frog jump takes
+    # Invariant: _frogspeed is a number > 0
+    #
+    # Attribute _profiler: the profiler that times the parts of update and draw
+    # Invariant: _profiler is a Profiler or a NullProfiler (see profiler.py)
+    #
+    # Attribute _headless: whether this level is simulated without drawing
+    # Invariant: _headless is a boolean. If it is True, every drawable object in
+    # this level is a Box and every sound is a Mute
     #
     # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
     def getFrog(self):
@@ -137,7 +207,10 @@ class Level(object):
         Precondition: y is an int that refers to the starting y position of the
         frog.
         """
-        self._frog = Frog(x,y, self._sprites)
+        if self._headless:
+            self._frog = HeadlessFrog(x,y, self._sprites, self._frogspeed)
+        else:
+            self._frog = Frog(x,y, self._sprites, self._frogspeed)
 
     def setDeath(self, x, y):
         """
@@ -151,7 +224,58 @@ class Level(object):
         Precondition: y is an int that corresponds to the y postion of the frog
         when it died.
         """
-        self._death = Death(x,y, self._sprites)
+        if self._headless:
+            self._death = HeadlessDeath(x,y, self._sprites)
+        else:
+            self._death = Death(x,y, self._sprites)
+
+    def getProfiler(self):
+        """
+        Returns the profiler of this level.
+        """
+        return self._profiler
+
+    def setProfiler(self, profiler):
+        """
+        Sets the profiler that times the parts of update and draw.
+
+        Parameter profiler: the profiler of this level
+        Precondition: profiler is a Profiler or a NullProfiler
+        """
+        self._profiler = profiler
+
+    def getCamera(self):
+        """
+        Returns the camera that shows this level in the window
+        """
+        return self._camera
+
+    def getViewHeight(self):
+        """
+        Returns the height of the window showing this level
+        """
+        return self._viewheight
+
+    def setViewHeight(self, height):
+        """
+        Sets the height of the window showing this level.
+
+        A window shorter than the level shows the lanes around the frog, and
+        scrolls as the frog moves (see Camera). The lives are moved to the top
+        row of the window.
+
+        Parameter height: the height of the window
+        Precondition: height is an int in range(2*GRID_SIZE, the height of the
+        level+1)
+        """
+        self._viewheight = height
+        self._camera = Camera(len(self._lanes), height)
+        if self._frog is not None:
+            self._camera.follow(self._frog.y)
+        for head in self._froglives:
+            head.y = height-(GRID_SIZE//2)
+        self._liveslabel.y = height-(GRID_SIZE//2)
+        self._hud = Layer(self._width, height, not self._headless)
 
     def getFrogstartX(self):
         """
@@ -165,6 +289,19 @@ class Level(object):
         """
         return self._frogstarty
 
+    def setFrogstart(self, x, y):
+        """
+        Sets the starting position of the frog, where it comes back after a death.
+
+        Parameter x: The starting column of the frog.
+        Precondition: x is an int in range(width of the level//GRID_SIZE)
+
+        Parameter y: The starting lane of the frog.
+        Precondition: y is an int in range(number of lanes)
+        """
+        self._frogstartx = x
+        self._frogstarty = y
+
     def getFroglives(self):
         """
         Returns the frog lives.
@@ -203,8 +340,15 @@ class Level(object):
         """
         return self._win
 
+    def getLanes(self):
+        """
+        Returns the number of lanes in this level
+        """
+        return len(self._lanes)
+
     # INITIALIZER (standard form) TO CREATE THE FROG AND LANES
-    def __init__(self, objects, json, width, height):
+    def __init__(self, objects, json, width, height, headless=False,
+                 vectorized=False, speed=FROG_SPEED, traffic=None):
         """
         Initializes a game Level corresponding to a specific json.
 
@@ -212,9 +356,11 @@ class Level(object):
         Level information, along with the height and width of the window of this
         specfic level, in order to create the respective game Level.
 
-        From this dictionary, the 'lanes' list is extracted in order to create
-        individual GTiles for each lane of this level. Then, each of these lanes
-        are used to create composite Lane objects.
+        From this dictionary, the objects of every lane are compiled into one
+        Traffic (unless it was compiled already). Then the 'lanes' list is used
+        to create one Lane object for each lane of this level (a Grass, Road,
+        Water or Hedge), which builds the GTile and the GImages for that lane
+        only.
 
         Additionally, the frog starting position is extracted from the json,
         which is then used in order to create the frog at the starting position.
@@ -234,10 +380,26 @@ class Level(object):
         Parameter height: The height of the level.
         Precondition: height is an int that corresponds to the width
         of the level file
+
+        Parameter headless: whether to simulate without drawing or sound
+        Precondition: headless is a boolean
+
+        Parameter vectorized: whether to move the obstacles with NumPy
+        Precondition: vectorized is a boolean
+
+        Parameter speed: The number of seconds a frog jump takes
+        Precondition: speed is a number > 0
+
+        Parameter traffic: the objects of the level, if they were compiled already
+        (on another thread, see campaign.py), or None to compile them here
+        Precondition: traffic is None or a new Traffic for json and width (it is
+        vectorized or not as it was made, whatever vectorized is)
         """
-        self._deathSound = Sound(SPLAT_SOUND)
+        self._headless = headless
+        self._frogspeed = speed
+        self._profiler = NullProfiler()
+        self._deathSound = self._sound(SPLAT_SOUND)
         self._death = None
-        self._comp=None
         self._win = None
         self._reachexit = None
         self._objects_json = objects
@@ -246,23 +408,25 @@ class Level(object):
         self._width = width
         self._fullheight = height
         self._height = height//(len(self._json['lanes']))
-        lanes = self._json['lanes']
+        if traffic is None:
+            traffic = Traffic(self._json, self._width, vectorized)
+        self._traffic = traffic
         self._lanes = []
-        i=0
-        for item in self._json['lanes']:
-            source = item['type'] + '.png'
-            object = GTile(left = 0, bottom = GRID_SIZE*i, width=self._width,
-            height=self._height, source=source)
-            i = i+1
-            self._lanes.append(object)
-        for i in range(len(self._lanes)):
-            self._comp=Lane(self._objects_json, self._json, self._lanes)
+        self._hedges = []
+        self._water = []
+        self._reach = (0, 0)
+        self._logs = set()
+        self._boxes = []
+        self._before = None
+        self._addlanes(self._json['lanes'])
         self._frogstartx = self._json['start'][0]
         self._frogstarty = self._json['start'][1]
         self.setFrog(self._frogstartx, self._frogstarty)
         self._froglives=self._displaylives(len(self._lanes))
         self._liveslabel= self._liveslabel()
-        self._open_or_exit=self._opens_and_exits()
+        self._viewheight = self._fullheight
+        self._hud = Layer(self._width, self._viewheight, not headless)
+        self._layout()
 
     # UPDATE METHOD TO MOVE THE FROG AND UPDATE ALL OF THE LANES
     def update(self, input, dt):
@@ -271,16 +435,23 @@ class Level(object):
         has died.
 
         This method updates the frog position by calling the update method for
-        the frog object. This method also calls the update method for the Lane
-        objects, and if it returns 'reached exit', this method will set the frog
-        to None, and set the _reachexit attribute to 'yes'. If the player has
-        won the game, this method will set the _win attribute to 'win'.
+        the frog object, and moves the camera to follow it. This method also
+        moves the Traffic and then calls the update method for each Lane in the
+        window of the camera (the frog cannot reach the others, whose objects
+        are only moved when they are needed), row by row, and if one returns
+        'reached exit', this method will set the frog to None, set the _reachexit
+        attribute to 'yes', and mark the exit as safe in the grid. If the player
+        has won the game, this method will set the _win attribute to 'win'.
 
         If the _death attribute is not None, then this method will call the
         update method for death, and if it returns 'done', this method will set
         the _death attribute to None, deduct a life, and then return 'dead'.
         This method also calls the road death and log ride methods.
 
+        Each of these parts is timed as a section of the profiler of this
+        level (see setProfiler), which does nothing unless the game is
+        profiled.
+
         Parameter input: The keyboard input.
         Precondition: input is a string that refers to the particular key
         that the player presses.
@@ -289,45 +460,88 @@ class Level(object):
         Precondition: dt is an number >= 0
         """
         self.input = input
+        profiler = self._profiler
         if self._frog is not None:
-            EastorWest = self._collideEastorWest()
-            North = self._collideNorth()
-            South = self._collideSouth()
-            self._frog.update(dt, input, self._width, self._fullheight,
-            EastorWest, North, South)
+            self._before = (self._frog.x, self._frog.y)
+        else:
+            self._before = None
+        if self._frog is not None:
+            with profiler.section('collide'):
+                EastorWest = self._collideEastorWest()
+                North = self._collideNorth()
+                South = self._collideSouth()
+            with profiler.section('frog'):
+                self._frog.update(dt, input, self._width, self._fullheight,
+                EastorWest, North, South)
+                self._camera.follow(self._frog.y)
         if self._frog is not None:
-            if self._comp.update(dt, self._frog)=='reached exit':
-                self._frog = None
-                self._reachexit = 'yes'
-        if self._comp.checkWin()=='game won':
-            self._win = 'win'
+            with profiler.section('traffic'):
+                self._traffic.advance(dt)
+            with profiler.section('lanes'):
+                first, stop = self._camera.getRows()
+                for lane in self._lanes[first:stop]:
+                    if lane.update(dt, self._frog)=='reached exit':
+                        self._frog = None
+                        self._reachexit = 'yes'
+                        self._fillexits(lane)
+        else:
+            self._traffic.hold()
+        with profiler.section('checkWin'):
+            if self._checkWin()=='game won':
+                self._win = 'win'
         if self._death is not None:
             if self._death.update(dt) == "done":
                 self._death = None
                 self._froglives=self._froglives[:-1]
                 return 'dead'
-        self._roadDeath()
-        self._logride(dt)
+        with profiler.section('roadDeath'):
+            self._roadDeath()
+        with profiler.section('logride'):
+            self._logride(dt)
 
-    def draw(self, view):
+    def draw(self, view, alpha=None):
         """
         Draws the frog, lane, and death objects to the view.
 
+        What never moves (the lane tiles, the hedges and the safe frogs) is drawn
+        as pictures of VIEW_LANES lanes, the backdrops, which are only drawn again
+        if the size of the view changes or the frog reaches an exit.  The lives and
+        their label are drawn as another picture, which is drawn again whenever the
+        frog dies (see Layer).  Only the moving obstacles, the frog and its death
+        are drawn one by one.
+
+        Only the lanes near the window of the camera are drawn, and the level is
+        shifted down by the height of the camera.  The backdrops that are not near
+        the window are released.
+
+        The drawing is timed as the section 'draw' of the profiler.
+
         Parameter view: The view to draw to
         Precondition: view is a GView object
+
+        Parameter alpha: How far to draw the obstacles between their previous
+        and current position (None draws them at their current position)
+        Precondition: alpha is None or a float in [0,1]
         """
-        for lane in self._lanes:
-            lane.draw(view)
-        self._comp.draw(view)
-        if self._frog is not None:
-            self._frog.draw(view)
-        if self._death is not None:
-            self._death.draw(view)
-        for x in self._froglives:
-            x.draw(view)
-        self._liveslabel.draw(view)
-        for x in range(len(self._comp.getbluefrog())):
-            self._comp.getbluefrog()[x].draw(view)
+        with self._profiler.section('draw'):
+            size = getattr(view, 'size', None)
+            key = () if size is None else tuple(size)
+            first, stop = self._camera.getRows()
+            self._camera.begin(view)
+            for i in range(len(self._backdrops)):
+                self._drawBackdrop(view, i, key, first, stop)
+            for lane in self._lanes[first:stop]:
+                lane.drawObjects(view, alpha)
+            if self._frog is not None:
+                self._frog.draw(view)
+            if self._death is not None:
+                self._death.draw(view)
+            self._camera.end(view)
+            key = (len(self._froglives), key)
+            if self._hud.getKey() != key:
+                draws = [x.draw for x in self._froglives]
+                self._hud.build(key, draws+[self._liveslabel.draw])
+            self._hud.draw(view)
 
     def livescounter(self):
         """
@@ -341,59 +555,189 @@ class Level(object):
         else:
             return 'still going'
 
+    def extend(self, lanes):
+        """
+        Adds lanes above the last lane of this level.
+
+        The lanes are compiled into the Traffic and built like the lanes of the
+        level file, and the level grows by their height. Their objects start
+        where the lanes put them (see extend in Traffic).
+
+        Parameter lanes: the lanes to add, bottom first
+        Precondition: lanes is a list of lane dictionaries, as in the 'lanes' of
+        a valid level json
+        """
+        self._traffic.extend(lanes)
+        self._addlanes(lanes)
+        self._fullheight = (len(self._lanes)*GRID_SIZE)+GRID_SIZE
+        self._layout()
+
+    def trim(self, count):
+        """
+        Removes the first count lanes of this level, to free their memory.
+
+        The lanes that are left move down by count lanes, so that the first of
+        them is lane 0, and so do the frog, its death and its starting position.
+        The level shrinks by the height of the lanes removed.
+
+        Parameter count: the number of lanes to remove
+        Precondition: count is an int in range(number of lanes). The frog must
+        not be jumping, and neither the frog nor its start may be in the lanes
+        removed
+        """
+        removed = self._traffic.trim(count)
+        kept = self._lanes[count:]
+        self._lanes = []
+        for lane in kept:
+            lane.setRow(len(self._lanes))
+            self._lanes.append(lane)
+        self._hedges = [x for x in self._hedges if x in self._lanes]
+        self._water = [x for x in self._water if x in self._lanes]
+        self._logs = set([i-removed for i in self._logs if i >= removed])
+        self._boxes = self._boxes[removed:]
+        dy = count*GRID_SIZE
+        if self._frog is not None:
+            self._frog.y = self._frog.y-dy
+        if self._death is not None:
+            self._death.y = self._death.y-dy
+        if self._before is not None:
+            self._before = (self._before[0], self._before[1]-dy)
+        self._frogstarty = self._frogstarty-count
+        self._fullheight = (len(self._lanes)*GRID_SIZE)+GRID_SIZE
+        self._layout()
+
+    def reload(self, objects, json):
+        """
+        Changes this level to a new version of its level file, and returns the
+        number of lanes that were built again.
+
+        Only the lanes that changed are built again: those whose json changed,
+        and those with an object whose image (and so its hitbox) changed in the
+        objects json. Every other lane is kept as it is, with its objects where
+        they are, so the work depends on the size of the edit and not on the
+        size of the level. The objects of the new lanes start where the level
+        file puts them (see replace in Traffic).
+
+        The frog keeps its position and its lives. A hedge that is built again
+        keeps the safe frogs in the exits that are still in the same column.
+        The frog and its death use the new sprites the next time they are made.
+
+        If the width of the level or its offscreen squares changed, every
+        object would move, so nothing is changed and the method returns -1.
+        The level must then be made again.
+
+        Parameter objects: A json dictionary of objects
+        Precondition: objects is a valid objects json
+
+        Parameter json: the new version of the level file
+        Precondition: json is a valid level json. This level was made from a
+        level file (it is not an endless level) and was not extended or trimmed
+        """
+        if (json['size'][0]*GRID_SIZE != self._width or
+            json['offscreen'] != self._json['offscreen']):
+            return -1
+        images = objects['images']
+        old = self._objects_json['images']
+        changed = set([kind for kind in images if old.get(kind) != images[kind]])
+        before = self._json['lanes']
+        after = json['lanes']
+        self._objects_json = objects
+        self._sprites = objects['sprites']
+        self._json = json
+        self._frogstartx = json['start'][0]
+        self._frogstarty = json['start'][1]
+        # The lanes that are the same at the bottom and at the top
+        count = min(len(before), len(after))
+        low = 0
+        while low < count and self._samelane(before[low], after[low], changed):
+            low = low+1
+        high = 0
+        while (high < count-low and
+               self._samelane(before[-1-high], after[-1-high], changed)):
+            high = high+1
+        edits = []
+        if len(before) == len(after):
+            for row in range(low, len(after)-high):
+                if self._samelane(before[row], after[row], changed):
+                    continue
+                if edits != [] and edits[-1][1] == row:
+                    edits[-1] = (edits[-1][0], row+1)
+                else:
+                    edits.append((row, row+1))
+        else:
+            edits.append((low, len(before)-high))
+        layout = len(before) != len(after)
+        built = 0
+        for first, stop in edits:
+            lanes = after[first:stop+len(after)-len(before)]
+            layout = self._splice(first, stop, lanes) or layout
+            built = built+len(lanes)
+        self._reach = (0, 0)
+        for lane in self._lanes:
+            reach = lane.getReach()
+            self._reach = (max(self._reach[0], reach[0]),
+                           max(self._reach[1], reach[1]))
+        if layout:
+            self._fullheight = (len(self._lanes)*GRID_SIZE)+GRID_SIZE
+            self._layout()
+        else:
+            for first, stop in edits:
+                self._relayout(first, stop)
+        return built
+
     # ANY NECESSARY HELPERS (SHOULD BE HIDDEN)
     def _roadDeath(self):
         """
         Returns 'dead' if the frog is dead.
 
-        This method detects whether one of the vehicles contains the frog, which
-        indicates if the frog has been in a car accident. If this condition is
-        met, then a death object is created with the coordinates of where the
-        frog died, the death sound is played, the frog is set to None, and this
-        method will return 'dead'.
+        This method detects whether one of the vehicles hit the frog, which
+        indicates if the frog has been in a car accident. A vehicle hits the
+        frog if it contained the frog at any time during the last frame, and not
+        just at the end of it (see _sweep), so a fast vehicle or a long frame
+        cannot skip over the frog. Only the objects that could have reached
+        the frog in the frame are checked. If this condition is met, then a
+        death object is created with the coordinates of where the frog died, the
+        death sound is played, the frog is set to None, and this method will
+        return 'dead'.
         """
         if self._frog is not None:
             frog_row = int(self._frog.y//64)
-            for j in self._comp.getObjects():
-                if (j.contains((self._frog.x, self._frog.y)) and
-                self._lanes[frog_row].source=='road.png'):
-                    self.setDeath(self._frog.x, self._frog.y)
-                    self._deathSound.play()
-                    self._frog = None
-                    return "dead"
+            if not isinstance(self._lanes[frog_row], Road):
+                return None
+            end = (self._frog.x, self._frog.y)
+            start = end if self._before is None else self._before
+            reach = self._reach
+            travel = self._traffic.getTravel()
+            first = int((min(start[1], end[1])-reach[1])//GRID_SIZE)
+            last = int((max(start[1], end[1])+reach[1])//GRID_SIZE)
+            for row in range(first, last+1):
+                for i in self._traffic.getNearby(row,
+                        min(start[0], end[0])-reach[0]-travel,
+                        max(start[0], end[0])+reach[0]+travel):
+                    if self._sweep(i, start, end):
+                        self.setDeath(self._frog.x, self._frog.y)
+                        self._deathSound.play()
+                        self._frog = None
+                        return "dead"
 
     def _logride(self, dt):
         """
         Returns 'alive' if frog is alive, or 'drowning' if frog is drowning.
 
-        This method creates a list for logs, for the speeds of the water lanes,
-        and for the speeds of each log. It then determines whether the frog is
-        in the water. If the frog is on a log, then this method will return
-        'alive'. Otherwise, if the frog is just in the water, this method will
-        create a death object, play the death sound, set the frog to None, and
-        return 'drowning'.
+        This method determines whether the frog is in one of the water lanes,
+        which are found once when the level is loaded. If the frog is on a log,
+        then this method will return 'alive'. Otherwise, if the frog is just in
+        the water, this method will create a death object, play the death sound,
+        set the frog to None, and return 'drowning'.
 
         Parameter dt: The time since the last animation frame.
         Precondition: dt is an number >= 0
         """
-        waterlanespeed=[]
-        logs= []
-        for x in self._json['lanes']:
-            if x['type']=='water':
-                logs.append(x['objects'])
-                waterlanespeed.append(x['speed'])
-        logspeeds = []
-        for i in range(len(logs)):
-            for j in logs[i]:
-                logspeeds.append(waterlanespeed[i])
-        water_lanes = []
-        for x in range(len(self._lanes)):
-            if self._lanes[x].source == 'water.png':
-                water_lanes.append(self._lanes[x])
         if self._frog is not None and self._frog.getAnimator() is None:
-            for x in range(len(water_lanes)):
-                if water_lanes[x].contains((self._frog.x, self._frog.y)):
-                    if self._onlog(water_lanes, logspeeds, dt):
+            for x in range(len(self._water)):
+                tile = self._water[x].getTile()
+                if tile.contains((self._frog.x, self._frog.y)):
+                    if self._onlog(dt):
                         return 'alive'
                     else:
                         self.setDeath(self._frog.x, self._frog.y)
@@ -401,39 +745,28 @@ class Level(object):
                         self._frog = None
                         return 'drowning'
 
-    def _onlog(self, water_lanes, logspeeds, dt):
+    def _onlog(self, dt):
         """
         Returns True if frog is on the log, else, returns False.
 
-        This method creates a list of the log objects, and determines whether
-        any of the logs contain the frog. If this condition is met and the frog
-        is within the frame of the level, the frog's x coordinate will
-        change at the same speed as the log's while the frog remains stationary
-        on the log, and this method will return True. Otherwise, this method
-        will return False.
-
-        Parameter water_lanes: the lanes of water.
-        Precondition: water_lanes is a list of GTile objects that have the
-        source 'water'
-
-        Parameter logspeeds: list of speeds of logs.
-        Precondition: logspeeds is a list that corresponds to the speeds of each
-        log. The length of this list should be the same as the number of logs
-        in the level.
+        This method determines whether any of the logs near the frog (see
+        _getNearby) contain the frog (see contains in Lane). If this condition
+        is met and the frog is within the frame of the level, the frog's x
+        coordinate will change at the same speed as the log's while the frog
+        remains stationary on the log, and this method will return True.
+        Otherwise, this method will return False.
 
         Parameter dt: The time since the last animation frame.
         Precondition: dt is an number >= 0
         """
-        logs = []
-        for x in self._comp.getObjects():
-            if 'log' in x.source:
-                logs.append(x)
-
-        for i in range(len(logs)):
-            if logs[i].contains((self._frog.x, self._frog.y)):
+        point = (self._frog.x, self._frog.y)
+        for i in self._getNearby(point):
+            if (i in self._logs and
+                self._lanes[self._traffic.getRow(i)].contains(i, point)):
                 if (self._frog.x>=(GRID_SIZE//2) and
                 self._frog.x<=self._width-(GRID_SIZE//2)):
-                    self._frog.x = self._frog.x + (logspeeds[i]*dt)
+                    speed = self._traffic.getSpeed(i)
+                    self._frog.x = self._frog.x + (speed*dt)
                     return True
                 else:
                     return False
@@ -454,7 +787,7 @@ class Level(object):
         x=(self._width)-(GRID_SIZE//2)
         y=height
         for i in range(3):
-            frog = GImage(x=x,y=y,width=GRID_SIZE,height=GRID_SIZE)
+            frog = self._image(GImage, x=x,y=y,width=GRID_SIZE,height=GRID_SIZE)
             frog.source=FROG_HEAD
             list.append(frog)
             x = x-GRID_SIZE
@@ -468,28 +801,473 @@ class Level(object):
         right corner of the level window frame, placed in front of the frog
         live heads.
         """
-        label = GLabel(text="Lives:",font_size=ALLOY_SMALL,font_name=ALLOY_FONT)
+        label = self._image(GLabel, text="Lives:",font_size=ALLOY_SMALL,
+        font_name=ALLOY_FONT)
         label.linecolor=introcs.RGB(0,100,0)
         label.right=self._froglives[0].left-2*GRID_SIZE
         label.y = self._froglives[0].y
         return label
 
+    def _image(self, cls, **keywords):
+        """
+        Returns a new drawable object, or a Box if this level is headless.
+
+        Parameter cls: The game2d class to create when not headless
+        Precondition: cls is GImage, GTile, GSprite or GLabel
+
+        Parameter keywords: The keyword arguments for the constructor
+        Precondition: keywords are valid arguments for cls
+        """
+        if self._headless:
+            return Box(**keywords)
+        return cls(**keywords)
+
+    def _sound(self, source):
+        """
+        Returns the shared Sound, or a Mute if this level is headless.
+
+        Parameter source: The sound file
+        Precondition: source is a string naming a sound file
+        """
+        if self._headless:
+            return Mute(source)
+        return Assets.sound(source)
+
     def _opens_and_exits(self):
         """
-        Returns list of open and exit objects.
+        Returns list of the indices of the open and exit objects.
 
-        This method will identify whether an object is an open or exit, and if
-        this condition is met, it will add it to a list of opens and exits, and
-        return this list.
+        This method will identify whether an object of a hedge is an open or
+        exit, and if this condition is met, it will add its index in the Traffic
+        to a list of opens and exits, and return this list.
         """
-        object_list=self._comp.getObjects()
         open_or_exit = []
-        for i in range(len(object_list)):
-            if (object_list[i].source=='open.png' or
-            object_list[i].source=='exit.png'):
-                open_or_exit.append(object_list[i])
+        for hedge in self._hedges:
+            start, stop = self._traffic.getSpan(hedge.getRow())
+            for i in range(start, stop):
+                if (self._traffic.getKind(i)=='open' or
+                self._traffic.getKind(i)=='exit'):
+                    open_or_exit.append(i)
         return open_or_exit
 
+    def _addlanes(self, lanes):
+        """
+        Creates the Lane objects for lanes above the last lane of this level.
+
+        The objects of the lanes must already be in the Traffic. Their hitboxes
+        are kept for sweeping (see _boxes), and the logs among them are found.
+
+        Parameter lanes: the lanes to add, bottom first
+        Precondition: lanes is a list of lane dictionaries, whose objects are the
+        last objects of _traffic
+        """
+        for item in lanes:
+            lane = self._newlane(item, len(self._lanes))
+            self._lanes.append(lane)
+            if isinstance(lane, Hedge):
+                self._hedges.append(lane)
+            if isinstance(lane, Water):
+                self._water.append(lane)
+            reach = lane.getReach()
+            self._reach = (max(self._reach[0], reach[0]),
+                           max(self._reach[1], reach[1]))
+        for i in range(len(self._boxes), self._traffic.size()):
+            if 'log' in self._traffic.getKind(i):
+                self._logs.add(i)
+            self._boxes.append(self._box(i))
+
+    def _box(self, i):
+        """
+        Returns the hitbox of object i of the Traffic, for sweeping it (see _boxes)
+
+        Parameter i: the object index
+        Precondition: i is an int in range(_traffic.size()), in a lane of _lanes
+        """
+        return self._lanes[self._traffic.getRow(i)].getBounds(i)
+
+    def _layout(self):
+        """
+        Finds the gates, the grid, the camera and the backdrops for the lanes.
+
+        This is done when the level is loaded, and again whenever lanes are
+        added or removed (see extend, trim and reload). The exits that have a
+        safe frog stay safe.
+        """
+        self._open_or_exit=self._opens_and_exits()
+        self._grid, self._gates = self._makegrid()
+        for hedge in self._hedges:
+            self._fillexits(hedge)
+        self._camera = Camera(len(self._lanes), self._viewheight)
+        if self._frog is not None:
+            self._camera.follow(self._frog.y)
+        self._backdrops = []
+        for first in range(0, len(self._lanes), VIEW_LANES):
+            rows = min(VIEW_LANES, len(self._lanes)-first)
+            self._backdrops.append(Layer(self._width, rows*GRID_SIZE,
+                                         not self._headless, first*GRID_SIZE))
+
+    def _newlane(self, json, row):
+        """
+        Returns a new Lane of the right class for the given lane json.
+
+        Lanes of an unknown type are plain Lane objects, which are as safe as
+        grass.
+
+        Parameter json: A json dictionary with lane information
+        Precondition: json is one of the 'lanes' of _json
+
+        Parameter row: The index of the lane in the level
+        Precondition: row is an int >= 0
+        """
+        if json['type'] == 'grass':
+            cls = Grass
+        elif json['type'] == 'road':
+            cls = Road
+        elif json['type'] == 'water':
+            cls = Water
+        elif json['type'] == 'hedge':
+            cls = Hedge
+        else:
+            cls = Lane
+        return cls(self._objects_json['images'], json, row, self._traffic,
+        self._width, self._height, self._headless)
+
+    def _samelane(self, before, after, changed):
+        """
+        Returns True if a lane does not need to be built again.
+
+        Parameter before: the lane json the lane was built from
+        Precondition: before is one of the 'lanes' of a valid level json
+
+        Parameter after: the new lane json
+        Precondition: after is one of the 'lanes' of a valid level json
+
+        Parameter changed: the object types whose image changed
+        Precondition: changed is a set of strings
+        """
+        if before != after:
+            return False
+        if 'objects' in after:
+            for dictionary in after['objects']:
+                if dictionary['type'] in changed:
+                    return False
+        return True
+
+    def _splice(self, first, stop, lanes):
+        """
+        Replaces lanes first to stop-1 with new lanes, and returns True if a
+        hedge was removed or added.
+
+        The objects of the new lanes are put in the Traffic, in place of the
+        objects of the old ones (see replace in Traffic), and their hitboxes and
+        logs are found. The lanes above them are moved to their new rows if the
+        number of lanes or objects changed. A new hedge keeps the safe frogs of
+        the old hedge in the same row, in the exits in the same columns.
+
+        The grid, camera and backdrops are not changed (see _relayout and
+        _layout), and neither are the gates, unless their objects moved in the
+        Traffic.
+
+        Parameter first: the first lane to replace
+        Precondition: first is an int in range(len(_lanes)+1)
+
+        Parameter stop: the lane after the last lane to replace
+        Precondition: stop is an int in range(first, len(_lanes)+1)
+
+        Parameter lanes: the new lanes, bottom first
+        Precondition: lanes is a list of lane dictionaries, as in the 'lanes' of
+        a valid level json
+        """
+        hedge = False
+        occupied = {}
+        for lane in self._lanes[first:stop]:
+            if isinstance(lane, Hedge):
+                hedge = True
+                exits = lane.getExits()
+                occupied[lane.getRow()] = set([int(exits[i].x//GRID_SIZE)
+                    for i in range(len(exits)) if lane.getOccupied() & (1 << i)])
+        size = self._traffic.size()
+        start = self._traffic.getSpan(first)[0] if first < len(self._lanes) else size
+        end = self._traffic.getSpan(stop)[0] if stop < len(self._lanes) else size
+        self._traffic.replace(first, stop, lanes)
+        delta = self._traffic.size()-size
+        built = []
+        for item in lanes:
+            lane = self._newlane(item, first+len(built))
+            built.append(lane)
+            if isinstance(lane, Hedge):
+                hedge = True
+                columns = occupied.get(lane.getRow(), set())
+                exits = lane.getExits()
+                bits = 0
+                for i in range(len(exits)):
+                    if int(exits[i].x//GRID_SIZE) in columns:
+                        bits = bits | (1 << i)
+                lane.setOccupied(bits)
+        self._lanes[first:stop] = built
+        if delta != 0 or len(lanes) != stop-first:
+            for row in range(first+len(lanes), len(self._lanes)):
+                self._lanes[row].setRow(row)
+        self._hedges = [x for x in self._lanes if isinstance(x, Hedge)]
+        self._water = [x for x in self._lanes if isinstance(x, Water)]
+        self._logs = set([i if i < start else i+delta for i in self._logs
+                          if not start <= i < end])
+        self._boxes[start:end] = [self._box(i) for i in range(start, end+delta)]
+        for i in range(start, end+delta):
+            if 'log' in self._traffic.getKind(i):
+                self._logs.add(i)
+        if delta != 0 and not hedge:
+            # The gates above the new lanes are the same objects, moved in the Traffic
+            self._open_or_exit = [i if i < start else i+delta
+                                  for i in self._open_or_exit]
+            for cell in self._gates:
+                self._gates[cell] = [i if i < start else i+delta
+                                     for i in self._gates[cell]]
+        return hedge
+
+    def _relayout(self, first, stop):
+        """
+        Finds the grid cells of lanes first to stop-1 again, and releases their
+        backdrops so that they are drawn again.
+
+        This is enough after lanes were replaced by as many lanes, if none of
+        them, old or new, is a hedge (the gates are only in hedges). Otherwise
+        the level needs _layout.
+
+        Parameter first: the first lane replaced
+        Precondition: first is an int in range(len(_lanes))
+
+        Parameter stop: the lane after the last lane replaced
+        Precondition: stop is an int in range(first+1, len(_lanes)+1)
+        """
+        columns = (self._width+GRID_SIZE-1)//GRID_SIZE
+        for row in range(first, stop):
+            self._grid[row] = [self._lanes[row].getType()]*columns
+        for i in range(first//VIEW_LANES, (stop-1)//VIEW_LANES+1):
+            self._backdrops[i].release()
+
+    def _checkWin(self):
+        """
+        Returns 'game won' if all of the exits of every hedge are occupied.
+
+        A level without exits (like an endless level, which has no hedges) is
+        never won.
+        """
+        if sum([len(hedge.getExits()) for hedge in self._hedges]) == 0:
+            return None
+        for hedge in self._hedges:
+            if hedge.checkWin()!='game won':
+                return None
+        return 'game won'
+
+    def _getbluefrog(self):
+        """
+        Returns the list of the safe frogs in every hedge.
+        """
+        bluefrog = []
+        for hedge in self._hedges:
+            bluefrog.extend(hedge.getbluefrog())
+        return bluefrog
+
+    def _makegrid(self):
+        """
+        Returns the grid of cells and the gates of the level (see _grid and
+        _gates)
+
+        The frog moves from cell to cell, so whether it may move is decided by
+        the cell it moves to (see _cell). A gate is listed for every cell its
+        hitbox may overlap, so that a frog carried off center by a log is still
+        checked against the exact hitbox.
+        """
+        columns = (self._width+GRID_SIZE-1)//GRID_SIZE
+        grid = []
+        for lane in self._lanes:
+            if isinstance(lane, Hedge):
+                grid.append(['hedge']*columns)
+            else:
+                grid.append([lane.getType()]*columns)
+        gates = {}
+        for i in self._open_or_exit:
+            row = self._traffic.getRow(i)
+            center = (self._traffic.getX(i), (row*GRID_SIZE)+(GRID_SIZE//2))
+            column = int(center[0]//GRID_SIZE)
+            if 0 <= column < columns:
+                grid[row][column] = self._traffic.getKind(i)
+            reach = self._lanes[row].getReach()
+            for y in range(int((center[1]-reach[1])//GRID_SIZE),
+                           int((center[1]+reach[1])//GRID_SIZE)+1):
+                for x in range(int((center[0]-reach[0])//GRID_SIZE),
+                               int((center[0]+reach[0])//GRID_SIZE)+1):
+                    gates.setdefault((y, x), []).append(i)
+        return grid, gates
+
+    def _fillexits(self, hedge):
+        """
+        Marks the cells of the occupied exits of hedge as 'safe'.
+
+        Parameter hedge: the hedge a frog reached an exit of
+        Precondition: hedge is a Hedge in _lanes
+        """
+        row = self._grid[hedge.getRow()]
+        exits = hedge.getExits()
+        for i in range(len(exits)):
+            column = int(exits[i].x//GRID_SIZE)
+            if hedge.getOccupied() & (1 << i) and 0 <= column < len(row):
+                row[column] = 'safe'
+
+    def _cell(self, point):
+        """
+        Returns the cell of the grid that contains point, or None if point is
+        above or below the level.
+
+        A point to the left or right of the level is in a cell of the type of
+        its lane ('hedge' in a hedge).
+
+        Parameter point: the point to check
+        Precondition: point is a tuple or list of two numbers
+        """
+        row = int(point[1]//GRID_SIZE)
+        if not 0 <= row < len(self._grid):
+            return None
+        column = int(point[0]//GRID_SIZE)
+        if 0 <= column < len(self._grid[row]):
+            return self._grid[row][column]
+        if isinstance(self._lanes[row], Hedge):
+            return 'hedge'
+        return self._lanes[row].getType()
+
+    def _gate(self, point):
+        """
+        Returns the first open or exit whose hitbox contains point, or None.
+
+        Only the gates of the cell of point are checked (see _gates), against
+        their compiled hitboxes (see contains in Lane).
+
+        Parameter point: the point to check
+        Precondition: point is a tuple or list of two numbers
+        """
+        for i in self._gates.get((int(point[1]//GRID_SIZE),
+                                  int(point[0]//GRID_SIZE)), ()):
+            if self._lanes[self._traffic.getRow(i)].contains(i, point):
+                return self._getObject(i)
+        return None
+
+    def _getNearby(self, point):
+        """
+        Returns a sorted list of the indices of the objects whose hitbox might
+        contain point.
+
+        Only the lanes and objects that the spatial index of the Traffic puts
+        within reach of point are returned. Use contains of their lane to
+        check them.
+
+        Parameter point: the point to check
+        Precondition: point is a tuple or list of two numbers
+        """
+        reach = self._reach
+        first = int((point[1]-reach[1])//GRID_SIZE)
+        last = int((point[1]+reach[1])//GRID_SIZE)
+        nearby = []
+        for row in range(first, last+1):
+            nearby.extend(self._traffic.getNearby(row, point[0]-reach[0],
+            point[0]+reach[0]))
+        if first != last:
+            nearby.sort()
+        return nearby
+
+    def _sweep(self, i, start, end):
+        """
+        Returns True if the hitbox of object i contained the frog at some time
+        during the last frame.
+
+        The frog moved in a straight line from start to end in the frame, and the
+        object moved in a straight line from its previous position (see
+        getPreviousX in Traffic) to its current one. So the frog moved in a
+        straight line relative to the object, and this finds the part of the
+        frame in which that line is inside the hitbox (turned by the angle of
+        the object, see _boxes), in x and in y. The object contained the frog
+        if these parts overlap.
+
+        Parameter i: the object index
+        Precondition: i is an int in range(_traffic.size())
+
+        Parameter start: the position of the frog at the start of the frame
+        Precondition: start is a tuple of two numbers
+
+        Parameter end: the position of the frog at the end of the frame
+        Precondition: end is a tuple of two numbers
+        """
+        left, bottom, right, top = self._boxes[i]
+        y = (self._traffic.getRow(i)*GRID_SIZE)+(GRID_SIZE//2)
+        dx0 = start[0]-self._traffic.getPreviousX(i)
+        dx1 = end[0]-self._traffic.getX(i)
+        dy0 = start[1]-y
+        dy1 = end[1]-y
+        enter = 0.0
+        leave = 1.0
+        for a, b, low, high in ((dx0, dx1, left, right), (dy0, dy1, bottom, top)):
+            if a == b:
+                if a < low or a > high:
+                    return False
+            else:
+                t0 = (low-a)/(b-a)
+                t1 = (high-a)/(b-a)
+                enter = max(enter, min(t0, t1))
+                leave = min(leave, max(t0, t1))
+        return enter <= leave
+
+    def _drawBackdrop(self, view, i, key, first, stop):
+        """
+        Draws backdrop i to the view if it has a lane in range(first, stop), and
+        releases it otherwise.
+
+        The backdrop is built again if key or its safe frogs have changed.
+
+        Parameter view: The view to draw to
+        Precondition: view is a GView object
+
+        Parameter i: the index of the backdrop
+        Precondition: i is an int in range(len(_backdrops))
+
+        Parameter key: the size of the view
+        Precondition: key is a tuple
+
+        Parameter first: the first lane to draw
+        Precondition: first is an int >= 0
+
+        Parameter stop: the lane after the last lane to draw
+        Precondition: stop is an int >= first
+        """
+        layer = self._backdrops[i]
+        low = i*VIEW_LANES
+        high = min(low+VIEW_LANES, len(self._lanes))
+        if high <= first or low >= stop:
+            if layer.getKey() is not None:
+                layer.release()
+            return
+        occupied = []
+        for hedge in self._hedges:
+            if low <= hedge.getRow() < high:
+                occupied.append(hedge.getOccupied())
+        key = (key, tuple(occupied))
+        if layer.getKey() != key:
+            draws = []
+            for lane in self._lanes[low:high]:
+                draws.append(lane.drawBackground)
+                if isinstance(lane, Hedge):
+                    draws.extend([x.draw for x in lane.getbluefrog()])
+            layer.build(key, draws)
+        layer.draw(view)
+
+    def _getObject(self, i):
+        """
+        Returns the GImage for object i of the Traffic, at its current position
+
+        Parameter i: the object index
+        Precondition: i is an int in range(_traffic.size())
+        """
+        return self._lanes[self._traffic.getRow(i)].getObject(i)
+
     def _collideNorth(self):
         """
         Returns False if the frog will land in a Hedge or occupied exit,
@@ -504,15 +1282,15 @@ class Level(object):
         True. This method will also return True, if the next position is in
         general not a hedge or occupied exit.
         """
-        frog_row = int(self._frog.y//64)
-        if (self._lanes[frog_row+1].source)=='hedge.png':
-            for j in self._comp.getbluefrog():
-                if j.contains((self._frog.x, (self._frog.y+GRID_SIZE))):
-                    return False
-            for j in self._open_or_exit:
-                if j.contains((self._frog.x, (self._frog.y+GRID_SIZE))):
-                    return True
-            return not self._frog.collides(self._lanes[frog_row])
+        point = (self._frog.x, self._frog.y+GRID_SIZE)
+        cell = self._cell(point)
+        if cell in ('hedge', 'open', 'exit', 'safe'):
+            if cell == 'safe':
+                return False
+            if self._gate(point) is not None:
+                return True
+            frog_row = int(self._frog.y//GRID_SIZE)
+            return not self._frog.collides(self._lanes[frog_row].getTile())
         else:
             return True
 
@@ -528,22 +1306,16 @@ class Level(object):
         open, this method will return True. This method will also return True,
         if the next position is in general not a hedge or exit.
         """
-        frog_row = int(self._frog.y//64)
-
-        if (self._lanes[frog_row-1].source)=='hedge.png':
-            for j in self._comp.getbluefrog():
-                if j.contains((self._frog.x, (self._frog.y-GRID_SIZE))):
-                    return False
-            for j in self._open_or_exit:
-                open = []
-                if j.source == 'open.png':
-                    open.append(j)
-                    for x in open:
-                        if x.contains((self._frog.x, (self._frog.y-GRID_SIZE))):
-                            return True
-                elif j.contains((self._frog.x, (self._frog.y-GRID_SIZE))):
-                    return False
-            return not self._frog.collides(self._lanes[frog_row])
+        point = (self._frog.x, self._frog.y-GRID_SIZE)
+        cell = self._cell(point)
+        if cell in ('hedge', 'open', 'exit', 'safe'):
+            if cell == 'safe':
+                return False
+            gate = self._gate(point)
+            if gate is not None:
+                return gate.source == 'open.png'
+            frog_row = int(self._frog.y//GRID_SIZE)
+            return not self._frog.collides(self._lanes[frog_row].getTile())
         else:
             return True
 
@@ -561,15 +1333,14 @@ class Level(object):
         return True. This method will also return True, if the next position is
         in general not a hedge or occupied exit.
         """
-        frog_row = int(self._frog.y//64)
-
-        if (self._lanes[frog_row].source)=='hedge.png':
-            for j in self._comp.getbluefrog():
-                if j.contains((self._frog.x, (self._frog.y-GRID_SIZE))):
-                    return False
-            for j in self._open_or_exit:
-                if j.contains((self._frog.x, self._frog.y)):
-                    return False
-            return not self._frog.collides(self._lanes[frog_row])
+        point = (self._frog.x, self._frog.y)
+        cell = self._cell(point)
+        if cell in ('hedge', 'open', 'exit', 'safe'):
+            if self._cell((self._frog.x, self._frog.y-GRID_SIZE)) == 'safe':
+                return False
+            if self._gate(point) is not None:
+                return False
+            frog_row = int(self._frog.y//GRID_SIZE)
+            return not self._frog.collides(self._lanes[frog_row].getTile())
         else:
             return True
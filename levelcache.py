@@ -0,0 +1,669 @@
+"""
+Level cache module for Froggit
+
+This module keeps compiled levels on disk, so that starting the game again (or playing
+a level again) does not read and parse its json files.  A level is compiled, together
+with the objects json it is played with, into a small binary file in the folder
+LEVEL_CACHE.  The next time the level is loaded, the cache file is memory-mapped and
+the level is read back from it.  The two json files are not even opened, unless they
+changed.
+
+A cache file is found by the paths of the level and objects files, and it holds the
+modification time, size and SHA-1 hash of both.  If the times and sizes still match,
+the cache is used as is.  If not, the files are read and hashed: if the hashes match
+(the files were only touched), the cache is still used, and its times are updated.
+Otherwise the level is compiled again.
+
+A cache file starts with a header (all numbers little-endian):
+
+    magic        4 bytes   b'FRGC'
+    version      4 bytes   unsigned int, CACHE_VERSION
+    level        40 bytes  modification time in ns (8), size (8) and SHA-1 (20) of the
+                           level file, and 4 bytes of padding
+    objects      40 bytes  the same for the objects file
+
+and then has the compiled objects and the compiled level (see encode_objects and
+encode_level).  Each of these is a list of sections, and each section starts on a
+multiple of 8 bytes, so that its numbers can be read in place.  Every string (a lane
+type, an object type, a file name) is written once in a table of strings at the start,
+and is given by its index everywhere else.  The objects of a level are stored as two
+arrays, their types and their positions, in the order of the level file.
+
+The keys that the game reads are compiled.  Any other key (of the level, a lane, an
+object, an image or a sprite) is kept as json text in a last section, which is empty
+for the files of the game.  So a level read back from the cache is equal to the json
+dictionary of its file (except that every number that is a whole number is an int),
+and can be compared with another level read the same way (see reload in Level).  The
+same encoding is used for level packs (see levelpack.py).
+
+The arrays of the objects are also what a Traffic compiles a level into.  So compile
+returns them along with the level, ready for Traffic, which then does not have to
+compile the objects again from the json dictionary.
+"""
+import array
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from consts import *
+from files  import find_json
+
+# The first bytes of every cache file
+CACHE_MAGIC = b'FRGC'
+# The version of the cache format; files of another version are compiled again
+CACHE_VERSION = 3
+# The header of a cache file
+CACHE_HEADER = struct.Struct('<4sI'+'qq20s4x'*2)
+
+# The count at the start of a section (padded to 8 bytes)
+_COUNT = struct.Struct('<I4x')
+# The length of a string in the table of strings
+_LENGTH = struct.Struct('<H')
+# The level: version, size, start, offscreen, the number of lanes and flags (1 if it
+# has a version)
+_LEVEL = struct.Struct('<d2i2idII')
+# A lane: its type, flags (1 if it has a speed, 2 if it has objects), speed, and the
+# index and number of its objects
+_LANE = struct.Struct('<IIdII')
+# An image: its name, flags (1 if it has a size, 2 if it has a hitbox), size, hitbox
+_IMAGE = struct.Struct('<II2d4d')
+# A sprite: its name, file, flags (1 if it has a size, 2 if it has a format, 4 if it
+# has hitboxes), the number of its hitboxes, size and format; its hitboxes follow
+_SPRITE = struct.Struct('<IIII2d2d')
+# A hitbox of a sprite
+_HITBOX = struct.Struct('<4d')
+
+
+def encode_objects(objects):
+    """
+    Returns the bytes of a compiled objects json.
+
+    The sections are the strings, the images, the sprites and the other keys.
+
+    Parameter objects: A json dictionary of objects
+    Precondition: objects is a valid objects json
+    """
+    strings = _Strings()
+    extra = {}
+    _keep(extra, 'objects', objects, ('images', 'sprites'))
+    images = bytearray()
+    for name in sorted(objects['images']):
+        image = objects['images'][name]
+        _keep(extra, 'images', image, ('size', 'hitbox'), name)
+        size = image.get('size', (0, 0))
+        hitbox = image.get('hitbox', (0, 0, 0, 0))
+        flags = ('size' in image)+2*('hitbox' in image)
+        images += _IMAGE.pack(strings.index(name), flags, *(list(size)+list(hitbox)))
+    sprites = bytearray()
+    for name in sorted(objects['sprites']):
+        sprite = objects['sprites'][name]
+        _keep(extra, 'sprites', sprite, ('file', 'size', 'format', 'hitboxes'), name)
+        size = sprite.get('size', (0, 0))
+        format = sprite.get('format', (0, 0))
+        hitboxes = sprite.get('hitboxes', [])
+        flags = ('size' in sprite)+2*('format' in sprite)+4*('hitboxes' in sprite)
+        sprites += _SPRITE.pack(strings.index(name), strings.index(sprite['file']),
+                                flags, len(hitboxes), *(list(size)+list(format)))
+        for hitbox in hitboxes:
+            sprites += _HITBOX.pack(*hitbox)
+    result = strings.encode()
+    result += _COUNT.pack(len(objects['images']))+images
+    result += _COUNT.pack(len(objects['sprites']))+sprites
+    result += _encodeExtra(extra)
+    return bytes(result)
+
+
+def decode_objects(buffer, offset=0):
+    """
+    Returns the tuple (objects, end) of the compiled objects at offset in buffer.
+
+    The value end is the offset just after the compiled objects.
+
+    Parameter buffer: the bytes to read
+    Precondition: buffer is a bytes-like object (or an mmap) with compiled objects
+    (see encode_objects) at offset
+
+    Parameter offset: the position of the compiled objects
+    Precondition: offset is an int >= 0, a multiple of 8
+    """
+    strings, offset = _decodeStrings(buffer, offset)
+    images = {}
+    count = _COUNT.unpack_from(buffer, offset)[0]
+    offset = offset+_COUNT.size
+    for i in range(count):
+        values = _IMAGE.unpack_from(buffer, offset)
+        offset = offset+_IMAGE.size
+        image = {}
+        if values[1] & 1:
+            image['size'] = _numbers(values[2:4])
+        if values[1] & 2:
+            image['hitbox'] = _numbers(values[4:8])
+        images[strings[values[0]]] = image
+    sprites = {}
+    count = _COUNT.unpack_from(buffer, offset)[0]
+    offset = offset+_COUNT.size
+    for i in range(count):
+        values = _SPRITE.unpack_from(buffer, offset)
+        offset = offset+_SPRITE.size
+        sprite = {'file': strings[values[1]]}
+        if values[2] & 1:
+            sprite['size'] = _numbers(values[4:6])
+        if values[2] & 2:
+            sprite['format'] = _numbers(values[6:8])
+        hitboxes = []
+        for j in range(values[3]):
+            hitboxes.append(_numbers(_HITBOX.unpack_from(buffer, offset)))
+            offset = offset+_HITBOX.size
+        if values[2] & 4:
+            sprite['hitboxes'] = hitboxes
+        sprites[strings[values[0]]] = sprite
+    objects = {'images': images, 'sprites': sprites}
+    extra, offset = _decodeExtra(buffer, offset)
+    objects.update(extra.get('objects', {}))
+    for name, keys in extra.get('images', {}).items():
+        images[name].update(keys)
+    for name, keys in extra.get('sprites', {}).items():
+        sprites[name].update(keys)
+    return (objects, offset)
+
+
+def encode_level(json):
+    """
+    Returns the bytes of a compiled level json.
+
+    The sections are the strings, the level, the lanes, the types of the objects,
+    the positions of the objects and the other keys.
+
+    Parameter json: A json dictionary with level information
+    Precondition: json is a valid level json
+    """
+    strings = _Strings()
+    extra = {}
+    _keep(extra, 'level', json, ('version', 'size', 'start', 'offscreen', 'lanes'))
+    lanes = bytearray()
+    kinds = array.array('I')
+    positions = array.array('d')
+    for row in range(len(json['lanes'])):
+        lane = json['lanes'][row]
+        _keep(extra, 'lanes', lane, ('type', 'speed', 'objects'), str(row))
+        items = lane.get('objects', [])
+        flags = ('speed' in lane)+2*('objects' in lane)
+        lanes += _LANE.pack(strings.index(lane['type']), flags, lane.get('speed', 0),
+                            len(kinds), len(items))
+        for item in items:
+            _keep(extra, 'objects', item, ('type', 'position'), str(len(kinds)))
+            kinds.append(strings.index(item['type']))
+            positions.append(item['position'])
+    result = strings.encode()
+    result += _LEVEL.pack(json.get('version', 1.0), json['size'][0], json['size'][1],
+                          json['start'][0], json['start'][1], json['offscreen'],
+                          len(json['lanes']), 'version' in json)
+    result += lanes
+    result += _COUNT.pack(len(kinds))
+    result += _little(kinds)
+    result += bytes(_padding(len(result)))
+    result += _little(positions)
+    result += _encodeExtra(extra)
+    return bytes(result)
+
+
+def decode_level(buffer, offset=0):
+    """
+    Returns the tuple (json, end) of the compiled level at offset in buffer.
+
+    The value end is the offset just after the compiled level.  The arrays of the
+    objects are copied out of the buffer in one piece each.
+
+    Parameter buffer: the bytes to read
+    Precondition: buffer is a bytes-like object (or an mmap) with a compiled level
+    (see encode_level) at offset
+
+    Parameter offset: the position of the compiled level
+    Precondition: offset is an int >= 0, a multiple of 8
+    """
+    json, compiled, offset = decode_traffic(buffer, offset)
+    return (json, offset)
+
+
+def decode_traffic(buffer, offset=0):
+    """
+    Returns the tuple (json, compiled, end) of the compiled level at offset in buffer.
+
+    This is decode_level, with the objects of the level as a Traffic compiles them:
+    compiled is the tuple (kinds, rows, speeds, xs, spans) of lists to give to
+    Traffic (see __init__ in Traffic).
+
+    Parameter buffer: the bytes to read
+    Precondition: buffer is a bytes-like object (or an mmap) with a compiled level
+    (see encode_level) at offset
+
+    Parameter offset: the position of the compiled level
+    Precondition: offset is an int >= 0, a multiple of 8
+    """
+    strings, offset = _decodeStrings(buffer, offset)
+    (version, width, height, startx, starty, offscreen, count,
+     present) = _LEVEL.unpack_from(buffer, offset)
+    offscreen = _number(offscreen)
+    offset = offset+_LEVEL.size
+    records = list(_LANE.iter_unpack(buffer[offset:offset+_LANE.size*count]))
+    offset = offset+_LANE.size*count
+    total = _COUNT.unpack_from(buffer, offset)[0]
+    offset = offset+_COUNT.size
+    kinds = _array('I', buffer, offset, total)
+    offset = offset+kinds.itemsize*total
+    offset = offset+_padding(offset)
+    positions = _array('d', buffer, offset, total)
+    offset = offset+positions.itemsize*total
+    names = [strings[i] for i in kinds]
+    places = [int(x) if x.is_integer() else x for x in positions]
+    items = [{'type': name, 'position': place} for name, place in zip(names, places)]
+    lanes = []
+    rows = []
+    speeds = []
+    spans = []
+    for kind, flags, speed, first, number in records:
+        lane = {'type': strings[kind]}
+        stop = first+number
+        if flags & 1:
+            speed = _number(speed)
+            lane['speed'] = speed
+        else:
+            speed = 0
+        if flags & 2:
+            lane['objects'] = items[first:stop]
+        if number:
+            rows.extend([len(lanes)]*number)
+            speeds.extend([speed]*number)
+        spans.append((first, stop))
+        lanes.append(lane)
+    xs = [(place*GRID_SIZE)+(GRID_SIZE//2) for place in places]
+    json = {'size': [width, height], 'start': [startx, starty],
+            'offscreen': offscreen, 'lanes': lanes}
+    if present & 1:
+        json['version'] = version
+    extra, offset = _decodeExtra(buffer, offset)
+    if extra != {}:
+        json.update(extra.get('level', {}))
+        for row, keys in extra.get('lanes', {}).items():
+            lanes[int(row)].update(keys)
+        for index, keys in extra.get('objects', {}).items():
+            items[int(index)].update(keys)
+    return (json, (names, rows, speeds, xs, spans), offset)
+
+
+class LevelCache(object):
+    """
+    A class representing a folder of compiled levels
+
+    Call load to get a level and its objects; it reads the cache file if it is up
+    to date, and compiles the level into it otherwise.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _folder: the folder of the cache files
+    # Invariant: _folder is a string naming a folder (made when it is first written)
+    #
+    # Attribute _hits: the number of loads that read a cache file
+    # Invariant: _hits is an int >= 0
+    #
+    # Attribute _misses: the number of loads that compiled the level
+    # Invariant: _misses is an int >= 0
+
+    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    def getFolder(self):
+        """
+        Returns the folder of the cache files
+        """
+        return self._folder
+
+    def getHits(self):
+        """
+        Returns the number of loads that read a cache file
+        """
+        return self._hits
+
+    def getMisses(self):
+        """
+        Returns the number of loads that compiled the level
+        """
+        return self._misses
+
+    def __init__(self, folder=LEVEL_CACHE):
+        """
+        Initializes a cache in the given folder.
+
+        A relative folder is next to this module.
+
+        Parameter folder: the folder of the cache files
+        Precondition: folder is a string
+        """
+        here = os.path.dirname(os.path.abspath(__file__))
+        self._folder = os.path.join(here, folder)
+        self._hits = 0
+        self._misses = 0
+
+    def load(self, name, objects=OBJECT_DATA):
+        """
+        Returns the tuple (objects, json) of a level and its objects.
+
+        The files are found like load_json finds them.  If the cache file cannot
+        be written, the level is still returned.
+
+        Parameter name: the level file
+        Precondition: name is a string naming a valid level json file
+
+        Parameter objects: the objects file
+        Precondition: objects is a string naming a valid objects json file
+        """
+        return self.compile(name, objects)[:2]
+
+    def compile(self, name, objects=OBJECT_DATA):
+        """
+        Returns the tuple (objects, json, compiled) of a level and its objects.
+
+        This is load, with the objects of the level compiled for Traffic (see
+        decode_traffic).
+
+        The files are found like load_json finds them.  If the cache file cannot
+        be written, the level is still returned.
+
+        Parameter name: the level file
+        Precondition: name is a string naming a valid level json file
+
+        Parameter objects: the objects file
+        Precondition: objects is a string naming a valid objects json file
+        """
+        paths = (find_json(name), find_json(objects))
+        file = self._path(paths)
+        stats = [os.stat(path) for path in paths]
+        header = None
+        try:
+            with open(file, 'rb') as source:
+                with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    header = CACHE_HEADER.unpack_from(data, 0)
+                    if (header[0] == CACHE_MAGIC and header[1] == CACHE_VERSION and
+                        header[2:4] == (stats[0].st_mtime_ns, stats[0].st_size) and
+                        header[5:7] == (stats[1].st_mtime_ns, stats[1].st_size)):
+                        self._hits = self._hits+1
+                        return self._decode(data)
+        except (OSError, ValueError, IndexError, struct.error):
+            header = None
+        contents = []
+        for path in paths:
+            with open(path, 'rb') as source:
+                contents.append(source.read())
+        hashes = [hashlib.sha1(x).digest() for x in contents]
+        if (header is not None and header[0] == CACHE_MAGIC and
+            header[1] == CACHE_VERSION and (header[4], header[7]) == tuple(hashes)):
+            # The files were touched, but not changed
+            self._hits = self._hits+1
+            with open(file, 'r+b') as source:
+                source.write(self._header(stats, hashes))
+                source.seek(0)
+                return self._decode(source.read())
+        self._misses = self._misses+1
+        level = json.loads(contents[0].decode('utf-8'))
+        table = json.loads(contents[1].decode('utf-8'))
+        body = encode_objects(table)+encode_level(level)
+        try:
+            os.makedirs(self._folder, exist_ok=True)
+            temporary = file+'.%d.tmp' % os.getpid()
+            with open(temporary, 'wb') as target:
+                target.write(self._header(stats, hashes)+body)
+            os.replace(temporary, file)
+        except OSError:
+            pass    # The level is still played, it is just compiled again next time
+        return self._decode(self._header(stats, hashes)+body)
+
+    def getPath(self, name, objects=OBJECT_DATA):
+        """
+        Returns the path of the cache file for a level and its objects.
+
+        Parameter name: the level file
+        Precondition: name is a string naming a level json file
+
+        Parameter objects: the objects file
+        Precondition: objects is a string naming an objects json file
+        """
+        return self._path((find_json(name), find_json(objects)))
+
+    def _path(self, paths):
+        """
+        Returns the path of the cache file for the given level and objects files.
+
+        The name of the cache file is the name of the level file, followed by a
+        hash of the full paths of both files.
+
+        Parameter paths: the paths of the level and objects files
+        Precondition: paths is a tuple of two strings naming existing files
+        """
+        key = os.path.abspath(paths[0])+'\0'+os.path.abspath(paths[1])
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        base = os.path.splitext(os.path.basename(paths[0]))[0]
+        return os.path.join(self._folder, base+'-'+digest+'.flc')
+
+    def _header(self, stats, hashes):
+        """
+        Returns the header of a cache file for files with the given stats and hashes.
+
+        Parameter stats: the stats of the level and objects files
+        Precondition: stats is a list of two os.stat_result
+
+        Parameter hashes: the SHA-1 hashes of the level and objects files
+        Precondition: hashes is a list of two 20-byte bytes
+        """
+        return CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION,
+                                 stats[0].st_mtime_ns, stats[0].st_size, hashes[0],
+                                 stats[1].st_mtime_ns, stats[1].st_size, hashes[1])
+
+    def _decode(self, data):
+        """
+        Returns the tuple (objects, json, compiled) in the contents of a cache file.
+
+        Parameter data: the contents of the cache file
+        Precondition: data is a bytes-like object (or an mmap) of a cache file
+        """
+        objects, offset = decode_objects(data, CACHE_HEADER.size)
+        level, compiled, offset = decode_traffic(data, offset)
+        return (objects, level, compiled)
+
+
+class _Strings(object):
+    """
+    A class representing the table of strings of a compiled level or objects
+
+    Each string is added once, the first time its index is asked for.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _list: the strings, in the order they were added
+    # Invariant: _list is a list of strings
+    #
+    # Attribute _indices: the index of each string
+    # Invariant: _indices is a dictionary from each string in _list to its index
+
+    def __init__(self):
+        """
+        Initializes an empty table.
+        """
+        self._list = []
+        self._indices = {}
+
+    def index(self, string):
+        """
+        Returns the index of a string, adding it to the table if it is new.
+
+        Parameter string: the string
+        Precondition: string is a str
+        """
+        if string not in self._indices:
+            self._indices[string] = len(self._list)
+            self._list.append(string)
+        return self._indices[string]
+
+    def encode(self):
+        """
+        Returns the bytes of the table, padded to a multiple of 8 bytes.
+        """
+        result = bytearray(_COUNT.pack(len(self._list)))
+        for string in self._list:
+            data = string.encode('utf-8')
+            result += _LENGTH.pack(len(data))+data
+        result += bytes(_padding(len(result)))
+        return result
+
+
+def _decodeStrings(buffer, offset):
+    """
+    Returns the tuple (strings, end) of the table of strings at offset in buffer.
+
+    Parameter buffer: the bytes to read
+    Precondition: buffer is a bytes-like object with a table of strings at offset
+
+    Parameter offset: the position of the table
+    Precondition: offset is an int >= 0, a multiple of 8
+    """
+    start = offset
+    count = _COUNT.unpack_from(buffer, offset)[0]
+    offset = offset+_COUNT.size
+    strings = []
+    for i in range(count):
+        length = _LENGTH.unpack_from(buffer, offset)[0]
+        offset = offset+_LENGTH.size
+        strings.append(bytes(buffer[offset:offset+length]).decode('utf-8'))
+        offset = offset+length
+    return (strings, offset+_padding(offset-start))
+
+
+def _keep(extra, part, dictionary, known, key=None):
+    """
+    Adds the keys of dictionary that are not compiled to extra.
+
+    The keys are added to extra[part], or to extra[part][key] if key is given.
+    Nothing is added if every key of dictionary is known.
+
+    Parameter extra: the keys that are not compiled
+    Precondition: extra is a dictionary
+
+    Parameter part: the part of the json the dictionary is in
+    Precondition: part is a string
+
+    Parameter dictionary: a dictionary of the json
+    Precondition: dictionary is a dictionary with string keys
+
+    Parameter known: the keys that are compiled
+    Precondition: known is a tuple of strings
+
+    Parameter key: the name or index of the dictionary in its part, or None
+    Precondition: key is a string or None
+    """
+    other = dict([(k, v) for k, v in dictionary.items() if k not in known])
+    if other == {}:
+        return
+    if key is None:
+        extra[part] = other
+    else:
+        extra.setdefault(part, {})[key] = other
+
+
+def _encodeExtra(extra):
+    """
+    Returns the bytes of the section with the keys that are not compiled.
+
+    The section is the length of the json text, then the text, padded to a multiple
+    of 8 bytes.  The text is empty if there are no such keys.
+
+    Parameter extra: the keys that are not compiled (see _keep)
+    Precondition: extra is a dictionary that can be written as json
+    """
+    data = b'' if extra == {} else json.dumps(extra).encode('utf-8')
+    return _COUNT.pack(len(data))+data+bytes(_padding(len(data)))
+
+
+def _decodeExtra(buffer, offset):
+    """
+    Returns the tuple (extra, end) of the section of other keys at offset in buffer.
+
+    Parameter buffer: the bytes to read
+    Precondition: buffer is a bytes-like object with a section of other keys (see
+    _encodeExtra) at offset
+
+    Parameter offset: the position of the section
+    Precondition: offset is an int >= 0, a multiple of 8
+    """
+    length = _COUNT.unpack_from(buffer, offset)[0]
+    offset = offset+_COUNT.size
+    if length == 0:
+        return ({}, offset)
+    extra = json.loads(bytes(buffer[offset:offset+length]).decode('utf-8'))
+    return (extra, offset+length+_padding(length))
+
+
+def _array(code, buffer, offset, count):
+    """
+    Returns an array of count little-endian numbers read from buffer at offset.
+
+    Parameter code: the type code of the array, like 'I' or 'd'
+    Precondition: code is a type code of the array module with 4 or 8 byte items
+
+    Parameter buffer: the bytes to read
+    Precondition: buffer is a bytes-like object (or an mmap)
+
+    Parameter offset: the position of the first number
+    Precondition: offset is an int >= 0
+
+    Parameter count: the number of numbers
+    Precondition: count is an int >= 0
+    """
+    result = array.array(code)
+    result.frombytes(buffer[offset:offset+result.itemsize*count])
+    if sys.byteorder == 'big':
+        result.byteswap()
+    return result
+
+
+def _little(values):
+    """
+    Returns the bytes of an array of numbers, little-endian.
+
+    Parameter values: the numbers
+    Precondition: values is an array.array
+    """
+    if sys.byteorder == 'big':
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _padding(length):
+    """
+    Returns the number of bytes needed to pad length to a multiple of 8.
+
+    Parameter length: the length to pad
+    Precondition: length is an int >= 0
+    """
+    return -length % 8
+
+
+def _numbers(values):
+    """
+    Returns a list of the given numbers, as ints if they are whole numbers.
+
+    Parameter values: the numbers
+    Precondition: values is a sequence of floats
+    """
+    return [_number(x) for x in values]
+
+
+def _number(value):
+    """
+    Returns value as an int if it is a whole number, and as a float otherwise.
+
+    Parameter value: the number
+    Precondition: value is a float
+    """
+    if value == int(value):
+        return int(value)
+    return value
@@ -0,0 +1,398 @@
+"""
+Level pack module for Froggit
+
+This module keeps many levels in one file, a level pack, so that tools that go through
+thousands of levels (like batch.py) do not open and parse a json file for each one.  A
+pack is opened with mmap, and a level is only read from it when it is asked for, by
+name.  Nothing else in the file is read.
+
+A pack starts with a header (all numbers little-endian):
+
+    magic        4 bytes   b'FRGP'
+    version      4 bytes   unsigned int, PACK_VERSION
+    count        4 bytes   unsigned int, the number of levels
+    padding      4 bytes
+    names        8 bytes   unsigned int, the offset of the names
+    objects      8 bytes   unsigned int, the offset of the compiled objects json, or
+                           0 if the pack has none
+
+which is followed by the index, with one entry of 24 bytes for each level, sorted by
+name: the offset and length of the compiled level (8 bytes each), and the offset (in
+the names) and length of its name in UTF-8 (4 bytes each).  Then come the names, the
+compiled objects, and the compiled levels, each starting on a multiple of 8 bytes.
+The objects and levels are compiled as in the level cache (see levelcache.py): a level
+is a table of strings, a record for the level, a fixed-size record for each lane, the
+table of its objects, and any other keys as json text.  Since the index is sorted, a
+level is found by a binary search that only reads the names it compares.
+
+To convert a folder of json levels into a pack, type
+
+    python levelpack.py folder pack.flp [--objects objects.json]
+
+Every json file in the folder with lanes is a level, and its name in the pack is its
+file name (like easy1.json).  The objects json is stored in the pack if it is given.
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+from consts import *
+from levelcache import *
+from files  import load_json
+
+# The first bytes of every pack
+PACK_MAGIC = b'FRGP'
+# The version of the pack format
+PACK_VERSION = 3
+# The extension of pack files
+PACK_EXTENSION = '.flp'
+# The header of a pack
+PACK_HEADER = struct.Struct('<4sII4xQQ')
+# An entry of the index of a pack
+PACK_ENTRY = struct.Struct('<QQII')
+
+
+def write_pack(path, levels, objects=None):
+    """
+    Writes the given levels to a pack file.
+
+    Parameter path: the file to write
+    Precondition: path is a string naming a file that may be written
+
+    Parameter levels: the levels of the pack
+    Precondition: levels is a dictionary from names (strings) to valid level jsons
+
+    Parameter objects: A json dictionary of objects, or None
+    Precondition: objects is None or a valid objects json
+    """
+    names = sorted(levels)
+    blob = bytearray()
+    spans = []
+    for name in names:
+        data = name.encode('utf-8')
+        spans.append((len(blob), len(data)))
+        blob += data
+    blob += bytes(-len(blob) % 8)
+    start = PACK_HEADER.size+PACK_ENTRY.size*len(names)
+    offset = start+len(blob)
+    table = b'' if objects is None else encode_objects(objects)
+    bodies = []
+    entries = bytearray()
+    position = offset+len(table)
+    for i in range(len(names)):
+        body = encode_level(levels[names[i]])
+        body = body+bytes(-len(body) % 8)
+        entries += PACK_ENTRY.pack(position, len(body), spans[i][0], spans[i][1])
+        bodies.append(body)
+        position = position+len(body)
+    with open(path, 'wb') as file:
+        file.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(names), start,
+                                    0 if objects is None else offset))
+        file.write(entries)
+        file.write(blob)
+        file.write(table)
+        for body in bodies:
+            file.write(body)
+
+
+class LevelPack(object):
+    """
+    A class representing an open level pack
+
+    A pack is opened when it is created, and should be closed with close.  Levels
+    are read from it with load, one at a time.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _file: the open pack file
+    # Invariant: _file is a binary file object, or None once closed
+    #
+    # Attribute _data: the contents of the pack
+    # Invariant: _data is an mmap of _file, or None once closed
+    #
+    # Attribute _count: the number of levels in the pack
+    # Invariant: _count is an int >= 0
+    #
+    # Attribute _nametable: the offset of the names
+    # Invariant: _nametable is an int > 0
+    #
+    # Attribute _objects: the offset of the compiled objects json
+    # Invariant: _objects is an int >= 0, 0 if the pack has none
+
+    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    def getCount(self):
+        """
+        Returns the number of levels in the pack
+        """
+        return self._count
+
+    def getNames(self):
+        """
+        Returns a new list with the names of the levels in the pack, sorted
+        """
+        return [self._name(i) for i in range(self._count)]
+
+    def getObjects(self):
+        """
+        Returns the objects json stored in the pack, or None if there is none
+        """
+        if self._objects == 0:
+            return None
+        return decode_objects(self._data, self._objects)[0]
+
+    def __init__(self, path):
+        """
+        Opens a pack file.
+
+        Parameter path: the pack file
+        Precondition: path is a string naming a pack file (see write_pack)
+        """
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._count, self._nametable, self._objects = (
+            PACK_HEADER.unpack_from(self._data, 0))
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            self.close()
+            raise IOError('Not a level pack of version %d: %r' % (PACK_VERSION, path))
+
+    def find(self, name):
+        """
+        Returns the index of the level with the given name, or -1 if there is none.
+
+        Parameter name: the name of the level
+        Precondition: name is a string
+        """
+        low = 0
+        high = self._count
+        while low < high:
+            middle = (low+high)//2
+            if self._name(middle) < name:
+                low = middle+1
+            else:
+                high = middle
+        if low < self._count and self._name(low) == name:
+            return low
+        return -1
+
+    def load(self, name):
+        """
+        Returns the json dictionary of the level with the given name.
+
+        Only that level is read from the pack.
+
+        Parameter name: the name of the level
+        Precondition: name is the name of a level in the pack (see getNames)
+        """
+        index = self.find(name)
+        if index < 0:
+            raise KeyError('No level '+repr(name)+' in the pack')
+        offset = PACK_ENTRY.unpack_from(self._data, PACK_HEADER.size+
+                                        PACK_ENTRY.size*index)[0]
+        return decode_level(self._data, offset)[0]
+
+    def close(self):
+        """
+        Closes the pack file.  The pack cannot be read after this.
+        """
+        if self._data is not None:
+            self._data.close()
+            self._file.close()
+        self._data = None
+        self._file = None
+
+    def _name(self, index):
+        """
+        Returns the name of level index of the pack.
+
+        Parameter index: the index of the level in the sorted index
+        Precondition: index is an int in range(getCount())
+        """
+        entry = PACK_ENTRY.unpack_from(self._data, PACK_HEADER.size+
+                                       PACK_ENTRY.size*index)
+        start = self._nametable+entry[2]
+        return self._data[start:start+entry[3]].decode('utf-8')
+
+
+class LevelSet(object):
+    """
+    A class representing the levels of some level files and packs
+
+    A set is used like a dictionary from names to level jsons: with [], in, len, and
+    a loop over the names.  A level json file is read when the set is made, but a
+    level of a pack is only decoded from the pack when it is asked for, and the
+    packs are kept open until close.  A set can be sent to another process (like
+    the workers of batch.py), which opens the packs again.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _paths: the packs of the set
+    # Invariant: _paths is a list of strings naming pack files
+    #
+    # Attribute _packs: the open packs
+    # Invariant: _packs is a list of LevelPack, one for each of _paths, or empty
+    # once closed
+    #
+    # Attribute _order: the names of the levels, in the order of the files
+    # Invariant: _order is a list of the names in _places (a name that is given
+    # twice is in it twice)
+    #
+    # Attribute _places: where each level is
+    # Invariant: _places is a dictionary from each name to the index of its pack
+    # in _packs, or to its json dictionary if it is a level file
+
+    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    def getOrder(self):
+        """
+        Returns a new list with the names of the levels, in the order of the files
+        """
+        return list(self._order)
+
+    def getObjects(self):
+        """
+        Returns the objects json of the first pack that has one, or None if none do
+        """
+        for pack in self._packs:
+            objects = pack.getObjects()
+            if objects is not None:
+                return objects
+        return None
+
+    def __init__(self, names=()):
+        """
+        Initializes a set of the levels in the given files.
+
+        A file ending with PACK_EXTENSION is a pack, and gives all of its levels, by
+        their name in the pack.  Any other file is a level json, named by its file
+        name.  A level with the same name as an earlier one replaces it.
+
+        Parameter names: the level and pack files
+        Precondition: names is a list of strings naming level json files or packs
+        """
+        self._paths = []
+        self._packs = []
+        self._places = {}
+        self._order = []
+        for name in names:
+            if name.endswith(PACK_EXTENSION):
+                self._open(name)
+                for level in self._packs[-1].getNames():
+                    self._places[level] = len(self._packs)-1
+                    self._order.append(level)
+            else:
+                self._places[name] = load_json(name)
+                self._order.append(name)
+
+    def __getitem__(self, name):
+        """
+        Returns the json dictionary of the level with the given name.
+
+        Parameter name: the name of the level
+        Precondition: name is the name of a level in this set
+        """
+        place = self._places[name]
+        if isinstance(place, dict):
+            return place
+        return self._packs[place].load(name)
+
+    def __contains__(self, name):
+        """
+        Returns True if this set has a level with the given name.
+
+        Parameter name: the name of the level
+        Precondition: name is a string
+        """
+        return name in self._places
+
+    def __len__(self):
+        """
+        Returns the number of levels in this set
+        """
+        return len(self._places)
+
+    def __iter__(self):
+        """
+        Returns an iterator over the names of the levels in this set
+        """
+        return iter(self._places)
+
+    def __getstate__(self):
+        """
+        Returns the state of this set to send to another process (without the packs)
+        """
+        return {'paths': self._paths, 'places': self._places, 'order': self._order}
+
+    def __setstate__(self, state):
+        """
+        Makes this set from a state sent by another process, opening its packs.
+
+        Parameter state: the state of the set
+        Precondition: state is a dictionary returned by __getstate__
+        """
+        self._paths = []
+        self._packs = []
+        self._places = state['places']
+        self._order = state['order']
+        for path in state['paths']:
+            self._open(path)
+
+    def close(self):
+        """
+        Closes the packs of this set.  Their levels cannot be read after this.
+        """
+        for pack in self._packs:
+            pack.close()
+        self._packs = []
+
+    def _open(self, path):
+        """
+        Opens a pack and adds it to this set (but not its levels).
+
+        Parameter path: the pack file
+        Precondition: path is a string naming a pack file (see write_pack)
+        """
+        self._paths.append(path)
+        self._packs.append(LevelPack(path))
+
+
+def load_levels(names):
+    """
+    Returns the tuple (order, levels) of the levels in the given files.
+
+    The list order has the names of the levels in the order they were given, and
+    levels is a LevelSet of them (see its initializer for the names), which decodes
+    the levels of packs only when they are asked for.  It should be closed when it
+    is no longer used.
+
+    Parameter names: the level and pack files
+    Precondition: names is a list of strings naming level json files or packs
+    """
+    levels = LevelSet(names)
+    return (levels.getOrder(), levels)
+
+
+def main(args):
+    """
+    Converts a folder of json levels into a pack, and prints the number of levels.
+
+    Parameter args: the command line arguments (without the program name)
+    Precondition: args is a list of strings
+    """
+    parser = argparse.ArgumentParser(description='Convert Froggit levels into a pack')
+    parser.add_argument('folder', help='the folder of level json files')
+    parser.add_argument('pack', help='the pack file to write')
+    parser.add_argument('--objects', default=None, help='objects json to store')
+    options = parser.parse_args(args)
+    levels = {}
+    for name in sorted(os.listdir(options.folder)):
+        if name.lower().endswith('.json'):
+            level = load_json(os.path.join(options.folder, name))
+            if isinstance(level, dict) and 'lanes' in level:
+                levels[name] = level
+    objects = None if options.objects is None else load_json(options.objects)
+    write_pack(options.pack, levels, objects)
+    print('%s: %d levels' % (options.pack, len(levels)))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -23,25 +23,431 @@ will answer.
 Likita Gangireddy lg425
 12/21/2020
 """
+import math
+from collections import OrderedDict
 from consts import *
-from game2d import *
 
 # PRIMARY RULE: Models are not allowed to access anything in any module other than
 # consts.py.  If you need extra information from a lane or level object, then it
 # should be a parameter in your method.
 
-class Frog(GSprite):         # You will need to change this by Task 3
+
+class Box(object):
     """
-    A class representing the frog
+    A class representing a drawable object as plain geometry
 
-    The frog is represented as an image (or sprite if you are doing timed animation).
-    However, unlike the obstacles, we cannot use a simple GImage class for the frog.
-    The frog has to have additional attributes (which you will add).  That is why we
-    make it a subclass of GImage.
+    Headless levels (see Level) use a Box wherever the game would normally create a
+    GImage, GTile, GSprite or GLabel. A Box accepts the same keyword arguments as those
+    classes, keeps the attributes that the game logic reads (position, size, angle,
+    source, hitbox and frame) and answers contains and collides the same way.  It
+    never loads a texture, so it does not need kivy or a display.
 
-    When you reach Task 3, you will discover that Frog needs to be a composite object,
-    tracking both the frog animation and the death animation.  That will like caused
-    major modifications to this class.
+    A hitbox is a list [x0, y0, x1, y1] of two opposite corners in the local (unrotated)
+    coordinates of the object, measured from its center.  Objects without a hitbox use
+    their width and height.
+
+    Attribute x: The x-coordinate of the center
+    Invariant: x is an int or float
+
+    Attribute y: The y-coordinate of the center
+    Invariant: y is an int or float
+
+    Attribute width: The horizontal size of the object
+    Invariant: width is an int or float >= 0
+
+    Attribute height: The vertical size of the object
+    Invariant: height is an int or float >= 0
+
+    Attribute angle: The rotation of the object in degrees (counter-clockwise)
+    Invariant: angle is an int or float
+
+    Attribute source: The image file this object stands in for
+    Invariant: source is a string or None
+
+    Attribute hitbox: The collision box in local coordinates
+    Invariant: hitbox is a list of four numbers, or None
+
+    Attribute frame: The current animation frame (for sprites)
+    Invariant: frame is an int >= 0
+    """
+
+    # PROPERTIES FOR THE EDGES (like GObject)
+    @property
+    def left(self):
+        """
+        The x-coordinate of the left edge
+        """
+        return self.x-self.width/2
+
+    @left.setter
+    def left(self, value):
+        self.x = value+self.width/2
+
+    @property
+    def right(self):
+        """
+        The x-coordinate of the right edge
+        """
+        return self.x+self.width/2
+
+    @right.setter
+    def right(self, value):
+        self.x = value-self.width/2
+
+    @property
+    def bottom(self):
+        """
+        The y-coordinate of the bottom edge
+        """
+        return self.y-self.height/2
+
+    @bottom.setter
+    def bottom(self, value):
+        self.y = value+self.height/2
+
+    @property
+    def top(self):
+        """
+        The y-coordinate of the top edge
+        """
+        return self.y+self.height/2
+
+    @top.setter
+    def top(self, value):
+        self.y = value-self.height/2
+
+    def __init__(self, **keywords):
+        """
+        Initializes a box from the keywords of a game2d constructor.
+
+        Keywords that only matter for drawing (font_name, format, linecolor, and so
+        on) are accepted and ignored. A sprite's hitboxes use the hitbox of frame 0.
+
+        Parameter keywords: dictionary of keyword arguments
+        Precondition: See above.
+        """
+        self.source = keywords.get('source')
+        self.angle = keywords.get('angle', 0)
+        self.frame = keywords.get('frame', 0)
+        hitbox = keywords.get('hitbox')
+        hitboxes = keywords.get('hitboxes')
+        if hitbox is None and hitboxes:
+            if isinstance(hitboxes[0], (list, tuple)):
+                hitbox = hitboxes[0]
+            else:
+                hitbox = hitboxes
+        self.hitbox = hitbox
+        if hitbox is None:
+            size = GRID_SIZE
+            self.width = keywords.get('width', size)
+            self.height = keywords.get('height', size)
+        else:
+            self.width = keywords.get('width', 2*max(abs(hitbox[0]),abs(hitbox[2])))
+            self.height = keywords.get('height',2*max(abs(hitbox[1]),abs(hitbox[3])))
+        self.x = keywords.get('x', 0)
+        self.y = keywords.get('y', 0)
+        for edge in ('left', 'right', 'bottom', 'top'):
+            if edge in keywords:
+                setattr(self, edge, keywords[edge])
+
+    def getBounds(self):
+        """
+        Returns the hitbox in world coordinates as a tuple (left, bottom, right, top)
+
+        The hitbox is rotated by angle before it is translated to the center, so the
+        result is the axis-aligned box that a game2d hitbox covers on screen.
+        """
+        x0, y0, x1, y1 = self._localbox()
+        if self.angle % 360 == 0:
+            xs = (x0, x1)
+            ys = (y0, y1)
+        else:
+            c, s = self._turn()
+            xs = (x0*c-y0*s, x0*c-y1*s, x1*c-y0*s, x1*c-y1*s)
+            ys = (x0*s+y0*c, x0*s+y1*c, x1*s+y0*c, x1*s+y1*c)
+        return (self.x+min(xs), self.y+min(ys), self.x+max(xs), self.y+max(ys))
+
+    def contains(self, point):
+        """
+        Returns True if this box contains the given point.
+
+        Parameter point: the point to check
+        Precondition: point is a tuple or list of two numbers
+        """
+        x0, y0, x1, y1 = self._localbox()
+        dx = point[0]-self.x
+        dy = point[1]-self.y
+        if self.angle % 360 != 0:
+            c, s = self._turn()
+            dx, dy = dx*c+dy*s, dy*c-dx*s
+        return x0 <= dx <= x1 and y0 <= dy <= y1
+
+    def collides(self, other):
+        """
+        Returns True if this box overlaps other.
+
+        Parameter other: the object to check
+        Precondition: other is a Box
+        """
+        l1, b1, r1, t1 = self.getBounds()
+        l2, b2, r2, t2 = other.getBounds()
+        return l1 <= r2 and l2 <= r1 and b1 <= t2 and b2 <= t1
+
+    def draw(self, view):
+        """
+        Does nothing, as a box has nothing to draw.
+
+        Parameter view: The view to draw to
+        Precondition: view is a GView object (or None)
+        """
+        pass
+
+    def _turn(self):
+        """
+        Returns the cosine and sine of angle as a tuple (cos, sin)
+
+        They are exact for a multiple of 90 degrees, where math.sin(math.pi) (which
+        is not quite 0) would move a point on an edge of the hitbox off of it.
+        """
+        if self.angle % 90 == 0:
+            return ((1, 0), (0, 1), (-1, 0), (0, -1))[int(self.angle//90) % 4]
+        rad = math.radians(self.angle)
+        return (math.cos(rad), math.sin(rad))
+
+    def _localbox(self):
+        """
+        Returns the hitbox in local coordinates as a sorted tuple (x0, y0, x1, y1)
+        """
+        if self.hitbox is None:
+            return (-self.width/2, -self.height/2, self.width/2, self.height/2)
+        h = self.hitbox
+        return (min(h[0],h[2]), min(h[1],h[3]), max(h[0],h[2]), max(h[1],h[3]))
+
+
+class Mute(object):
+    """
+    A class representing a sound that is never heard
+
+    Headless levels use a Mute wherever the game would normally load a Sound.
+
+    Attribute source: The sound file this object stands in for
+    Invariant: source is a string or None
+
+    Attribute volume: The (ignored) volume
+    Invariant: volume is a float between 0 and 1
+    """
+
+    def __init__(self, source=None):
+        """
+        Initializes a silent sound.
+
+        Parameter source: The sound file this object stands in for
+        Precondition: source is a string or None
+        """
+        self.source = source
+        self.volume = 1.0
+
+    def play(self):
+        """
+        Does nothing, as there is nothing to play.
+        """
+        pass
+
+
+try:
+    from game2d import *
+except ImportError:
+    # Servers without kivy can only build headless levels, so every drawable
+    # class falls back to plain geometry
+    GImage = GTile = GSprite = GLabel = Box
+    Sound = Mute
+    GameApp = None
+
+
+class Assets(object):
+    """
+    A class caching the textures and sounds of the game
+
+    There is only one cache for the whole process, so this class is never
+    instantiated; all of its methods are class methods.  Every Sound in the game
+    should come from Assets.sound, so that all the users of a sound file share one
+    audio buffer.  Textures are shared without any change to the code that makes
+    images: install replaces the texture loader of game2d, which every GImage and
+    GSprite (and so every Frog and Death) goes through when it sets its source.
+
+    The cache holds at most ASSET_MEMORY bytes.  A texture costs 4 bytes per pixel
+    and a sound costs SOUND_MEMORY.  When the cache is over its limit, it evicts the
+    least recently used assets.  An evicted asset stays valid for every object that
+    already has it; it is only loaded from disk again the next time it is asked for.
+    """
+    # HIDDEN CLASS ATTRIBUTES
+
+    # Attribute _entries: the cached assets, from least to most recently used
+    # Invariant: _entries is an OrderedDict mapping a tuple (kind, source), where kind
+    # is 'texture' or 'sound', to a tuple (asset, size) with size the cost in bytes
+    #
+    # Attribute _size: the total cost of the cached assets
+    # Invariant: _size is the sum of the sizes in _entries
+    #
+    # Attribute _limit: the most memory the cache may use
+    # Invariant: _limit is an int >= 0
+    #
+    # Attribute _loader: the original texture loader of game2d
+    # Invariant: _loader is a function taking a file name, or None if install has
+    # not replaced it
+    _entries = OrderedDict()
+    _size = 0
+    _limit = ASSET_MEMORY
+    _loader = None
+
+    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    @classmethod
+    def getSize(cls):
+        """
+        Returns the memory (in bytes) used by the cached assets
+        """
+        return cls._size
+
+    @classmethod
+    def getLimit(cls):
+        """
+        Returns the memory (in bytes) that the cache may use
+        """
+        return cls._limit
+
+    @classmethod
+    def setLimit(cls, value):
+        """
+        Sets the memory that the cache may use, evicting assets if necessary.
+
+        Parameter value: the new limit in bytes
+        Precondition: value is an int >= 0
+        """
+        cls._limit = value
+        cls._evict()
+
+    @classmethod
+    def install(cls):
+        """
+        Routes the texture loader of game2d through this cache.
+
+        This method is called when this module is imported. It does nothing if
+        game2d is missing, has no texture loader, or was already installed.
+        """
+        if cls._loader is None and getattr(GameApp, 'load_texture', None):
+            cls._loader = GameApp.load_texture
+            GameApp.load_texture = classmethod(lambda app, source:
+                                               cls.texture(source))
+
+    @classmethod
+    def sound(cls, source):
+        """
+        Returns the shared Sound for the given file.
+
+        Parameter source: The sound file
+        Precondition: source is a string naming a sound file
+        """
+        key = ('sound', source)
+        if key in cls._entries:
+            cls._entries.move_to_end(key)
+            return cls._entries[key][0]
+        sound = Sound(source)
+        cls._store(key, sound, SOUND_MEMORY)
+        return sound
+
+    @classmethod
+    def texture(cls, source):
+        """
+        Returns the shared texture for the given image file.
+
+        The texture is loaded with the original game2d loader the first time
+        (or the first time after it was evicted).
+
+        Parameter source: The image file
+        Precondition: source is a string naming an image file, and install has
+        been called
+        """
+        key = ('texture', source)
+        if key in cls._entries:
+            cls._entries.move_to_end(key)
+            return cls._entries[key][0]
+        texture = cls._loader(source)
+        size = 0
+        if texture is not None:
+            size = 4*texture.width*texture.height
+        cls._store(key, texture, size)
+        return texture
+
+    @classmethod
+    def warm(cls, images, sounds):
+        """
+        Loads the given files into the cache if they are not already there.
+
+        Parameter images: the image files to load
+        Precondition: images is a list of image file names (ignored if install
+        has not replaced the game2d loader)
+
+        Parameter sounds: the sound files to load
+        Precondition: sounds is a list of sound file names
+        """
+        if cls._loader is not None:
+            for source in images:
+                cls.texture(source)
+        for source in sounds:
+            cls.sound(source)
+
+    @classmethod
+    def clear(cls):
+        """
+        Removes every asset from the cache.
+        """
+        cls._entries.clear()
+        cls._size = 0
+
+    @classmethod
+    def _store(cls, key, asset, size):
+        """
+        Adds an asset to the cache as the most recently used, then evicts.
+
+        Parameter key: the key of the asset
+        Precondition: key is a tuple (kind, source) not in _entries
+
+        Parameter asset: the texture or Sound
+        Precondition: asset is the loaded asset for key
+
+        Parameter size: the cost of the asset
+        Precondition: size is an int >= 0
+        """
+        cls._entries[key] = (asset, size)
+        cls._size = cls._size + size
+        cls._evict()
+
+    @classmethod
+    def _evict(cls):
+        """
+        Evicts the least recently used assets until the cache fits its limit.
+
+        The most recently used asset is never evicted, even if it is bigger
+        than the limit on its own.
+        """
+        while cls._size > cls._limit and len(cls._entries) > 1:
+            key, entry = cls._entries.popitem(last=False)
+            cls._size = cls._size - entry[1]
+
+
+Assets.install()
+
+
+class FrogModel(object):
+    """
+    A class holding the rules for the frog
+
+    The movement rules are shared by Frog, which is drawn with a sprite sheet, and
+    HeadlessFrog, which is only a Box.  Keeping them in this one class means that a
+    headless level plays exactly like the real game.
+
+    This class is a mixin.  It must come before GSprite (or Box) in the list of base
+    classes, and the subclass must implement the hidden method _sound.
     """
     # LIST ALL HIDDEN ATTRIBUTES HERE
     # Attribute _jumpSound: Sound to play when frog jumps
@@ -50,6 +456,9 @@ class Frog(GSprite):         # You will need to change this by Task 3
     #
     # Attribute _animator: A coroutine for performing an animation
     # Invariant: _animator is a generator-based coroutine (or None)
+    #
+    # Attribute _speed: The number of seconds a jump takes
+    # Invariant: _speed is a number > 0
 
     # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
     def getAnimator(self):
@@ -58,12 +467,12 @@ class Frog(GSprite):         # You will need to change this by Task 3
         """
         return self._animator
 
-    def __init__(self, x, y, sprites):
+    def __init__(self, x, y, sprites, speed=FROG_SPEED):
         """
         Initializes frog.
 
         This Initializer utilizes the super method in order to use the
-        initializer from the GSprite class.
+        initializer from the GSprite class (or the Box class when headless).
 
         Parameter x: The starting x position of the frog.
         Precondition: x is an int that refers to the starting x position of
@@ -75,6 +484,9 @@ class Frog(GSprite):         # You will need to change this by Task 3
 
         Parameter sprites: A dictionary of sprite information
         Precondition: sprites is a valid dictionary of sprite information
+
+        Parameter speed: The number of seconds a jump takes
+        Precondition: speed is a number > 0
         """
         frog_sprite_info = sprites['frog']
         file = frog_sprite_info['file']
@@ -86,7 +498,8 @@ class Frog(GSprite):         # You will need to change this by Task 3
         super().__init__(x=x,y=y, source=file, format=format, angle=FROG_NORTH,
         hitboxes=hitboxes, frame = 0)
         self._animator= None
-        self._jumpSound = Sound(CROAK_SOUND)
+        self._speed = speed
+        self._jumpSound = self._sound(CROAK_SOUND)
 
     def update(self,dt, input, width, height, EastorWest, North, South):
         """
@@ -126,25 +539,25 @@ class Frog(GSprite):         # You will need to change this by Task 3
             self.angle=FROG_WEST
             if self.x-GRID_SIZE>=0 and EastorWest:
                 self._jumpSound.play()
-                self._animator = self.makeAnimator(-GRID_SIZE,FROG_SPEED, 'left')
+                self._animator = self.makeAnimator(-GRID_SIZE,self._speed, 'left')
                 next(self._animator)
         elif self.input.is_key_down('right'):
             self.angle=FROG_EAST
             if self.x+GRID_SIZE<=width and EastorWest:
                 self._jumpSound.play()
-                self._animator = self.makeAnimator(GRID_SIZE,FROG_SPEED, 'right')
+                self._animator = self.makeAnimator(GRID_SIZE,self._speed, 'right')
                 next(self._animator)
         elif self.input.is_key_down('up'):
             self.angle=FROG_NORTH
             if self.y+GRID_SIZE<=(height-(GRID_SIZE*1.5)) and North:
                 self._jumpSound.play()
-                self._animator = self.makeAnimator(GRID_SIZE,FROG_SPEED, 'up')
+                self._animator = self.makeAnimator(GRID_SIZE,self._speed, 'up')
                 next(self._animator)
         elif self.input.is_key_down('down'):
             self.angle=FROG_SOUTH
             if self.y-GRID_SIZE>=(GRID_SIZE//2) and South:
                 self._jumpSound.play()
-                self._animator = self.makeAnimator(-GRID_SIZE,FROG_SPEED, 'down')
+                self._animator = self.makeAnimator(-GRID_SIZE,self._speed, 'down')
                 next(self._animator)
 
     def makeAnimator(self,dx, speed, direction):
@@ -218,13 +631,57 @@ class Frog(GSprite):         # You will need to change this by Task 3
             self.frame = 1
 
 
+class Frog(FrogModel, GSprite):         # You will need to change this by Task 3
+    """
+    A class representing the frog
+
+    The frog is represented as an image (or sprite if you are doing timed animation).
+    However, unlike the obstacles, we cannot use a simple GImage class for the frog.
+    The frog has to have additional attributes (which you will add).  That is why we
+    make it a subclass of GImage.
+
+    When you reach Task 3, you will discover that Frog needs to be a composite object,
+    tracking both the frog animation and the death animation.  That will like caused
+    major modifications to this class.
+    """
+
+    def _sound(self, source):
+        """
+        Returns the shared Sound for the given file.
+
+        Parameter source: The sound file
+        Precondition: source is a string naming a sound file
+        """
+        return Assets.sound(source)
+
+
+class HeadlessFrog(FrogModel, Box):
+    """
+    A class representing the frog in a headless level
+
+    The frog follows the rules in FrogModel but has no sprite sheet and no sound.
+    """
+
+    def _sound(self, source):
+        """
+        Returns a Mute for the given file.
+
+        Parameter source: The sound file
+        Precondition: source is a string naming a sound file
+        """
+        return Mute(source)
+
+
 # IF YOU NEED ADDITIONAL LANE CLASSES, THEY GO HERE
-class Death(GSprite):
+class DeathModel(object):
     """
-    A class representing the death
+    A class holding the rules for the death
 
-    The death is represented as a sprite, and therefore, it is made as a
-    subclass of GSprite
+    The death animation is shared by Death, which is drawn with a sprite sheet,
+    and HeadlessDeath, which is only a Box.
+
+    This class is a mixin.  It must come before GSprite (or Box) in the list of base
+    classes.
     """
     # LIST ALL HIDDEN ATTRIBUTES HERE
     # Attribute _animator: A coroutine for performing an animation
@@ -238,7 +695,7 @@ class Death(GSprite):
         Initializes death.
 
         This Initializer utilizes the super method in order to use the
-        initializer from the GSprite class.
+        initializer from the GSprite class (or the Box class when headless).
 
         Parameter x: The x position where the frog died.
         Precondition: x is an int that refers to the x position where the frog
@@ -322,3 +779,22 @@ class Death(GSprite):
             self.frame = 6
         elif frac<=7/7:
             self.frame = 7
+
+
+class Death(DeathModel, GSprite):
+    """
+    A class representing the death
+
+    The death is represented as a sprite, and therefore, it is made as a
+    subclass of GSprite
+    """
+    pass
+
+
+class HeadlessDeath(DeathModel, Box):
+    """
+    A class representing the death in a headless level
+
+    The death follows the rules in DeathModel, but only its timing matters.
+    """
+    pass
@@ -0,0 +1,304 @@
+"""
+Profiler module for Froggit
+
+This module contains the classes to time the parts of a frame (the frog, the lanes,
+the collisions, drawing and so on), so that we can see which part of the game takes
+too much of the 16 ms of a frame on a big level.
+
+Profiling is opt-in.  Every Level has a NullProfiler, whose sections do nothing, until
+it is given a Profiler with setProfiler.  The game does this when PROFILE_FILE (in
+consts.py) is not None, and writes the timings to that file when it stops.
+
+A Profiler keeps the time spent in each section in each of the last PROFILE_FRAMES
+frames, so it can report rolling percentiles.  It also keeps every section it timed in
+those frames, which it can write in the Chrome trace format.  Open the file at
+chrome://tracing (or https://ui.perfetto.dev) to see the sections on a timeline.
+"""
+import json
+import time
+from collections import deque
+from consts import *
+
+
+def summarize(times):
+    """
+    Returns a dictionary with the mean, p50, p99 and max of the given times, in ms.
+
+    Percentiles are by nearest rank.
+
+    Parameter times: the times in seconds
+    Precondition: times is a nonempty list of numbers
+    """
+    ordered = sorted(times)
+    count = len(ordered)
+    return {'mean': 1000*sum(ordered)/count,
+            'p50': 1000*ordered[int(0.50*(count-1))],
+            'p99': 1000*ordered[int(0.99*(count-1))],
+            'max': 1000*ordered[-1], 'count': count}
+
+
+class Section(object):
+    """
+    A class representing one timing of a section of a Profiler
+
+    A section is used in a with statement; the time from entering it to leaving it is
+    added to the profiler under the section name.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _profiler: the profiler to add the time to
+    # Invariant: _profiler is a Profiler
+    #
+    # Attribute _name: the name of the section
+    # Invariant: _name is a nonempty string
+    #
+    # Attribute _start: when the section was entered
+    # Invariant: _start is a float (from time.perf_counter), or None before entering
+
+    def __init__(self, profiler, name):
+        """
+        Initializes a timing of a section.
+
+        Parameter profiler: the profiler to add the time to
+        Precondition: profiler is a Profiler
+
+        Parameter name: the name of the section
+        Precondition: name is a nonempty string
+        """
+        self._profiler = profiler
+        self._name = name
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        self._profiler.add(self._name, self._start, time.perf_counter()-self._start)
+        return False
+
+
+class NullSection(object):
+    """
+    A class representing a section that is not timed
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+
+class NullProfiler(object):
+    """
+    A class representing a profiler that does not time anything
+
+    This is the profiler of a game that is not profiled.  Its sections do nothing,
+    so the hooks in Level and Froggit cost almost nothing when profiling is off.
+    """
+    # The only section of every NullProfiler
+    NULL_SECTION = NullSection()
+
+    def isEnabled(self):
+        """
+        Returns False, since this profiler does not time anything.
+        """
+        return False
+
+    def section(self, name):
+        """
+        Returns a section that does nothing.
+
+        Parameter name: the name of the section
+        Precondition: name is a nonempty string
+        """
+        return self.NULL_SECTION
+
+    def endFrame(self):
+        """
+        Does nothing.
+        """
+        pass
+
+    def summary(self):
+        """
+        Returns an empty dictionary, since this profiler has no timings.
+        """
+        return {}
+
+
+class Profiler(object):
+    """
+    A class representing the timings of the sections of the last frames of a game
+
+    Time a section with
+
+        with profiler.section('draw'):
+            ...
+
+    A section can be timed many times in a frame (its times are added up), and
+    sections may be nested.  Call endFrame at the end of every frame.  The time spent
+    in each section in each of the last frames is kept in a ring buffer.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _size: the number of frames kept
+    # Invariant: _size is an int > 0
+    #
+    # Attribute _frames: the time spent in each section in each of the last frames
+    # Invariant: _frames is a dictionary from section names to deques of at most
+    # _size floats (in seconds), oldest first.  A section not timed in a frame has a
+    # time of 0 in it
+    #
+    # Attribute _current: the time spent in each section in the frame so far
+    # Invariant: _current is a dictionary from section names to floats (in seconds)
+    #
+    # Attribute _events: every section timed in the last frames
+    # Invariant: _events is a deque of deques (one per frame, oldest first, at most
+    # _size), each of tuples (name, start, duration) with times in seconds
+    #
+    # Attribute _count: the number of frames ended
+    # Invariant: _count is an int >= 0
+    #
+    # Attribute _origin: the time this profiler was created
+    # Invariant: _origin is a float (from time.perf_counter)
+
+    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    def getSize(self):
+        """
+        Returns the number of frames kept.
+        """
+        return self._size
+
+    def getCount(self):
+        """
+        Returns the number of frames ended.
+        """
+        return self._count
+
+    def getNames(self):
+        """
+        Returns the names of the sections timed, sorted.
+        """
+        return sorted(set(self._frames) | set(self._current))
+
+    def isEnabled(self):
+        """
+        Returns True, since this profiler times its sections.
+        """
+        return True
+
+    def __init__(self, size=PROFILE_FRAMES):
+        """
+        Initializes a profiler with no timings.
+
+        Parameter size: the number of frames to keep
+        Precondition: size is an int > 0
+        """
+        self._size = size
+        self._frames = {}
+        self._current = {}
+        self._events = deque([deque()], size)
+        self._count = 0
+        self._origin = time.perf_counter()
+
+    def section(self, name):
+        """
+        Returns a new timing of the section name, for a with statement.
+
+        Parameter name: the name of the section
+        Precondition: name is a nonempty string
+        """
+        return Section(self, name)
+
+    def add(self, name, start, duration):
+        """
+        Adds a timing of the section name to the current frame.
+
+        Parameter name: the name of the section
+        Precondition: name is a nonempty string
+
+        Parameter start: when the section started
+        Precondition: start is a float (from time.perf_counter)
+
+        Parameter duration: how long the section took, in seconds
+        Precondition: duration is a float >= 0
+        """
+        self._current[name] = self._current.get(name, 0.0)+duration
+        self._events[-1].append((name, start, duration))
+
+    def endFrame(self):
+        """
+        Ends the current frame, and adds its times to the ring buffers.
+        """
+        for name in self._current:
+            if name not in self._frames:
+                # Frames before this section was first timed count as 0
+                self._frames[name] = deque([0.0]*min(self._count, self._size),
+                                           self._size)
+        for name in self._frames:
+            self._frames[name].append(self._current.get(name, 0.0))
+        self._current = {}
+        self._events.append(deque())
+        self._count = self._count+1
+
+    def getTimes(self, name):
+        """
+        Returns the time (in seconds) spent in section name in each kept frame.
+
+        The list is oldest first, and is empty if the section was never timed.
+
+        Parameter name: the name of the section
+        Precondition: name is a nonempty string
+        """
+        return list(self._frames.get(name, ()))
+
+    def getPercentile(self, name, percent):
+        """
+        Returns the given percentile of the time spent in section name, in ms.
+
+        This returns None if no frame with the section has ended yet.
+
+        Parameter name: the name of the section
+        Precondition: name is a nonempty string
+
+        Parameter percent: the percentile
+        Precondition: percent is a number in [0,100]
+        """
+        times = sorted(self.getTimes(name))
+        if not times:
+            return None
+        return 1000*times[int(percent/100.0*(len(times)-1))]
+
+    def summary(self):
+        """
+        Returns a dictionary from section names to summaries of their frame times.
+
+        Each summary is a dictionary with the mean, p50, p99 and max in ms over the
+        kept frames (see summarize).
+        """
+        result = {}
+        for name in self._frames:
+            if self._frames[name]:
+                result[name] = summarize(list(self._frames[name]))
+        return result
+
+    def dump(self, path):
+        """
+        Writes the sections of the kept frames to the file path, as a Chrome trace.
+
+        Each section is a complete ('X') event in microseconds since this profiler
+        was created.  The summary is written as well, under 'summary'.
+
+        Parameter path: the file to write
+        Precondition: path is a string
+        """
+        events = []
+        for frame in self._events:
+            for name, start, duration in frame:
+                events.append({'name': name, 'ph': 'X', 'pid': 0, 'tid': 0,
+                               'ts': 1e6*(start-self._origin), 'dur': 1e6*duration})
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms',
+                       'summary': self.summary()}, file)
@@ -0,0 +1,456 @@
+"""
+Replay module for Froggit
+
+This module records the keys pressed in a game of Froggit and plays them back.  The game
+advances in fixed ticks (see TICK_RATE in consts.py), so the level file, the frog speed
+and the keys held at each tick are all that is needed to reproduce a game exactly.
+
+A replay file is small and binary.  It starts with a header (all numbers big-endian):
+
+    magic        4 bytes   b'FRGR'
+    version      1 byte    1
+    tick rate    2 bytes   unsigned int
+    frog speed   8 bytes   double
+    ticks        4 bytes   unsigned int
+    level        2 bytes   unsigned int n, followed by the n bytes of the level file
+                           name in UTF-8
+
+Each tick is a record of 6 bits, one for each key in REPLAY_KEYS.  Ticks with the same
+keys are stored as one run, and each run is stored as a delta: the XOR of its keys
+with the keys of the previous run.  A run is one byte when it lasts at most 3 ticks:
+the delta in the low 6 bits and the number of ticks minus one in the top 2 bits.  A
+longer run has 11 in the top 2 bits, followed by the number of ticks minus 4 as a
+varint (7 bits per byte, low bits first, high bit set on all but the last byte).
+
+Replays are played back on a headless Session, which runs the states of the Froggit
+app without a window, as fast as the computer allows.  To play a replay, type
+
+    python replay.py game.replay [objects.json]
+"""
+import struct
+import sys
+import time
+from consts import *
+from level  import *
+from files  import load_json
+
+# The header of a replay file, up to the name of the level
+HEADER = struct.Struct('>4sBHdIH')
+# The first bytes of every replay file
+MAGIC = b'FRGR'
+
+
+class Keys(object):
+    """
+    A class representing the keyboard in a headless game
+
+    A Keys object answers is_key_down like the input of the Froggit app, but the keys
+    that are down are given as a mask with one bit per key in REPLAY_KEYS.  Keys that
+    are not in REPLAY_KEYS are never down.
+
+    Attribute mask: the keys that are down
+    Invariant: mask is an int in range(2**len(REPLAY_KEYS)); bit i is set if the key
+    REPLAY_KEYS[i] is down
+    """
+
+    def __init__(self, mask=0):
+        """
+        Initializes the keyboard.
+
+        Parameter mask: the keys that are down
+        Precondition: mask is an int in range(2**len(REPLAY_KEYS))
+        """
+        self.mask = mask
+
+    def is_key_down(self, key):
+        """
+        Returns True if the given key is down.
+
+        Parameter key: the key to check
+        Precondition: key is a string
+        """
+        if key in REPLAY_KEYS:
+            return bool(self.mask & (1 << REPLAY_KEYS.index(key)))
+        return False
+
+
+class Session(object):
+    """
+    A class representing a headless game of Froggit
+
+    A session steps through the same states as the Froggit app (see app.py), but it
+    builds a headless Level and never shows a message.  It is advanced one tick at a
+    time by tick, with the keys for that tick.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _objects: A json dictionary of objects
+    # Invariant: _objects is a valid objects json
+    #
+    # Attribute _json: A json dictionary with level information
+    # Invariant: _json is a valid level json
+    #
+    # Attribute _speed: The number of seconds a frog jump takes
+    # Invariant: _speed is a number > 0
+    #
+    # Attribute _vectorized: whether the level moves obstacles with NumPy
+    # Invariant: _vectorized is a boolean
+    #
+    # Attribute _state: The current state of the game (taken from consts.py)
+    # Invariant: _state is one of STATE_INACTIVE, STATE_ACTIVE, STATE_PAUSED or
+    # STATE_COMPLETE (STATE_LOADING and STATE_CONTINUE never last past a tick)
+    #
+    # Attribute _level: The level being played
+    # Invariant: _level is a headless Level, or None before the game starts
+    #
+    # Attribute _ticks: The number of ticks so far
+    # Invariant: _ticks is an int >= 0
+    #
+    # Attribute _events: The exits and deaths of the frog so far
+    # Invariant: _events is a list of tuples (tick, event, x, y), in order, where
+    # event is 'exit' if the frog reached an exit at (x,y), and otherwise the type
+    # of the lane ('road', 'water', ...) where the frog died at (x,y)
+
+    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    def getState(self):
+        """
+        Returns the current state of the game (taken from consts.py)
+        """
+        return self._state
+
+    def getLevel(self):
+        """
+        Returns the level being played, or None before the game starts
+        """
+        return self._level
+
+    def getTicks(self):
+        """
+        Returns the number of ticks so far
+        """
+        return self._ticks
+
+    def getEvents(self):
+        """
+        Returns the list of exits and deaths so far, as tuples (tick, event, x, y)
+
+        The event is 'exit' for an exit, or the type of the lane of a death.
+        """
+        return self._events
+
+    def __init__(self, objects, json, speed=FROG_SPEED, vectorized=False):
+        """
+        Initializes a session that has not started yet.
+
+        Parameter objects: A json dictionary of objects
+        Precondition: objects is a valid objects json
+
+        Parameter json: A json dictionary with level information
+        Precondition: json is a valid level json
+
+        Parameter speed: The number of seconds a frog jump takes
+        Precondition: speed is a number > 0
+
+        Parameter vectorized: whether to move the obstacles with NumPy
+        Precondition: vectorized is a boolean
+        """
+        self._objects = objects
+        self._json = json
+        self._speed = speed
+        self._vectorized = vectorized
+        self._state = STATE_INACTIVE
+        self._level = None
+        self._ticks = 0
+        self._events = []
+
+    def tick(self, input, dt):
+        """
+        Advances the game by one tick.
+
+        This method follows the same state changes as _tick in the Froggit app.
+        If the frog reaches an exit or dies in this tick, it is added to the
+        events.
+
+        Parameter input: The keys that are down
+        Precondition: input has a method is_key_down (like Keys)
+
+        Parameter dt: The length of the tick in seconds
+        Precondition: dt is a number > 0
+        """
+        self._ticks = self._ticks + 1
+        if input.is_key_down('s') and self._state == STATE_INACTIVE:
+            self._state = STATE_LOADING
+        if self._state == STATE_LOADING:
+            size = self._json['size']
+            self._level = Level(self._objects, self._json, size[0]*GRID_SIZE,
+            (size[1]*GRID_SIZE)+GRID_SIZE, True, self._vectorized, self._speed)
+            self._state = STATE_ACTIVE
+        if self._state == STATE_ACTIVE:
+            frog = self._level.getFrog()
+            if self._level.update(input, dt) == 'dead':
+                self._state = STATE_PAUSED
+            if frog is not None and self._level.getFrog() is None:
+                self._addEvent(frog)
+        if self._state == STATE_PAUSED and input.is_key_down('c'):
+            self._state = STATE_CONTINUE
+        if self._state == STATE_CONTINUE:
+            self._level.setFrog(self._level.getFrogstartX(),
+            self._level.getFrogstartY())
+            self._state = STATE_ACTIVE
+        if self._level is not None:
+            if (self._level.livescounter()=='done' or
+            self._level.getWinStatus()=='win'):
+                self._state = STATE_COMPLETE
+            if self._level.getReachexit()=='yes' and self._state==STATE_ACTIVE:
+                self._level.setReachexit(None)
+                self._state = STATE_PAUSED
+
+
+    def _addEvent(self, frog):
+        """
+        Adds the exit or death of the frog in this tick to the events.
+
+        Parameter frog: the frog at the start of this tick
+        Precondition: frog is a Frog that is no longer the frog of the level
+        """
+        if self._level.getReachexit() == 'yes':
+            event = 'exit'
+        else:
+            lanes = self._json['lanes']
+            row = min(max(int(frog.y//GRID_SIZE), 0), len(lanes)-1)
+            event = lanes[row]['type']
+        self._events.append((self._ticks, event, frog.x, frog.y))
+
+
+class Replay(object):
+    """
+    A class representing the recording of one game
+
+    A replay knows the level file, the frog speed and the tick rate of the game, and
+    the keys that were down at each tick.  The keys are kept as runs, just like in the
+    file, so a replay stays small in memory too.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _level: The level file of the game
+    # Invariant: _level is a string
+    #
+    # Attribute _speed: The number of seconds a frog jump takes
+    # Invariant: _speed is a number > 0
+    #
+    # Attribute _rate: The number of ticks per second
+    # Invariant: _rate is an int > 0
+    #
+    # Attribute _runs: The keys down at each tick
+    # Invariant: _runs is a list of lists [mask, count], where mask is a key mask
+    # (see Keys) and count is the number of ticks in a row it was down. Two
+    # consecutive runs never have the same mask
+    #
+    # Attribute _ticks: The number of ticks recorded
+    # Invariant: _ticks is the sum of the counts in _runs
+
+    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    def getLevel(self):
+        """
+        Returns the level file of the game
+        """
+        return self._level
+
+    def getSpeed(self):
+        """
+        Returns the number of seconds a frog jump takes
+        """
+        return self._speed
+
+    def getRate(self):
+        """
+        Returns the number of ticks per second
+        """
+        return self._rate
+
+    def getTicks(self):
+        """
+        Returns the number of ticks recorded
+        """
+        return self._ticks
+
+    def __init__(self, level, speed=FROG_SPEED, rate=TICK_RATE):
+        """
+        Initializes an empty replay.
+
+        Parameter level: The level file of the game
+        Precondition: level is a string
+
+        Parameter speed: The number of seconds a frog jump takes
+        Precondition: speed is a number > 0
+
+        Parameter rate: The number of ticks per second
+        Precondition: rate is an int > 0
+        """
+        self._level = level
+        self._speed = speed
+        self._rate = rate
+        self._runs = []
+        self._ticks = 0
+
+    def record(self, input):
+        """
+        Records the keys down for one tick.
+
+        Parameter input: The keyboard input
+        Precondition: input has a method is_key_down (like GInput or Keys)
+        """
+        mask = 0
+        for bit in range(len(REPLAY_KEYS)):
+            if input.is_key_down(REPLAY_KEYS[bit]):
+                mask = mask | (1 << bit)
+        self.append(mask)
+
+    def append(self, mask, count=1):
+        """
+        Records a key mask for count ticks.
+
+        Parameter mask: the keys that are down
+        Precondition: mask is an int in range(2**len(REPLAY_KEYS))
+
+        Parameter count: the number of ticks
+        Precondition: count is an int > 0
+        """
+        if self._runs and self._runs[-1][0] == mask:
+            self._runs[-1][1] = self._runs[-1][1]+count
+        else:
+            self._runs.append([mask, count])
+        self._ticks = self._ticks+count
+
+    def masks(self):
+        """
+        Yields the key mask of each tick, in order.
+        """
+        for mask, count in self._runs:
+            for i in range(count):
+                yield mask
+
+    def play(self, objects, json, vectorized=False):
+        """
+        Returns the headless Session after playing back this replay.
+
+        Every tick is fed to the session as fast as possible. Playback stops
+        early if the game is complete.
+
+        Parameter objects: A json dictionary of objects
+        Precondition: objects is the objects json the game was recorded with
+
+        Parameter json: A json dictionary with level information
+        Precondition: json is the level json the game was recorded with
+
+        Parameter vectorized: whether to move the obstacles with NumPy
+        Precondition: vectorized is a boolean
+        """
+        session = Session(objects, json, self._speed, vectorized)
+        keys = Keys()
+        dt = 1.0/self._rate
+        for mask in self.masks():
+            keys.mask = mask
+            session.tick(keys, dt)
+            if session.getState() == STATE_COMPLETE:
+                break
+        return session
+
+    def encode(self):
+        """
+        Returns this replay in the replay file format, as bytes.
+        """
+        name = self._level.encode('utf-8')
+        data = bytearray(HEADER.pack(MAGIC, 1, self._rate, self._speed,
+        self._ticks, len(name)))
+        data.extend(name)
+        previous = 0
+        for mask, count in self._runs:
+            delta = mask ^ previous
+            previous = mask
+            if count <= 3:
+                data.append(delta | ((count-1) << 6))
+            else:
+                data.append(delta | (3 << 6))
+                count = count-4
+                while count >= 0x80:
+                    data.append((count & 0x7F) | 0x80)
+                    count = count >> 7
+                data.append(count)
+        return bytes(data)
+
+    def save(self, path):
+        """
+        Writes this replay to a file.
+
+        Parameter path: The file to write
+        Precondition: path is a string naming a writable file
+        """
+        with open(path, 'wb') as file:
+            file.write(self.encode())
+
+
+def decode(data):
+    """
+    Returns the Replay stored in the given bytes.
+
+    Parameter data: a replay in the replay file format
+    Precondition: data is a bytes object
+    """
+    magic, version, rate, speed, ticks, length = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != 1:
+        raise ValueError('This is not a version 1 replay file')
+    pos = HEADER.size
+    replay = Replay(data[pos:pos+length].decode('utf-8'), speed, rate)
+    pos = pos+length
+    mask = 0
+    while pos < len(data):
+        byte = data[pos]
+        pos = pos+1
+        mask = mask ^ (byte & 0x3F)
+        count = (byte >> 6)+1
+        if count == 4:
+            shift = 0
+            byte = 0x80
+            while byte & 0x80:
+                byte = data[pos]
+                pos = pos+1
+                count = count+((byte & 0x7F) << shift)
+                shift = shift+7
+        replay.append(mask, count)
+    if replay.getTicks() != ticks:
+        raise ValueError('The replay file is truncated')
+    return replay
+
+
+def load(path):
+    """
+    Returns the Replay stored in a file.
+
+    Parameter path: The replay file
+    Precondition: path is a string naming a replay file
+    """
+    with open(path, 'rb') as file:
+        return decode(file.read())
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('Usage: python replay.py REPLAY [OBJECTS]')
+        sys.exit(1)
+    replay = load(sys.argv[1])
+    objects = load_json(sys.argv[2] if len(sys.argv) > 2 else OBJECT_DATA)
+    start = time.perf_counter()
+    session = replay.play(objects, load_json(replay.getLevel()))
+    seconds = time.perf_counter()-start
+    level = session.getLevel()
+    print('Level:  %s (frog speed %g)' % (replay.getLevel(), replay.getSpeed()))
+    print('Ticks:  %d of %d, in %.3f seconds (%.0f ticks/s)' % (session.getTicks(),
+        replay.getTicks(), seconds, session.getTicks()/max(seconds, 1e-9)))
+    if level is None:
+        print('Result: never started')
+    else:
+        result = 'won' if level.getWinStatus()=='win' else 'not won'
+        if level.livescounter()=='done':
+            result = 'lost'
+        print('Result: %s, %d lives left' % (result, len(level.getFroglives())))
@@ -0,0 +1,321 @@
+"""
+Solver module for Froggit
+
+This module checks, offline, that every exit of a level can be reached at a given
+frog speed, and how fast.
+
+The obstacles of a level move the same way in every game: they do not depend on the
+frog.  Every object of a lane moves at the same speed and wraps over the same length,
+so the lane comes back to where it started after a period, and only one period of
+each lane is computed, into a table that is read at tick % period.  The period is a
+whole number of ticks, while the time an object takes to wrap around usually is not,
+so past the first period the table is off by up to half a tick of motion per period.
+
+The frog is then searched breadth first through time: the frontier is every different
+state the frog can be in at a tick (its position and its jump), and each state is
+followed by every key the player could press.  States where the frog dies are
+dropped, and the states in the same cell of SOLVER_CELL pixels, with the same jump
+at the same point, are merged into the one nearest the center of the cell (a frog on
+a log can be anywhere on it, so without this the frontier grows every tick).  All
+the states of a tick are moved together by a VecEnv, so apart from the merging and
+the periods the search follows exactly the rules of the game.  A merged state may have
+been a little faster, so the times found can be somewhat longer than the fastest ones;
+a smaller cell gives closer times, for more states.
+
+All exits are searched for at once, by one frog from the start of the level.  The
+first tick at which a state reaches an exit is the fastest time to that exit, and the
+state is not followed further (the frog starts again after an exit).  The search
+stops once every exit has been reached.
+
+To check levels from the command line, type
+
+    python solver.py level.json [level.json ...] [--objects objects.json]
+                     [--speed 0.25] [--seconds 60] [--cell 64]
+
+The program prints the time to each exit, and exits with status 1 if an exit of any
+level cannot be reached in time.
+"""
+import argparse
+import sys
+from consts import *
+from lanes  import *
+from files  import load_json
+from vecenv import *
+
+# The seconds of play searched, unless given
+SOLVER_SECONDS = 60
+# The most frog states kept at one tick; the search gives up beyond this
+SOLVER_STATES = 200000
+# The size (in pixels) of the cells in which frog states are searched as one state
+SOLVER_CELL = GRID_SIZE
+
+
+def obstacle_table(json, ticks, dt):
+    """
+    Returns the tuple (table, periods) of the x of every obstacle over its period.
+
+    The periods are an int array with the number of ticks after which each obstacle
+    is back where it started (the same for every obstacle of a lane), and at most
+    ticks+1.  An obstacle moving right waits a tick when it wraps (see advance in
+    Traffic), which is one more tick in its period.  Row t of the table has the
+    positions after t advances of a Traffic (the order of the columns is the order
+    of Traffic), up to the longest period, so obstacle j is at table[t % periods[j],
+    j] after t ticks.  The rows are asked for in order, so getPositionsAt in Traffic
+    steps each tick once from the one before.
+
+    Parameter json: A json dictionary with level information
+    Precondition: json is a valid level json
+
+    Parameter ticks: the number of ticks searched
+    Precondition: ticks is an int >= 0
+
+    Parameter dt: the length of a tick in seconds
+    Precondition: dt is a float > 0
+    """
+    width = json['size'][0]*GRID_SIZE
+    length = width+2*json['offscreen']*GRID_SIZE
+    traffic = Traffic(json, width)
+    periods = numpy.ones(traffic.size(), dtype=int)
+    for i in range(traffic.size()):
+        speed = float(traffic.getSpeed(i))
+        if speed != 0:
+            period = int(round(length/(abs(speed)*dt)))+(1 if speed > 0 else 0)
+            periods[i] = max(1, min(period, ticks+1))
+    table = numpy.empty((int(periods.max(initial=1)), traffic.size()))
+    for tick in range(len(table)):
+        table[tick] = traffic.getPositionsAt(tick*dt, dt)
+    return table, periods
+
+
+class Solver(object):
+    """
+    A class representing the search for the exits of a level
+
+    A solver is made for a level and a frog speed, and is run with solve.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _objects: A json dictionary of objects
+    # Invariant: _objects is a valid objects json
+    #
+    # Attribute _json: A json dictionary with level information
+    # Invariant: _json is a valid level json
+    #
+    # Attribute _speed: the number of seconds a frog jump takes
+    # Invariant: _speed is a number > 0
+    #
+    # Attribute _dt: the length of a tick in seconds
+    # Invariant: _dt is a float > 0
+    #
+    # Attribute _exits: the cell of each exit, in the order of VecEnv
+    # Invariant: _exits is a list of tuples (column, row)
+    #
+    # Attribute _cell: the size of the cells in which frog states are merged
+    # Invariant: _cell is a number > 0
+
+    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    def getExits(self):
+        """
+        Returns the cell of each exit as a list of tuples (column, row)
+        """
+        return self._exits
+
+    def __init__(self, objects, json, speed=TOOL_SPEED, dt=None, cell=SOLVER_CELL):
+        """
+        Initializes a solver for a level.
+
+        Parameter objects: A json dictionary of objects
+        Precondition: objects is a valid objects json
+
+        Parameter json: A json dictionary with level information
+        Precondition: json is a valid level json
+
+        Parameter speed: the number of seconds a frog jump takes
+        Precondition: speed is a number > 0
+
+        Parameter dt: the length of a tick in seconds, or None for 1/TICK_RATE
+        Precondition: dt is None or a number > 0
+
+        Parameter cell: the size of the cells in which frog states are merged
+        Precondition: cell is a number > 0
+        """
+        if numpy is None:
+            raise ImportError('Solver needs NumPy')
+        self._objects = objects
+        self._json = json
+        self._speed = speed
+        self._dt = 1.0/(TICK_RATE or 60) if dt is None else float(dt)
+        self._cell = cell
+        self._exits = []
+        row = 0
+        for lane in json['lanes']:
+            if lane['type'] == 'hedge':
+                for item in lane.get('objects', []):
+                    if item['type'] == 'exit':
+                        self._exits.append((item['position'], row))
+            row = row+1
+
+    def solve(self, seconds=SOLVER_SECONDS, limit=SOLVER_STATES):
+        """
+        Returns a dictionary with the fastest time to each exit.
+
+        The dictionary has the keys
+
+            'exits':    a list with, for each exit, a dictionary with its 'column',
+                        'row' and the 'seconds' to reach it (None if it was not
+                        reached in time)
+            'solvable': True if every exit was reached
+            'complete': False if the search gave up because it had more than
+                        limit states
+            'states':   the largest number of states at one tick
+            'ticks':    the number of ticks searched
+
+        Parameter seconds: the seconds of play to search
+        Precondition: seconds is a number > 0
+
+        Parameter limit: the most states to keep at one tick
+        Precondition: limit is an int > 0
+        """
+        ticks = int(round(seconds/self._dt))
+        table, periods = obstacle_table(self._json, ticks, self._dt)
+        columns = numpy.arange(len(periods))
+        env = None
+        times = [None]*len(self._exits)
+        start = self._json['start']
+        states = numpy.array([[(start[0]*GRID_SIZE)+(GRID_SIZE//2),
+                               (start[1]*GRID_SIZE)+(GRID_SIZE//2), 0, 0.0, 0.0]])
+        largest = 1
+        complete = True
+        tick = 0
+        while tick < ticks and len(states) and None in times:
+            if len(states) > limit:
+                complete = False
+                break
+            frogs, actions = self._expand(states)
+            if env is None or env.getCount() < len(actions):
+                env = VecEnv(self._objects, self._json,
+                             max(2*len(actions), 64), self._speed, self._dt)
+            obstacles = table[tick % periods, columns]
+            states = self._step(env, frogs, actions, obstacles, tick+1, times)
+            largest = max(largest, len(states))
+            tick = tick+1
+        exits = []
+        for i in range(len(self._exits)):
+            seconds = None if times[i] is None else times[i]*self._dt
+            exits.append({'column': self._exits[i][0], 'row': self._exits[i][1],
+                          'seconds': seconds})
+        return {'exits': exits, 'solvable': None not in times, 'complete': complete,
+                'states': largest, 'ticks': tick}
+
+    def _expand(self, states):
+        """
+        Returns the tuple (frogs, actions) of every state followed by every key.
+
+        A sitting frog is followed by every action in ACTIONS, and a jumping frog
+        only by 'none' (keys do nothing during a jump).
+
+        Parameter states: the states of the frog
+        Precondition: states is a float array of shape (m, 5), with the columns
+        x, y, action, seconds, start (see VecEnv.load)
+        """
+        sitting = states[:, 2] == 0
+        count = len(ACTIONS)
+        frogs = numpy.concatenate((numpy.repeat(states[sitting], count, axis=0),
+                                   states[~sitting]))
+        actions = numpy.concatenate((numpy.tile(numpy.arange(count),
+                                                int(sitting.sum())),
+                                     numpy.zeros(int((~sitting).sum()), dtype=int)))
+        return frogs, actions
+
+    def _step(self, env, frogs, actions, obstacles, tick, times):
+        """
+        Returns the different states of the frogs that survive one tick.
+
+        The frogs that reach an exit first at this tick set its time in times.  The
+        states in the same cell with the same jump are merged (see above).
+
+        Parameter env: the environments to move the frogs with
+        Precondition: env is a VecEnv of this level with at least len(frogs)
+        environments
+
+        Parameter frogs: the states of the frogs
+        Precondition: frogs is a float array of shape (m, 5) (see _expand)
+
+        Parameter actions: the action of each frog
+        Precondition: actions is an int array of shape (m,)
+
+        Parameter obstacles: the x of every obstacle at the start of the tick
+        Precondition: obstacles is a float array of shape (n,)
+
+        Parameter tick: the number of ticks at the end of this one
+        Precondition: tick is an int > 0
+
+        Parameter times: the first tick each exit was reached, or None
+        Precondition: times is a list with one entry per exit
+        """
+        m = len(actions)
+        count = env.getCount()
+        padded = numpy.concatenate((frogs, numpy.repeat(frogs[:1], count-m, axis=0)))
+        moves = numpy.concatenate((actions, numpy.zeros(count-m, dtype=int)))
+        env.load(tuple(padded[:, i] for i in range(5)), obstacles)
+        rewards = env.step(moves)[1][:m]
+        for exit in numpy.unique(env.getReached()[:m]):
+            if exit >= 0 and times[exit] is None:
+                times[exit] = tick
+        alive = rewards == 0
+        x, y = env.getFrogs()
+        action, seconds, start = env.getJumps()
+        states = numpy.stack((x[:m], y[:m], action[:m], seconds[:m], start[:m]),
+                             axis=1)[alive]
+        states[states[:, 2] == 0, 3:] = 0.0
+        cells = numpy.floor(states[:, :2]/self._cell)
+        offset = numpy.abs(states[:, :2]-(cells+0.5)*self._cell).sum(axis=1)
+        order = numpy.argsort(offset, kind='stable')
+        keys = numpy.column_stack((cells, states[:, 2],
+                                   numpy.round(states[:, 3]/self._dt)))[order]
+        return states[order[numpy.unique(keys, axis=0, return_index=True)[1]]]
+
+
+def main(args):
+    """
+    Checks the given levels and prints the time to each exit.
+
+    Returns 0 if every exit of every level can be reached in time, and 1 otherwise.
+
+    Parameter args: the command line arguments (without the program name)
+    Precondition: args is a list of strings
+    """
+    parser = argparse.ArgumentParser(description='Check that Froggit levels can be won')
+    parser.add_argument('levels', nargs='+', help='level json files')
+    parser.add_argument('--objects', default=OBJECT_DATA)
+    parser.add_argument('--speed', type=float, default=TOOL_SPEED,
+                        help='seconds per frog jump')
+    parser.add_argument('--seconds', type=float, default=SOLVER_SECONDS)
+    parser.add_argument('--limit', type=int, default=SOLVER_STATES)
+    parser.add_argument('--cell', type=float, default=SOLVER_CELL,
+                        help='size of the cells in which frog states are merged')
+    options = parser.parse_args(args)
+    objects = load_json(options.objects)
+    status = 0
+    for name in options.levels:
+        solver = Solver(objects, load_json(name), options.speed, None, options.cell)
+        result = solver.solve(options.seconds, options.limit)
+        times = []
+        for exit in result['exits']:
+            if exit['seconds'] is None:
+                times.append('(%d,%d) never' % (exit['column'], exit['row']))
+            else:
+                times.append('(%d,%d) %.2fs' % (exit['column'], exit['row'],
+                                                exit['seconds']))
+        verdict = 'ok' if result['solvable'] else 'UNSOLVABLE'
+        if not result['complete']:
+            verdict = verdict+' (gave up after %d ticks)' % result['ticks']
+        print('%s: %s  [%s]  states=%d' % (name, verdict, ', '.join(times),
+                                           result['states']))
+        if not result['solvable']:
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
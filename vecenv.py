@@ -0,0 +1,798 @@
+"""
+Vector environment module for Froggit
+
+This module runs many copies (environments) of one Froggit level at once in this
+process, for training bots.  The state of every environment is kept in NumPy arrays
+with one row per environment: the frog, its jump, its lives, the occupied exits, and
+the position of every obstacle.  A call to step moves every environment one tick with
+a few array operations, instead of one Level.update per environment.
+
+The rules are the rules of Level.update (with the frog of FrogModel, the obstacles of
+Traffic and the exits of Hedge), in the same order and with the same arithmetic, so an
+environment and a headless Level given the same keys agree on every position.  There
+are three differences, all made so that an environment never stops:
+
+    The frog comes back at the start as soon as it dies or reaches an exit, as if the
+    death animation took no time and the player pressed 'c' at once.  (A Level does
+    not move its obstacles during that time anyway.)
+
+    An environment whose game is over (won, or out of lives) starts a new game in the
+    same step.  Its final result is in getResults until the next step.
+
+    A move into a hedge that is neither an open nor an exit is refused.  (In Level,
+    such a move is refused if the frog overlaps its own lane, which it always does.)
+
+An action is one of the indices of ACTIONS.  The observation of an environment is a
+row of getObservations (see OBSERVATION for the layout).  The arrays returned by step
+are allocated once, and are overwritten by the next step.  (The masks and indices that
+step works out along the way are new arrays every step.)
+
+This module needs NumPy.
+"""
+import math
+from consts import *
+from lanes  import *
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The actions of the frog, by index
+ACTIONS = ('none', 'left', 'right', 'up', 'down')
+# The layout of an observation: these values, then one value per exit (1 if a frog is
+# safe in it), then the x of every obstacle (in the order of Traffic), all divided by
+# the width of the level (positions) or by FROG_LIVES (lives)
+OBSERVATION = ('frog x', 'frog y', 'jumping', 'lives')
+# The reward for reaching an exit
+REWARD_EXIT = 1.0
+# The reward for dying
+REWARD_DEATH = -1.0
+
+
+class Hitboxes(object):
+    """
+    A class representing the hitboxes of some objects, for testing many points at once
+
+    The test is the one of contains in Box: the point is turned into the coordinates
+    of the object (rotated by its angle) and compared to the sorted hitbox.  The
+    results of contains are written to one array, allocated once.  The test of sweeps
+    is the one of _sweep in Level, for points and objects that move during a tick.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _xs: the x of each object (unless it is given to contains)
+    # Invariant: _xs is a float array of shape (m,)
+    #
+    # Attribute _ys: the y of each object
+    # Invariant: _ys is a float array of shape (m,)
+    #
+    # Attribute _cos: the cosine of the angle of each object
+    # Invariant: _cos is a float array of shape (m,)
+    #
+    # Attribute _sin: the sine of the angle of each object
+    # Invariant: _sin is a float array of shape (m,)
+    #
+    # Attribute _box: the sorted hitbox of each object
+    # Invariant: _box is a tuple (x0, y0, x1, y1) of float arrays of shape (m,)
+    #
+    # Attribute _rotated: whether any object has an angle
+    # Invariant: _rotated is a boolean
+    #
+    # Attribute _scratch: arrays for the intermediate values
+    # Invariant: _scratch is a tuple of four float arrays of shape (k, m)
+    #
+    # Attribute _result: the result of the last call to contains
+    # Invariant: _result is a boolean array of shape (k, m)
+    #
+    # Attribute _test: an array for the intermediate tests
+    # Invariant: _test is a boolean array of shape (k, m)
+    #
+    # Attribute _sweeping: arrays for the intermediate values of sweeps
+    # Invariant: _sweeping is a tuple of nine float arrays of shape (k, m)
+    #
+    # Attribute _turned: arrays for the turned coordinates of sweeps
+    # Invariant: _turned is a tuple of four float arrays of shape (k, m) if _rotated,
+    # and an empty tuple otherwise
+    #
+    # Attribute _swept: the result of the last call to sweeps, and its tests
+    # Invariant: _swept is a tuple of four boolean arrays of shape (k, m), the first
+    # being the result
+
+    def __init__(self, objects, count):
+        """
+        Initializes the hitboxes of the given objects, for count points at a time.
+
+        Parameter objects: the objects
+        Precondition: objects is a list of tuples (x, y, hitbox, angle), where
+        hitbox is a list [x0, y0, x1, y1] and angle is in degrees
+
+        Parameter count: the number of points tested at once
+        Precondition: count is an int > 0
+        """
+        m = len(objects)
+        self._xs = numpy.array([float(o[0]) for o in objects]).reshape(m)
+        self._ys = numpy.array([float(o[1]) for o in objects]).reshape(m)
+        cos = []
+        sin = []
+        self._rotated = False
+        for x, y, hitbox, angle in objects:
+            if angle % 360 != 0:
+                self._rotated = True
+                cos.append(math.cos(math.radians(angle)))
+                sin.append(math.sin(math.radians(angle)))
+            else:
+                cos.append(1.0)
+                sin.append(0.0)
+        self._cos = numpy.array(cos).reshape(m)
+        self._sin = numpy.array(sin).reshape(m)
+        boxes = [(min(h[0],h[2]), min(h[1],h[3]), max(h[0],h[2]), max(h[1],h[3]))
+                 for x, y, h, angle in objects]
+        self._box = tuple(numpy.array([b[i] for b in boxes]).reshape(m)
+                          for i in range(4))
+        self._scratch = tuple(numpy.empty((count, m)) for i in range(4))
+        self._result = numpy.empty((count, m), dtype=bool)
+        self._test = numpy.empty((count, m), dtype=bool)
+        self._sweeping = tuple(numpy.empty((count, m)) for i in range(9))
+        self._turned = ()
+        if self._rotated:
+            self._turned = tuple(numpy.empty((count, m)) for i in range(4))
+        self._swept = tuple(numpy.empty((count, m), dtype=bool) for i in range(4))
+
+    def contains(self, px, py, xs=None):
+        """
+        Returns a boolean array whose entry [i, j] is True if object j contains
+        point (px[i], py[i]).
+
+        The array is overwritten by the next call.
+
+        Parameter px: the x of each point
+        Precondition: px is a float array of shape (k,)
+
+        Parameter py: the y of each point
+        Precondition: py is a float array of shape (k,)
+
+        Parameter xs: the x of each object for each point, or None to use the x
+        the objects were created with
+        Precondition: xs is None or a float array of shape (k, m)
+        """
+        dx, dy, rx, ry = self._scratch
+        x0, y0, x1, y1 = self._box
+        numpy.subtract(px[:, None], self._xs if xs is None else xs, out=dx)
+        numpy.subtract(py[:, None], self._ys, out=dy)
+        if self._rotated:
+            # dx*c+dy*s and dy*c-dx*s, in the order of Box.contains
+            numpy.multiply(dx, self._cos, out=rx)
+            numpy.multiply(dy, self._sin, out=ry)
+            numpy.add(rx, ry, out=rx)
+            numpy.multiply(dy, self._cos, out=ry)
+            numpy.multiply(dx, self._sin, out=dy)
+            numpy.subtract(ry, dy, out=ry)
+            dx, dy = rx, ry
+        result = self._result
+        test = self._test
+        numpy.less_equal(x0, dx, out=result)
+        numpy.less_equal(dx, x1, out=test)
+        numpy.logical_and(result, test, out=result)
+        numpy.less_equal(y0, dy, out=test)
+        numpy.logical_and(result, test, out=result)
+        numpy.less_equal(dy, y1, out=test)
+        numpy.logical_and(result, test, out=result)
+        return result
+
+    def sweeps(self, start, end, before, xs):
+        """
+        Returns a boolean array whose entry [i, j] is True if object j contained
+        point i at some time during a tick.
+
+        Point i moves in a straight line from start to end during the tick, and
+        object j from before[i, j] to xs[i, j].  The test is the one of _sweep in
+        Level, with the same arithmetic.  There may be fewer points than the count
+        given to the initializer.  The array is overwritten by the next call.
+
+        Parameter start: the points at the start of the tick
+        Precondition: start is a tuple (px, py) of float arrays of shape (k,)
+
+        Parameter end: the points at the end of the tick
+        Precondition: end is a tuple (px, py) of float arrays of shape (k,)
+
+        Parameter before: the x of each object for each point at the start
+        Precondition: before is a float array of shape (k, m)
+
+        Parameter xs: the x of each object for each point at the end
+        Precondition: xs is a float array of shape (k, m)
+        """
+        k = len(start[0])
+        x0, y0, x1, y1 = self._box
+        dx0, dx1, dy0, dy1, t0, t1, t, enter, leave = [a[:k] for a in self._sweeping]
+        result, same, test, other = [a[:k] for a in self._swept]
+        numpy.subtract(start[0][:, None], before, out=dx0)
+        numpy.subtract(end[0][:, None], xs, out=dx1)
+        numpy.subtract(start[1][:, None], self._ys, out=dy0)
+        numpy.subtract(end[1][:, None], self._ys, out=dy1)
+        if self._rotated:
+            rx0, rx1, ry0, ry1 = [a[:k] for a in self._turned]
+            for dx, dy, rx, ry in ((dx0, dy0, rx0, ry0), (dx1, dy1, rx1, ry1)):
+                # dx*c+dy*s and dy*c-dx*s, as in contains
+                numpy.multiply(dx, self._cos, out=rx)
+                numpy.multiply(dy, self._sin, out=t)
+                numpy.add(rx, t, out=rx)
+                numpy.multiply(dy, self._cos, out=ry)
+                numpy.multiply(dx, self._sin, out=t)
+                numpy.subtract(ry, t, out=ry)
+            axes = ((rx0, rx1, x0, x1), (ry0, ry1, y0, y1))
+        else:
+            axes = ((dx0, dx1, x0, x1), (dy0, dy1, y0, y1))
+        enter.fill(0.0)
+        leave.fill(1.0)
+        result.fill(True)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            for a, b, low, high in axes:
+                # A point that does not move on an axis must be inside on it
+                numpy.equal(a, b, out=same)
+                numpy.less_equal(low, a, out=test)
+                numpy.less_equal(a, high, out=other)
+                numpy.logical_and(test, other, out=test)
+                numpy.logical_not(same, out=other)
+                numpy.logical_or(test, other, out=test)
+                numpy.logical_and(result, test, out=result)
+                # The times it enters and leaves the hitbox on this axis
+                numpy.subtract(b, a, out=t)
+                numpy.subtract(low, a, out=t0)
+                numpy.divide(t0, t, out=t0)
+                numpy.subtract(high, a, out=t1)
+                numpy.divide(t1, t, out=t1)
+                numpy.minimum(t0, t1, out=t)
+                numpy.copyto(t, 0.0, where=same)
+                numpy.maximum(enter, t, out=enter)
+                numpy.maximum(t0, t1, out=t)
+                numpy.copyto(t, 1.0, where=same)
+                numpy.minimum(leave, t, out=leave)
+        numpy.less_equal(enter, leave, out=test)
+        numpy.logical_and(result, test, out=result)
+        return result
+
+
+class VecEnv(object):
+    """
+    A class representing many environments of one level, stepped together
+
+    Every environment starts a game of the level, and starts a new one whenever its
+    game is over.  See the module docstring for the rules.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _count: the number of environments
+    # Invariant: _count is an int > 0
+    #
+    # Attribute _dt: the length of a tick in seconds
+    # Invariant: _dt is a float > 0
+    #
+    # Attribute _speed: the number of seconds a frog jump takes
+    # Invariant: _speed is a number > 0
+    #
+    # Attribute _width: the width of the level
+    # Invariant: _width is an int > 0
+    #
+    # Attribute _height: the height of the window of the level (one lane more)
+    # Invariant: _height is an int > 0
+    #
+    # Attribute _margin: how far an obstacle goes past the edge before it wraps
+    # Invariant: _margin is a number >= 0
+    #
+    # Attribute _start: the position of the frog at the start
+    # Invariant: _start is a tuple of two ints
+    #
+    # Attribute _fx, _fy: the position of each frog
+    # Invariant: _fx and _fy are float arrays of shape (k,)
+    #
+    # Attribute _jump: the direction of the jump of each frog (0 if it sits)
+    # Invariant: _jump is an int array of shape (k,), with values in range(5) (the
+    # indices of ACTIONS)
+    #
+    # Attribute _seconds: how long each frog has been jumping
+    # Invariant: _seconds is a float array of shape (k,)
+    #
+    # Attribute _from: the x (left or right) or y (up or down) each jump started at
+    # Invariant: _from is a float array of shape (k,)
+    #
+    # Attribute _before: the position of each frog at the start of the tick
+    # Invariant: _before is a tuple of two float arrays of shape (k,)
+    #
+    # Attribute _lives: the lives left in each environment
+    # Invariant: _lives is an int array of shape (k,), with values in 1..FROG_LIVES
+    #
+    # Attribute _occupied: the exits that have a safe frog in each environment
+    # Invariant: _occupied is a boolean array of shape (k, e)
+    #
+    # Attribute _reached: the exit each frog reached in the last step
+    # Invariant: _reached is an int array of shape (k,), with the index of the exit,
+    # or -1 if the frog reached none
+    #
+    # Attribute _xs: the x of every obstacle in each environment
+    # Invariant: _xs is a float array of shape (k, n), in the order of Traffic
+    #
+    # Attribute _prevxs: the x every obstacle moved from in the last tick
+    # Invariant: _prevxs is a float array of shape (k, n); an obstacle that wrapped
+    # is moved by the length it wraps over (see getPreviousX in Traffic)
+    #
+    # Attribute _initial: the x of every obstacle at the start
+    # Invariant: _initial is a float array of shape (n,)
+    #
+    # Attribute _speeds: the speed of every obstacle
+    # Invariant: _speeds is a float array of shape (n,)
+    #
+    # Attribute _obstacles: the hitboxes of every obstacle
+    # Invariant: _obstacles is a Hitboxes for the n objects of the Traffic
+    #
+    # Attribute _logs: which obstacles are logs
+    # Invariant: _logs is a boolean array of shape (n,)
+    #
+    # Attribute _gates: the hitboxes of the opens and exits of every hedge
+    # Invariant: _gates is a Hitboxes, in the order of Traffic
+    #
+    # Attribute _isopen: which gates are opens
+    # Invariant: _isopen is a boolean array of the size of _gates
+    #
+    # Attribute _exits: the hitboxes of the exits of every hedge
+    # Invariant: _exits is a Hitboxes, in the order of Traffic
+    #
+    # Attribute _exitcell: the exit whose center is in each cell
+    # Invariant: _exitcell is an int array of shape (lanes, columns); an entry is
+    # the index of the exit centered in that cell, or -1
+    #
+    # Attribute _road, _water, _hedge: the type of each lane
+    # Invariant: these are boolean arrays of shape (lanes,)
+    #
+    # Attribute _tile: the height of the background tile of a lane
+    # Invariant: _tile is an int > 0
+    #
+    # Attribute _observations, _rewards, _dones, _results: the arrays returned by step
+    # Invariant: these are arrays of shape (k, d), (k,), (k,) and (k,); a result is
+    # 1 for a win, -1 for a loss and 0 otherwise
+    #
+    # Attribute _scratch: arrays for the moving obstacles
+    # Invariant: _scratch is a tuple of two float arrays of shape (k, n) and two
+    # boolean arrays of shape (k, n), and a float array of shape (n,)
+
+    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    def getCount(self):
+        """
+        Returns the number of environments
+        """
+        return self._count
+
+    def getObservations(self):
+        """
+        Returns the observations, one row per environment (see OBSERVATION)
+        """
+        return self._observations
+
+    def getResults(self):
+        """
+        Returns the result of the last step: 1 for a win, -1 for a loss, 0 otherwise
+        """
+        return self._results
+
+    def getLives(self):
+        """
+        Returns the lives left in each environment
+        """
+        return self._lives
+
+    def getOccupied(self):
+        """
+        Returns which exits have a safe frog, one row per environment
+        """
+        return self._occupied
+
+    def getReached(self):
+        """
+        Returns the exit each frog reached in the last step, or -1
+
+        Unlike getOccupied, this is not cleared when the game is won and starts
+        again.
+        """
+        return self._reached
+
+    def getFrogs(self):
+        """
+        Returns the position of each frog as a tuple of arrays (x, y)
+        """
+        return (self._fx, self._fy)
+
+    def getObstacles(self):
+        """
+        Returns the x of every obstacle, one row per environment
+        """
+        return self._xs
+
+    def getJumps(self):
+        """
+        Returns the jump of each frog as a tuple of arrays (action, seconds, start)
+
+        The action is the index in ACTIONS of the direction of the jump (0 if
+        the frog sits), the seconds are how long the frog has been jumping, and
+        the start is the x or y the jump started at.
+        """
+        return (self._jump, self._seconds, self._from)
+
+    def __init__(self, objects, json, count, speed=FROG_SPEED, dt=None):
+        """
+        Initializes count environments of a level, all at the start.
+
+        Parameter objects: A json dictionary of objects
+        Precondition: objects is a valid objects json
+
+        Parameter json: A json dictionary with level information
+        Precondition: json is a valid level json with at least two lanes
+
+        Parameter count: the number of environments
+        Precondition: count is an int > 0
+
+        Parameter speed: the number of seconds a frog jump takes
+        Precondition: speed is a number > 0
+
+        Parameter dt: the length of a tick in seconds, or None for 1/TICK_RATE
+        Precondition: dt is None or a number > 0
+        """
+        if numpy is None:
+            raise ImportError('VecEnv needs NumPy')
+        size = json['size']
+        lanes = json['lanes']
+        images = objects['images']
+        self._count = count
+        self._dt = 1.0/(TICK_RATE or 60) if dt is None else float(dt)
+        self._speed = speed
+        self._width = size[0]*GRID_SIZE
+        self._height = (size[1]*GRID_SIZE)+GRID_SIZE
+        self._tile = self._height//len(lanes)
+        self._margin = json['offscreen']*GRID_SIZE
+        self._start = ((json['start'][0]*GRID_SIZE)+(GRID_SIZE//2),
+                       (json['start'][1]*GRID_SIZE)+(GRID_SIZE//2))
+        types = [lane['type'] for lane in lanes]
+        self._road = numpy.array([t == 'road' for t in types])
+        self._water = numpy.array([t == 'water' for t in types])
+        self._hedge = numpy.array([t == 'hedge' for t in types])
+
+        traffic = Traffic(json, self._width)
+        obstacles = []
+        gates = []
+        exits = []
+        isopen = []
+        columns = (self._width+GRID_SIZE-1)//GRID_SIZE
+        self._exitcell = numpy.full((len(lanes), columns), -1, dtype=int)
+        for i in range(traffic.size()):
+            kind = traffic.getKind(i)
+            row = traffic.getRow(i)
+            y = (row*GRID_SIZE)+(GRID_SIZE//2)
+            angle = 0 if traffic.getSpeed(i) >= 0 else 180
+            box = (traffic.getX(i), y, images[kind]['hitbox'], angle)
+            obstacles.append(box)
+            if types[row] == 'hedge' and kind in ('open', 'exit'):
+                gates.append(box)
+                isopen.append(kind == 'open')
+                if kind == 'exit':
+                    column = int(box[0]//GRID_SIZE)
+                    if 0 <= column < columns:
+                        self._exitcell[row, column] = len(exits)
+                    exits.append(box)
+        n = len(obstacles)
+        self._initial = numpy.array([float(traffic.getX(i)) for i in range(n)]
+                                    ).reshape(n)
+        self._speeds = numpy.array([float(traffic.getSpeed(i)) for i in range(n)]
+                                   ).reshape(n)
+        self._logs = numpy.array(['log' in traffic.getKind(i) for i in range(n)],
+                                 dtype=bool).reshape(n)
+        self._obstacles = Hitboxes(obstacles, count)
+        self._gates = Hitboxes(gates, count)
+        self._isopen = numpy.array(isopen, dtype=bool).reshape(len(gates))
+        self._exits = Hitboxes(exits, count)
+
+        self._fx = numpy.empty(count)
+        self._fy = numpy.empty(count)
+        self._jump = numpy.zeros(count, dtype=int)
+        self._seconds = numpy.zeros(count)
+        self._from = numpy.zeros(count)
+        self._lives = numpy.empty(count, dtype=int)
+        self._occupied = numpy.zeros((count, len(exits)), dtype=bool)
+        self._reached = numpy.full(count, -1, dtype=int)
+        self._xs = numpy.empty((count, n))
+        self._prevxs = numpy.empty((count, n))
+        self._before = (numpy.empty(count), numpy.empty(count))
+        self._scratch = (numpy.empty((count, n)), numpy.empty((count, n)),
+                         numpy.empty((count, n), dtype=bool),
+                         numpy.empty((count, n), dtype=bool), numpy.empty(n))
+        width = len(OBSERVATION)+len(exits)+n
+        self._observations = numpy.zeros((count, width), dtype=numpy.float32)
+        self._rewards = numpy.zeros(count, dtype=numpy.float32)
+        self._dones = numpy.zeros(count, dtype=bool)
+        self._results = numpy.zeros(count, dtype=int)
+        self.reset()
+
+    def reset(self):
+        """
+        Returns the observations after starting a new game in every environment.
+        """
+        everyone = numpy.ones(self._count, dtype=bool)
+        self._restart(everyone)
+        self._respawn(everyone)
+        self._observe()
+        return self._observations
+
+    def load(self, frogs, obstacles):
+        """
+        Puts every environment in the given state, with all lives and no safe
+        frogs.
+
+        Parameter frogs: the frog of each environment
+        Precondition: frogs is a tuple (x, y, action, seconds, start) of arrays of
+        shape (k,), as in getFrogs and getJumps
+
+        Parameter obstacles: the x of every obstacle
+        Precondition: obstacles is a float array of shape (n,) (for every
+        environment) or (k, n)
+        """
+        x, y, action, seconds, start = frogs
+        numpy.copyto(self._fx, x)
+        numpy.copyto(self._fy, y)
+        numpy.copyto(self._jump, action, casting='unsafe')
+        numpy.copyto(self._seconds, seconds)
+        numpy.copyto(self._from, start)
+        numpy.copyto(self._xs, obstacles)
+        self._lives.fill(FROG_LIVES)
+        self._occupied.fill(False)
+        self._observe()
+
+    def step(self, actions):
+        """
+        Returns the tuple (observations, rewards, dones) after one tick of every
+        environment.
+
+        The rules are applied in the order of Level.update: the frog moves (or
+        starts a jump), the obstacles move, the frog may reach an exit, the game
+        may be won, and then the frog may be hit by a car or drown.  A frog that
+        dies or reaches an exit starts again, and a game that is over (dones is
+        True) starts again.
+
+        Parameter actions: the action of each environment
+        Precondition: actions is an int array of shape (k,), with values in
+        range(len(ACTIONS))
+        """
+        dt = self._dt
+        fx = self._fx
+        fy = self._fy
+        self._rewards.fill(0.0)
+        self._results.fill(0)
+        self._reached.fill(-1)
+        numpy.copyto(self._before[0], fx)
+        numpy.copyto(self._before[1], fy)
+        self._moveFrogs(actions, dt)
+        self._moveObstacles(dt)
+
+        # The exits (see _reachedexit in Hedge)
+        inside = self._exits.contains(fx, fy)
+        reached = inside.any(axis=1)
+        if reached.any():
+            # Not for a level without exits, where argmax has nothing to look at
+            rows = numpy.nonzero(reached)[0]
+            self._reached[rows] = inside[rows].argmax(axis=1)
+            self._occupied[rows, self._reached[rows]] = True
+            self._rewards[reached] = REWARD_EXIT
+        # A level without exits is never won (see _checkWin in Level)
+        won = self._occupied.all(axis=1) & (self._occupied.shape[1] > 0)
+        alive = ~reached
+
+        # The cars (see _roadDeath and _sweep in Level)
+        row = (fy//GRID_SIZE).astype(int)
+        dead = alive & self._road[row]
+        road = numpy.nonzero(dead)[0]
+        if len(road):
+            start = (self._before[0][road], self._before[1][road])
+            hits = self._obstacles.sweeps(start, (fx[road], fy[road]),
+                                          self._prevxs[road], self._xs[road])
+            dead[road] = hits.any(axis=1)
+        alive = alive & ~dead
+        hits = self._obstacles.contains(fx, fy, self._xs)
+
+        # The water (see _logride and _onlog in Level)
+        sitting = alive & (self._jump == 0)
+        below = numpy.maximum(row-1, 0)
+        inwater = ((fx >= 0) & (fx <= self._width) &
+                   ((self._water[row] & (fy <= row*GRID_SIZE+self._tile)) |
+                    (self._water[below] & (row > 0) &
+                     (fy <= below*GRID_SIZE+self._tile))))
+        floating = sitting & inwater
+        numpy.logical_and(hits, self._logs, out=hits)
+        onlog = hits.any(axis=1)
+        inside = (fx >= GRID_SIZE//2) & (fx <= self._width-(GRID_SIZE//2))
+        riding = floating & onlog & inside
+        if riding.any():
+            # Not for a level without obstacles, as with the exits
+            log = hits[riding].argmax(axis=1)
+            fx[riding] = fx[riding]+self._speeds[log]*dt
+        drowned = floating & ~riding
+        dead = dead | drowned
+
+        self._rewards[dead] = REWARD_DEATH
+        self._lives[dead] = self._lives[dead]-1
+        lost = self._lives <= 0
+        self._results[won] = 1
+        self._results[lost & ~won] = -1
+        numpy.logical_or(won, lost, out=self._dones)
+        self._respawn(reached | dead | self._dones)
+        self._restart(self._dones)
+        self._observe()
+        return (self._observations, self._rewards, self._dones)
+
+    def _moveFrogs(self, actions, dt):
+        """
+        Moves the jumping frogs, and starts the jumps of the sitting frogs.
+
+        This follows update and makeAnimator in FrogModel, with the moves
+        allowed by the collide methods of Level.
+
+        Parameter actions: the action of each environment
+        Precondition: actions is an int array of shape (k,)
+
+        Parameter dt: the length of the tick in seconds
+        Precondition: dt is a float > 0
+        """
+        fx = self._fx
+        fy = self._fy
+        jump = self._jump
+        speed = self._speed
+
+        # Frogs in a jump move by (dx/speed)*dt until the jump has taken speed seconds
+        jumping = jump != 0
+        for action, dx, coords in ((1, -GRID_SIZE, fx), (2, GRID_SIZE, fx),
+                                   (3, GRID_SIZE, fy), (4, -GRID_SIZE, fy)):
+            moving = numpy.nonzero(jump == action)[0]
+            if len(moving):
+                coords[moving] = coords[moving]+(dx/speed)*dt
+                self._seconds[moving] = self._seconds[moving]+dt
+                done = moving[self._seconds[moving] >= speed]
+                coords[done] = self._from[done]+dx
+                jump[done] = 0
+
+        # Sitting frogs start a jump if the key is down and the move is allowed
+        sitting = ~jumping
+        left = sitting & (actions == 1)
+        right = sitting & (actions == 2)
+        up = sitting & (actions == 3)
+        down = sitting & (actions == 4)
+        row = (fy//GRID_SIZE).astype(int)
+        sideways = ~self._hedge[row]
+        left = left & (fx-GRID_SIZE >= 0) & sideways
+        right = right & (fx+GRID_SIZE <= self._width) & sideways
+        up = up & (fy+GRID_SIZE <= self._height-(GRID_SIZE*1.5)) & self._north()
+        down = down & (fy-GRID_SIZE >= GRID_SIZE//2) & self._south()
+        for action, mask, coords in ((1, left, fx), (2, right, fx),
+                                     (3, up, fy), (4, down, fy)):
+            jump[mask] = action
+            self._seconds[mask] = 0.0
+            self._from[mask] = coords[mask]
+
+    def _north(self):
+        """
+        Returns which frogs may move north (see _collideNorth in Level).
+
+        A frog may move into a hedge only through an open, or an exit without a
+        safe frog.
+        """
+        py = self._fy+GRID_SIZE
+        return self._gate(py, True, False)
+
+    def _south(self):
+        """
+        Returns which frogs may move south (see _collideSouth in Level).
+
+        A frog may move into a hedge only through an open.
+        """
+        py = self._fy-GRID_SIZE
+        return self._gate(py, True, True)
+
+    def _gate(self, py, allowed, opens):
+        """
+        Returns which frogs may move to the point (x, py) of the frog.
+
+        Parameter py: the y the frogs move to
+        Precondition: py is a float array of shape (k,)
+
+        Parameter allowed: whether a frog may move if py is outside of the level
+        or not in a hedge
+        Precondition: allowed is a boolean
+
+        Parameter opens: whether only opens let a frog through (else exits do too)
+        Precondition: opens is a boolean
+        """
+        fx = self._fx
+        row = (py//GRID_SIZE).astype(int)
+        valid = (row >= 0) & (row < len(self._hedge))
+        row = numpy.clip(row, 0, len(self._hedge)-1)
+        hedge = valid & self._hedge[row]
+        column = (fx//GRID_SIZE).astype(int)
+        incolumn = (column >= 0) & (column < self._exitcell.shape[1])
+        exit = self._exitcell[row, numpy.clip(column, 0, self._exitcell.shape[1]-1)]
+        exit = numpy.where(incolumn, exit, -1)
+        safe = numpy.zeros(self._count, dtype=bool)
+        if self._occupied.shape[1]:
+            has = exit >= 0
+            safe[has] = self._occupied[numpy.nonzero(has)[0], exit[has]]
+        if len(self._isopen):
+            inside = self._gates.contains(fx, py)
+            gate = inside.any(axis=1)
+            if opens:
+                gate = gate & self._isopen[inside.argmax(axis=1)]
+        else:
+            gate = numpy.zeros(self._count, dtype=bool)
+        return (~hedge & allowed) | (hedge & ~safe & gate)
+
+    def _moveObstacles(self, dt):
+        """
+        Moves and wraps every obstacle, exactly like advance in Traffic.
+
+        The positions the obstacles moved from are kept in _prevxs.
+
+        Parameter dt: the length of the tick in seconds
+        Precondition: dt is a float > 0
+        """
+        xs = self._xs
+        margin = self._margin
+        width = self._width
+        moved, wrapped, low, high, step = self._scratch
+        numpy.copyto(self._prevxs, xs)
+        numpy.less(xs, -margin, out=low)
+        numpy.add(xs, margin, out=wrapped)
+        numpy.add(wrapped, margin, out=wrapped)
+        numpy.add(wrapped, width, out=wrapped)
+        numpy.copyto(xs, wrapped, where=low)
+        numpy.greater(xs, width+margin, out=high)
+        numpy.multiply(self._speeds, dt, out=step)
+        numpy.add(xs, step, out=moved)
+        numpy.subtract(xs, width+margin, out=wrapped)
+        numpy.add(wrapped, -margin, out=wrapped)
+        numpy.copyto(moved, wrapped, where=high)
+        numpy.copyto(xs, moved)
+        # The positions the obstacles moved from in a straight line
+        length = width+2*margin
+        numpy.subtract(xs, self._prevxs, out=moved)
+        numpy.add(self._prevxs, length, out=self._prevxs, where=moved > length/2)
+        numpy.subtract(self._prevxs, length, out=self._prevxs, where=moved < -length/2)
+
+    def _respawn(self, mask):
+        """
+        Puts the frogs of the given environments back at the start.
+
+        Parameter mask: the environments
+        Precondition: mask is a boolean array of shape (k,)
+        """
+        self._fx[mask] = self._start[0]
+        self._fy[mask] = self._start[1]
+        self._jump[mask] = 0
+        self._seconds[mask] = 0.0
+
+    def _restart(self, mask):
+        """
+        Starts a new game in the given environments.
+
+        Parameter mask: the environments
+        Precondition: mask is a boolean array of shape (k,)
+        """
+        self._lives[mask] = FROG_LIVES
+        self._occupied[mask] = False
+        numpy.copyto(self._xs, self._initial, where=mask[:, None])
+
+    def _observe(self):
+        """
+        Writes the observation of every environment to _observations.
+        """
+        obs = self._observations
+        width = float(self._width)
+        numpy.divide(self._fx, width, out=obs[:, 0])
+        numpy.divide(self._fy, width, out=obs[:, 1])
+        numpy.not_equal(self._jump, 0, out=obs[:, 2], casting='unsafe')
+        numpy.divide(self._lives, float(FROG_LIVES), out=obs[:, 3])
+        start = len(OBSERVATION)
+        stop = start+self._occupied.shape[1]
+        numpy.copyto(obs[:, start:stop], self._occupied)
+        numpy.divide(self._xs, width, out=obs[:, stop:])
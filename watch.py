@@ -0,0 +1,103 @@
+"""
+Watch module for Froggit
+
+This module contains the class that notices when files change on disk, so that a level
+can be reloaded while it is played (see reload in Level).  A designer can then edit a
+level file (or the objects file), save it, and see the change in the running game
+without starting it again.
+
+A Watcher does not ask the operating system to be notified.  It looks at the time each
+file was last modified, and its size, at most once every RELOAD_INTERVAL seconds of game
+time.  That is one os.stat per file, which costs far less than a frame.
+"""
+import os
+from consts import *
+from files  import find_json
+
+
+class Watcher(object):
+    """
+    A class representing a few files whose changes we want to notice
+
+    Call poll once per tick.  It returns True when one of the files changed since the
+    watcher was made, or since the last time poll returned True.  A file that cannot
+    be found is a change too, and so is the file coming back.
+    """
+    # LIST ALL HIDDEN ATTRIBUTES HERE
+
+    # Attribute _files: the files watched
+    # Invariant: _files is a list of strings naming json files (see find_json)
+    #
+    # Attribute _stamps: the state of each file when it was last looked at
+    # Invariant: _stamps is a list with one tuple (modified, size) for each file in
+    # _files, where modified is the time in nanoseconds, or None if it was not found
+    #
+    # Attribute _interval: the seconds between two looks at the files
+    # Invariant: _interval is a number >= 0
+    #
+    # Attribute _wait: the seconds until the files are looked at again
+    # Invariant: _wait is a number <= _interval
+
+    # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    def getFiles(self):
+        """
+        Returns a new list with the files watched
+        """
+        return list(self._files)
+
+    def __init__(self, files, interval=RELOAD_INTERVAL):
+        """
+        Initializes a watcher of the given files, as they are now.
+
+        Parameter files: the files to watch
+        Precondition: files is a list of strings naming json files
+
+        Parameter interval: the seconds between two looks at the files
+        Precondition: interval is a number >= 0
+        """
+        self._files = list(files)
+        self._stamps = [self._stamp(name) for name in self._files]
+        self._interval = interval
+        self._wait = interval
+
+    def poll(self, dt):
+        """
+        Returns True if one of the files changed since the last change was reported.
+
+        The files are only looked at once every interval, so most calls just count
+        down the time.
+
+        Parameter dt: The time since the last call
+        Precondition: dt is a number >= 0
+        """
+        self._wait = self._wait-dt
+        if self._wait > 0:
+            return False
+        self._wait = self._interval
+        stamps = [self._stamp(name) for name in self._files]
+        if stamps == self._stamps:
+            return False
+        self._stamps = stamps
+        return True
+
+    def reset(self):
+        """
+        Takes the files as they are now, as if this watcher was just made.
+
+        Changes made since the last call to poll are not reported.
+        """
+        self._stamps = [self._stamp(name) for name in self._files]
+        self._wait = self._interval
+
+    def _stamp(self, name):
+        """
+        Returns the tuple (modified, size) of a file, or None if it is not found.
+
+        Parameter name: the file
+        Precondition: name is a string naming a json file
+        """
+        try:
+            info = os.stat(find_json(name))
+        except OSError:
+            return None
+        return (info.st_mtime_ns, info.st_size)